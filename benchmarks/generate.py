@@ -0,0 +1,114 @@
+"""
+Generates synthetic ChefScript programmes for benchmarks.
+
+Usage: ``python benchmarks/generate.py SHAPE SIZE [--seed SEED]``, which prints the
+programme. The shapes are:
+
+- ``wide``: one recipe with ``SIZE`` ingredient lines
+- ``deep``: a chain of ``SIZE`` recipes, each using the one before it
+- ``diamond``: ``SIZE`` layers of two recipes, each using both recipes of the layer
+  before it
+- ``cooks``: a few recipes cooked ``SIZE`` times, with ``for N times`` and
+  ``with <ingredient>`` scales
+- ``mixed``: ``SIZE`` recipes using an earlier recipe, each cooked once
+"""
+
+from __future__ import annotations
+
+import random
+from argparse import ArgumentParser
+from typing import Callable, Iterator
+
+# ingredient ``k`` always uses units of family ``k % 2``, so they can be added up
+UNIT_FAMILIES = (("g", "kg", "lb", "oz"), ("cup", "tsp", "tbsp", "fl oz", "mL"))
+NUMBERS = ("1", "2", "1 1/2", "3/4", "250", "1.5e1", "2 1/3")
+INGREDIENTS = 200
+
+
+class Generator:
+    def __init__(self, seed: int = 0) -> None:
+        self.random = random.Random(seed)
+        self.ingredients: dict[str, list[tuple[str, str]]] = {}
+        """Recipe name -> (unit, name) of each of its ingredient lines"""
+
+    def recipe(
+        self, name: str, ingredients: int, uses: tuple[str, ...] = ()
+    ) -> Iterator[str]:
+        yield f"{name} (generated)"
+        for used in uses:
+            yield f"    {used} (mix in)"
+        self.ingredients[name] = []
+        for step in range(ingredients):
+            k = self.random.randrange(INGREDIENTS)
+            number = self.random.choice(NUMBERS)
+            unit = self.random.choice(UNIT_FAMILIES[k % 2])
+            self.ingredients[name].append((unit, f"ingredient {k}"))
+            yield f"    {number} {unit} of ingredient {k} (step {step})"
+        yield ""
+
+    def cook(self, name: str) -> str:
+        """A ``cook`` statement with a random kind of scale."""
+        kind = self.random.randrange(3)
+        if kind == 0 or not self.ingredients[name]:
+            return f"cook {name}"
+        elif kind == 1:
+            return f"cook {name} for {self.random.randint(1, 5)} times"
+        unit, ingredient = self.random.choice(self.ingredients[name])
+        return f"cook {name} with {self.random.choice(NUMBERS)} {unit} of {ingredient}"
+
+    def wide(self, size: int) -> Iterator[str]:
+        yield from self.recipe("wide recipe", size)
+        yield self.cook("wide recipe")
+
+    def deep(self, size: int) -> Iterator[str]:
+        for i in range(size):
+            uses = (f"recipe {i - 1}",) if i else ()
+            yield from self.recipe(f"recipe {i}", 3, uses)
+        yield self.cook(f"recipe {size - 1}")
+
+    def diamond(self, size: int) -> Iterator[str]:
+        for layer in range(size):
+            uses = (f"layer {layer - 1}a", f"layer {layer - 1}b") if layer else ()
+            yield from self.recipe(f"layer {layer}a", 2, uses)
+            yield from self.recipe(f"layer {layer}b", 2, uses)
+        yield self.cook(f"layer {size - 1}a")
+
+    def cooks(self, size: int) -> Iterator[str]:
+        names = [f"recipe {i}" for i in range(10)]
+        for name in names:
+            yield from self.recipe(name, 8)
+        for _ in range(size):
+            yield self.cook(self.random.choice(names))
+
+    def mixed(self, size: int) -> Iterator[str]:
+        for i in range(size):
+            uses = (f"recipe {self.random.randrange(i)}",) if i else ()
+            yield from self.recipe(f"recipe {i}", 8, uses)
+            yield self.cook(f"recipe {i}")
+
+
+SHAPES: dict[str, Callable[[Generator, int], Iterator[str]]] = {
+    "wide": Generator.wide,
+    "deep": Generator.deep,
+    "diamond": Generator.diamond,
+    "cooks": Generator.cooks,
+    "mixed": Generator.mixed,
+}
+
+
+def generate(shape: str, size: int, seed: int = 0) -> str:
+    """Returns a programme of the given ``shape`` and ``size``."""
+    return "\n".join(SHAPES[shape](Generator(seed), size)) + "\n"
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("shape", choices=list(SHAPES))
+    parser.add_argument("size", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(generate(args.shape, args.size, args.seed), end="")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measures the start-up time of the ChefScript command line, and checks that commands
+which don't parse anything don't import the heavy modules.
+
+Usage: ``python benchmarks/import_time.py [--repeat N] [--check]``
+"""
+
+from __future__ import annotations
+
+import re
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+HEAVY_MODULES = ("pyparsing", "quantities", "regex", "numpy")
+
+PROGRAMME = """\
+seasoned steak
+    2 lb of New York strip steak (pat dry)
+    1 1/2 tsp of salt (apply onto both sides)
+
+cook seasoned steak with 1 lb of New York strip steak
+"""
+
+_IMPORT_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \| *(\S+)")
+
+
+def run(args: list[str]) -> tuple[float, dict[str, float]]:
+    """
+    Runs ``ChefScript *args`` once. Returns the wall time and the cumulative import
+    time of each module imported, in seconds.
+    """
+    start = perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "ChefScript", *args],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=False,
+    )
+    elapsed = perf_counter() - start
+    imports: dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        m = _IMPORT_LINE.match(line)
+        if m is not None:
+            imports[m.group(2)] = int(m.group(1)) / 1e6
+    return elapsed, imports
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Fail if --help, --version or a cached run imports a heavy module",
+    )
+    args = parser.parse_args()
+
+    with TemporaryDirectory() as directory:
+        source = Path(directory) / "steak.chefscript"
+        source.write_text(PROGRAMME, encoding="utf-8")
+        # command -> modules it must not import
+        scenarios: dict[str, tuple[list[str], set[str]]] = {
+            "--help": (["--help"], set(HEAVY_MODULES)),
+            "--version": (["--version"], set(HEAVY_MODULES)),
+            "uncached run": (["--no-cache", str(source)], set()),
+            "cached run": ([str(source)], {"pyparsing", "quantities", "regex"}),
+        }
+        run([str(source)])  # fill the cache
+
+        failed = False
+        print(f"{'command':<14} {'median':>8}  heavy imports")
+        for name, (command, forbidden) in scenarios.items():
+            times = []
+            for _ in range(args.repeat):
+                elapsed, imports = run(command)
+                times.append(elapsed)
+            heavy = [module for module in HEAVY_MODULES if module in imports]
+            failed = failed or bool(forbidden.intersection(heavy))
+            print(
+                f"{name:<14} {statistics.median(times) * 1000:>6.1f}ms  "
+                + ", ".join(f"{m} ({imports[m] * 1000:.1f}ms)" for m in heavy)
+            )
+
+    if args.check and failed:
+        sys.exit("Start-up check failed: a command imported a module it doesn't need")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Measures how the time to parse a large source scales with the number of processes
+parsing it.
+
+Usage: ``python benchmarks/parallel_parse.py [--size N] [--parser NAME] [--check]``,
+which parses a synthetic ``mixed`` programme of ``N`` recipes with 1, 2, 4, ...
+processes, up to the number of CPUs.
+
+With ``--check``, it checks instead that a syntax error in the first statement of any
+batch is reported with the same message and position as by a single process, and
+that recipe bodies at column 1 don't get cut into batches.
+"""
+
+from __future__ import annotations
+
+import sys
+from argparse import ArgumentParser
+from io import StringIO
+from os import cpu_count
+from time import perf_counter
+
+from generate import generate
+
+from ChefScript.backends import PARSERS, load_parser
+from ChefScript.compiled import CompiledProgram
+from ChefScript.interpreter import ChefScriptInterpreter
+from ChefScript.parallel import (
+    BATCHES_PER_JOB,
+    PARALLEL_MIN_SIZE,
+    ParallelSyntaxError,
+    _statement_starts,
+    parse_in_parallel,
+)
+from ChefScript.utils import SourceMap
+
+CHECK_SIZE = 1000
+"""Recipes in the ``deep`` programme of ``--check``, which needn't be large to be cut"""
+
+ERRORS = {
+    "incomplete ingredient": (1, "    1 g of\n"),
+    "invalid quantity": (1, "    1 zz of salt\n"),
+    "incomplete second ingredient": (2, "    1 g of\n"),
+    "unterminated comment": (2, "    1 g of salt (stirred\n"),
+    "missing recipe name": (0, "cook\n"),
+    "stray ingredient": (0, "1 g of salt\n"),
+}
+"""
+Lines inserted by ``--check`` into the first statement of a batch, a recipe, after
+its first lines, or before it
+"""
+
+
+def parse_time(code: str, parser: str, jobs: int) -> float:
+    interpreter = ChefScriptInterpreter(parser=parser, stdout=StringIO())
+    interpreter.filename = "<benchmark>"
+    interpreter.jobs = jobs
+    interpreter.source_map = SourceMap(code.expandtabs())
+    start = perf_counter()
+    interpreter._parse(code)
+    return perf_counter() - start
+
+
+def syntax_error(parse, code: str, errors) -> tuple[str, int] | None:
+    """The message and index of the syntax error ``parse`` raises for ``code``"""
+    try:
+        parse(code)
+    except errors as e:
+        return e.msg, e.loc
+    return None
+
+
+def check_errors(code: str, parser: str, jobs: int) -> bool:
+    """
+    Returns whether errors inserted into the first statement of every batch but the
+    first are reported like without batches, printing those that aren't.
+    """
+    backend = load_parser(parser)
+    lines = code.splitlines(keepends=True)
+    starts = _statement_starts(code, jobs * BATCHES_PER_JOB)
+    ok = True
+    for start in starts[1:]:
+        first = code.count("\n", 0, start)
+        for name, (after, error) in ERRORS.items():
+            line = first + after
+            bad = "".join(lines[:line] + [error] + lines[line:])
+            source_map = SourceMap(bad.expandtabs())
+            whole = syntax_error(backend.parse, bad, backend.errors)
+            parallel = syntax_error(
+                lambda c: parse_in_parallel(c, parser, jobs, source_map),
+                bad,
+                ParallelSyntaxError,
+            )
+            if whole != parallel:
+                ok = False
+                print(f"{name} at line {line + 1}: {whole} with 1 job, {parallel}")
+    return ok
+
+
+def check_cuts(code: str, parser: str, jobs: int) -> bool:
+    """
+    Returns whether ``code``, with the bodies of every other recipe moved to column
+    1, which the grammar allows, parses like without batches, printing how if it
+    doesn't.
+    """
+    lines = []
+    recipes = 0
+    for line in code.splitlines(keepends=True):
+        if line[:1] not in ("", " ", "\n"):
+            recipes += 1
+        lines.append(line.lstrip(" ") if recipes % 2 else line)
+    code = "".join(lines)
+
+    backend = load_parser(parser)
+    source_map = SourceMap(code.expandtabs())
+    results = []
+    for parse, errors in (
+        (lambda c: [stmt[0] for stmt in backend.parse(c)], backend.errors),
+        (lambda c: parse_in_parallel(c, parser, jobs, source_map), ParallelSyntaxError),
+    ):
+        try:
+            results.append(CompiledProgram(parse(code), []).dumps())
+        except errors as e:
+            results.append((e.msg, e.loc))
+    if results[0] == results[1]:
+        return True
+    whole, parallel = (
+        r if isinstance(r, tuple) else f"{len(r)} bytes of statements" for r in results
+    )
+    print(f"bodies at column 1: {whole} with 1 job, {parallel}")
+    return False
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--parser", choices=list(PARSERS), default="descent")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Fail if a programme parses differently with several processes",
+    )
+    args = parser.parse_args()
+
+    if args.check:
+        jobs = max(2, cpu_count() or 1)
+        code = generate("deep", CHECK_SIZE)
+        if not check_errors(code, args.parser, jobs):
+            sys.exit("Parallel check failed: syntax errors depend on the jobs")
+        if not check_cuts(code, args.parser, jobs):
+            sys.exit("Parallel check failed: a batch was cut inside a statement")
+        return
+
+    code = generate("mixed", args.size)
+    if len(code) < PARALLEL_MIN_SIZE:
+        parser.error(f"--size {args.size} is too small to be parsed in parallel")
+    cpus = cpu_count() or 1
+    jobs = [1]
+    while jobs[-1] * 2 <= cpus:
+        jobs.append(jobs[-1] * 2)
+
+    print(f"{len(code) / 1e6:.1f} MB, {cpus} CPUs")
+    print(f"{'jobs':>4} {'time':>9} {'speed-up':>9}")
+    single = parse_time(code, args.parser, 1)
+    for n in jobs:
+        elapsed = single if n == 1 else parse_time(code, args.parser, n)
+        print(f"{n:>4} {elapsed:>8.2f}s {single / elapsed:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
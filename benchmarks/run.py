@@ -0,0 +1,275 @@
+"""
+Times parsing, interpreting and the pychef operations behind them on synthetic
+programmes, and stores the results as JSON.
+
+Usage: ``python benchmarks/run.py [--quick] [--output FILE] [--compare FILE]``
+
+Each benchmark is run ``--repeat`` times, and its minimum and median times are
+recorded. With ``--compare``, the results are compared with an earlier run, so a
+regression between two commits shows up as a ratio above 1.
+"""
+
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+from argparse import ArgumentParser
+from functools import partial
+from io import StringIO
+from itertools import cycle
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Callable, NamedTuple
+
+from generate import INGREDIENTS, UNIT_FAMILIES, generate
+
+from ChefScript.check import Checker
+from ChefScript.descent import ChefScriptDescentParser
+from ChefScript.interpreter import ChefScriptInterpreter
+from ChefScript.parser import ChefScriptParser
+from ChefScript.program import Program
+from ChefScript.watch import Watcher
+from pychef import AttributeTable, Ingredient, Quantity, Recipe, topological_order
+
+
+class Benchmark(NamedTuple):
+    function: Callable[[], object]
+    setup: Callable[[], object] | None = None
+    """Run before every repetition, without being timed"""
+
+
+# programme of each benchmark: shape, size, and size with --quick
+PROGRAMMES: dict[str, tuple[str, int, int]] = {
+    "parse/pyparsing": ("mixed", 200, 20),
+    "parse/descent": ("mixed", 2000, 200),
+    "interpret/wide": ("wide", 5000, 500),
+    "interpret/deep": ("deep", 2000, 200),
+    "interpret/diamond": ("diamond", 200, 20),
+    "interpret/cooks": ("cooks", 2000, 200),
+    "interpret/mixed": ("mixed", 1000, 100),
+    "recipe/ingredients": ("diamond", 500, 50),
+    "recipe/pretty_str": ("deep", 1000, 100),
+    "watch/edit": ("mixed", 5000, 500),
+    "program/plan": ("mixed", 1000, 100),
+    "check/errors": ("mixed", 1000, 100),
+    "find/index": ("mixed", 1000, 100),
+    "program/attributes": ("cooks", 5000, 500),
+}
+QUANTITY_OPERATIONS = 100_000
+PANTRY_SIZE = 100_000
+
+
+def interpreter() -> ChefScriptInterpreter:
+    return ChefScriptInterpreter(stdout=StringIO(), stderr=StringIO())
+
+
+def last_recipe(code: str) -> Recipe:
+    chef = interpreter()
+    chef._interpret(code)
+    return next(reversed(chef.recipes.values()))
+
+
+def interpret(code: str) -> None:
+    interpreter()._interpret(code)
+
+
+def watch_edit(code: str) -> Benchmark:
+    """Updates a watched programme after adding a cook statement in its middle."""
+    directory = TemporaryDirectory()
+    path = Path(directory.name) / "watched.chefscript"
+    path.write_text(code)
+    watcher = Watcher(interpreter(), str(path))
+    watcher.update()
+    middle = code.index("\ncook ", len(code) // 2)
+    edits = cycle([code[:middle] + "\ncook recipe 0" + code[middle:], code])
+
+    def edit():
+        # keep the directory until the benchmark is done with it
+        directory.name
+        path.write_text(next(edits))
+
+    return Benchmark(watcher.update, edit)
+
+
+def check_errors(code: str) -> Benchmark:
+    """Checks a programme with a syntax error in its middle and at its end."""
+    directory = TemporaryDirectory()
+    path = Path(directory.name) / "checked.chefscript"
+    middle = code.index("\n    ", len(code) // 2)
+    path.write_text(code[:middle] + "\n    1 g of" + code[middle:] + "cook\n")
+    checker = Checker(interpreter())
+    checker.interpreter.cache = False
+
+    def function():
+        # keep the directory until the benchmark is done with it
+        directory.name
+        return checker.check_file(str(path))
+
+    return Benchmark(function)
+
+
+def find_index(code: str) -> Benchmark:
+    """
+    Indexes a cached programme by its ingredients, and finds the recipes using at
+    least 1 kg of one of them.
+    """
+    directory = TemporaryDirectory()
+    path = Path(directory.name) / "indexed.chefscript"
+    path.write_text(code)
+    chef = interpreter()
+    chef.index_file(str(path))  # fill the cache
+
+    def function():
+        # keep the directory until the benchmark is done with it
+        directory.name
+        index = chef.index_file(str(path))
+        return index.find("ingredient 0", at_least=Quantity(1, "kg"))
+
+    return Benchmark(function)
+
+
+def attribute_totals(code: str) -> Callable[[], object]:
+    """Totals the attributes of every cook of a programme in one batch."""
+    program = Program.from_source(code)
+    names = [f"ingredient {k}" for k in range(INGREDIENTS)]
+    quantities = [Quantity(100, UNIT_FAMILIES[k % 2][0]) for k in range(INGREDIENTS)]
+    values = [[k / 10, k * 5, k % 7] for k in range(INGREDIENTS)]
+    attributes = AttributeTable(names, quantities, ["price", "kcal", "fat"], values)
+    return partial(program.attribute_totals, attributes)
+
+
+def quantity_arithmetic(operations: int) -> Callable[[], object]:
+    grams, pounds = Quantity(250, "g"), Quantity(1.5, "lb")
+    cups, millilitres = Quantity(2, "cups"), Quantity(30, "mL")
+
+    def function():
+        for _ in range(operations // 4):
+            grams + pounds
+            cups - millilitres
+            grams * 3
+            cups / millilitres
+
+    return function
+
+
+def pantry_scale(recipe: Recipe, spares: int) -> Callable[[], object]:
+    """Finds the limiting ingredient of ``recipe`` in a pantry with many others."""
+    pantry = [Ingredient(i.name, i.quantity * 2) for i in recipe.ingredients]
+    pantry += [Ingredient(f"spare {i}", Quantity(1, "g")) for i in range(spares)]
+    return lambda: recipe.limiting_scale(pantry)
+
+
+def benchmarks(quick: bool) -> dict[str, Benchmark]:
+    code = {
+        name: generate(shape, quick_size if quick else size)
+        for name, (shape, size, quick_size) in PROGRAMMES.items()
+    }
+    summarised = last_recipe(code["recipe/ingredients"])
+    rendered = last_recipe(code["recipe/pretty_str"])
+
+    def forget_summaries():
+        for recipe in topological_order([summarised]):
+            recipe.invalidate()
+
+    result = {
+        "parse/pyparsing": Benchmark(
+            lambda: ChefScriptParser.parse(code["parse/pyparsing"])
+        ),
+        "parse/descent": Benchmark(
+            lambda: ChefScriptDescentParser.parse(code["parse/descent"])
+        ),
+    }
+    for name in PROGRAMMES:
+        if name.startswith("interpret/"):
+            result[name] = Benchmark(partial(interpret, code[name]))
+    result["quantity/arithmetic"] = Benchmark(
+        quantity_arithmetic(QUANTITY_OPERATIONS // (10 if quick else 1))
+    )
+    result["recipe/ingredients"] = Benchmark(
+        lambda: summarised.ingredients, forget_summaries
+    )
+    result["recipe/pretty_str"] = Benchmark(lambda: rendered.pretty_str)
+    result["recipe/pantry"] = Benchmark(
+        pantry_scale(
+            last_recipe(code["recipe/ingredients"]),
+            PANTRY_SIZE // (10 if quick else 1),
+        )
+    )
+    result["watch/edit"] = watch_edit(code["watch/edit"])
+    result["check/errors"] = check_errors(code["check/errors"])
+    result["find/index"] = find_index(code["find/index"])
+    result["program/plan"] = Benchmark(Program.from_source(code["program/plan"]).plan)
+    result["program/attributes"] = Benchmark(
+        attribute_totals(code["program/attributes"])
+    )
+    return result
+
+
+def time_benchmark(benchmark: Benchmark, repeat: int) -> dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        if benchmark.setup is not None:
+            benchmark.setup()
+        start = perf_counter()
+        benchmark.function()
+        times.append(perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "repeat": repeat}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Use small programmes")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "-k", "--filter", default="", help="Only run benchmarks containing this"
+    )
+    parser.add_argument("--output", type=Path, help="Write the results to this file")
+    parser.add_argument(
+        "--compare", type=Path, help="Compare with the results in this file"
+    )
+    args = parser.parse_args()
+
+    baseline = json.loads(args.compare.read_text())["results"] if args.compare else {}
+    results: dict[str, dict[str, float]] = {}
+    for name, benchmark in benchmarks(args.quick).items():
+        if args.filter not in name:
+            continue
+        results[name] = time_benchmark(benchmark, args.repeat)
+        line = f"{name:<22} {results[name]['min'] * 1000:>10.2f}ms"
+        if name in baseline:
+            line += f"  {results[name]['min'] / baseline[name]['min']:>6.2f}x"
+        print(line)
+
+    if args.output is not None:
+        report = {
+            "metadata": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "quick": args.quick,
+            },
+            "results": results,
+        }
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+Starts ``ChefScript serve`` on a synthetic library, checks its answers against
+:class:`ChefScript.program.Program`, and measures the latency of cached requests.
+
+Usage: ``python benchmarks/serve_client.py [--size N] [--requests N]``
+
+The server is checked over its Unix socket and over HTTP; identical requests sent at
+once must be cooked only once, and a change to the library must be picked up.
+"""
+
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Any
+
+from generate import generate
+
+from ChefScript.program import Program
+from ChefScript.render import summary_json
+
+
+class Client:
+    """A client of the JSON lines protocol, on one connection."""
+
+    def __init__(self, socket_path: str) -> None:
+        self.socket = socket.socket(socket.AF_UNIX)
+        self.socket.connect(socket_path)
+        self.file = self.socket.makefile("rwb")
+
+    def send(self, request: dict[str, Any]) -> None:
+        self.file.write(json.dumps(request).encode() + b"\n")
+
+    def receive(self) -> dict[str, Any]:
+        self.file.flush()
+        return json.loads(self.file.readline())
+
+    def request(self, request: dict[str, Any]) -> dict[str, Any]:
+        self.send(request)
+        return self.receive()
+
+
+def start(args: list[str]) -> tuple[subprocess.Popen, str]:
+    """Starts the server, and returns it with where it serves."""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "ChefScript", "serve", *args],
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    assert server.stderr is not None
+    line = server.stderr.readline()
+    match = re.match(r"Serving \d+ recipes on (.*)", line)
+    if match is None:
+        server.kill()
+        sys.exit(f"The server didn't start: {line}{server.stderr.read()}")
+    return server, match.group(1)
+
+
+def expected(program: Program, request: dict[str, Any]) -> dict[str, Any]:
+    result = program.cook(request["recipe"], request.get("scale"))
+    return summary_json(result.recipe_name, result.scale, result.summary)
+
+
+def wait_for_reload(client: Client, reloads: int) -> None:
+    deadline = time.monotonic() + 10
+    while client.request({"op": "stats"})["reloads"] < reloads:
+        if time.monotonic() > deadline:
+            sys.exit("The server didn't reload the library")
+        time.sleep(0.05)
+
+
+def check_lines(library: Path, socket_path: str, count: int) -> None:
+    program = Program.from_file(library)
+    rng = random.Random(0)
+    names = list(program.recipes)
+    requests: list[dict[str, Any]] = [
+        {"id": i, "recipe": rng.choice(names), "scale": rng.choice([0.5, 1, 2, 3])}
+        for i in range(count)
+    ]
+    server, _ = start([str(library), "--socket", socket_path, "--poll", "0.05"])
+    try:
+        client = Client(socket_path)
+        for request in requests:
+            response = client.request(request)
+            assert response["id"] == request["id"], response
+            assert response["result"] == expected(program, request), response
+
+        # copies of one new request sent at once are cooked once
+        request = {"recipe": names[-1], "scale": 7}
+        clients = [Client(socket_path) for _ in range(20)]
+        for other in clients:
+            other.send(request)
+            other.file.flush()
+        for other in clients:
+            assert other.receive()["result"] == expected(program, request)
+        assert "error" in client.request({"recipe": "no such recipe"})
+        stats = client.request({"op": "stats"})
+        distinct = {(r["recipe"], float(r["scale"])) for r in requests}
+        assert stats["misses"] == len(distinct) + 2, stats
+        print(f"{stats['coalesced']} of {len(clients)} identical requests coalesced")
+
+        # cached requests, one at a time
+        latencies = []
+        for request in requests:
+            start_time = time.perf_counter()
+            client.request(request)
+            latencies.append(time.perf_counter() - start_time)
+        latencies.sort()
+        print(
+            f"{len(latencies)} cached requests over a Unix socket: "
+            f"median {statistics.median(latencies) * 1e6:.0f}us, "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f}us"
+        )
+
+        # a redefined recipe is served once the library is reloaded
+        recipe = names[0]
+        with library.open("a") as file:
+            file.write(f"\n{recipe} (redefined)\n    3 g of salt (sprinkle)\n")
+        wait_for_reload(client, 1)
+        response = client.request({"recipe": recipe, "scale": 2})
+        salt = {"name": "salt", "quantity": 6.0, "unit": "g"}
+        assert response["result"]["ingredients"] == [salt], response
+
+        # a broken library is not loaded
+        with library.open("a") as file:
+            file.write("\ncook no such recipe\n")
+        time.sleep(0.5)
+        response = client.request({"recipe": recipe, "scale": 2})
+        assert response["result"]["ingredients"] == [salt], response
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def check_http(library: Path) -> None:
+    program = Program.from_file(library)
+    name = next(iter(program.recipes))
+    server, url = start([str(library), "--port", "0"])
+    try:
+        host, port = url.removeprefix("http://").rsplit(":", 1)
+        connection = http.client.HTTPConnection(host, int(port))
+        query = f"/cook?recipe={name.replace(' ', '+')}&scale=2"
+        for method, target, body in (
+            ("GET", query, None),
+            ("POST", "/cook", json.dumps({"recipe": name, "scale": 2})),
+        ):
+            connection.request(method, target, body)
+            response = connection.getresponse()
+            assert response.status == 200, response.status
+            result = json.loads(response.read())["result"]
+            assert result == expected(program, {"recipe": name, "scale": 2}), result
+        connection.request("GET", "/cook?recipe=nothing")
+        response = connection.getresponse()
+        assert response.status == 400 and b"error" in response.read()
+        print("HTTP answers match")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=300)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        library = Path(directory) / "library.chefscript"
+        library.write_text(generate("mixed", args.size))
+        check_http(library)
+        socket_path = os.path.join(directory, "serve.sock")
+        check_lines(library, socket_path, args.requests)
+
+
+if __name__ == "__main__":
+    main()
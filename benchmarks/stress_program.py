@@ -0,0 +1,87 @@
+"""
+Cooks one :class:`ChefScript.program.Program` from many threads at once, and checks
+that every result is the same as when it is cooked from a single thread.
+
+Usage: ``python benchmarks/stress_program.py [--threads N] [--cooks N]``
+"""
+
+from __future__ import annotations
+
+import random
+import sys
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+from generate import generate
+
+from ChefScript.program import Program
+from pychef import Ingredient, Quantity
+
+# spellings that are new to the unit registry, so threads intern them concurrently
+SPELLINGS = {"g": "grams", "kg": "kilograms", "cup": "cups", "tsp": "teaspoons"}
+
+Request = tuple[str, float | None, tuple[str, float, str] | None]
+
+
+def requests(program: Program, count: int, seed: int) -> list[Request]:
+    rng = random.Random(seed)
+    names = list(program.recipes)
+    result: list[Request] = []
+    for _ in range(count):
+        name = rng.choice(names)
+        if rng.random() < 0.5:
+            result.append((name, rng.choice([0.5, 1.0, 2.0, 3.5]), None))
+        else:
+            ingredient = rng.choice(program.recipes[name].ingredients)
+            unit = ingredient.quantity.unit
+            result.append(
+                (name, None, (ingredient.name, 2.0, SPELLINGS.get(unit, unit)))
+            )
+    return result
+
+
+def cook(program: Program, request: Request) -> list[tuple[str, float, str]]:
+    name, scale, with_ingredient = request
+    ingredient = None
+    if with_ingredient is not None:
+        ingredient_name, value, unit = with_ingredient
+        ingredient = Ingredient(ingredient_name, Quantity(value, unit))
+    result = program.cook(name, scale=scale, with_ingredient=ingredient)
+    # render too, which reads every scaled sub-recipe
+    result.pretty_str
+    summary = result.summary
+    return list(zip(summary.names, summary.values.tolist(), summary.units))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--cooks", type=int, default=5000)
+    parser.add_argument("--size", type=int, default=300)
+    args = parser.parse_args()
+
+    program = Program.from_source(generate("mixed", args.size))
+    work = requests(program, args.cooks, seed=0)
+    expected_program = Program.from_source(generate("mixed", args.size))
+
+    # switch threads as often as possible, to interleave them in many places
+    sys.setswitchinterval(1e-6)
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(lambda request: cook(program, request), work))
+    elapsed = perf_counter() - start
+    sys.setswitchinterval(0.005)
+
+    expected = [cook(expected_program, request) for request in work]
+    mismatches = sum(result != e for result, e in zip(results, expected))
+    print(
+        f"{len(work)} cooks on {args.threads} threads in {elapsed:.3f}s, "
+        f"{mismatches} mismatches"
+    )
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,164 @@
+import json
 from argparse import ArgumentParser
+from os import O_WRONLY, cpu_count, devnull, dup2, open as open_fd
 from pathlib import Path
-from sys import stderr
+from sys import argv, exit, stderr, stdout
+from typing import Callable
 
-from .interpreter import ChefScriptInterpreter
-from .utils import ChefScriptKeyboardInterrupt, __version__, pretty_str
+from .backends import PARSERS
+from .render import RENDERERS
+from .utils import ChefScriptKeyboardInterrupt, chefscript_version, pretty_str
 
+# the interpreter (and through it numpy) is only imported once the arguments are
+# parsed, so that --help and --version return immediately
 
-def main():
+
+def run_programme(args: list[str]):
     parser = ArgumentParser(
+        prog="ChefScript",
         description="Run a ChefScript programme. "
-        "When no file is specified, ChefScript will run in interactive mode."
+        "When no file is specified, ChefScript will run in interactive mode.",
+        epilog="other commands: "
+        + ", ".join(f"'ChefScript {command} -h'" for command in COMMANDS),
     )
     parser.add_argument(
         "filename",
         type=Path,
-        help="Enter the ChefScript file to run",
+        help="Enter the ChefScript file to run, or a compiled programme",
         nargs="?",
         default=None,
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--parser",
+        choices=list(PARSERS),
+        default="descent",
+        help="Choose the parser backend (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of processes parsing a large file (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Parse and run one top-level statement at a time, "
+        "reading files through a memory map",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Run the file again whenever it or a file it includes changes, "
+        "printing only the cook statements affected by the change",
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=0.5,
+        metavar="SECONDS",
+        help="With --watch, check the files for changes this often "
+        "(default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always parse the file, without reading or writing __chefcache__",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(RENDERERS),
+        default="text",
+        help="Print cooked recipes as text, or their scaled summaries of "
+        "ingredients as JSON Lines or CSV (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--attributes",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="Also print the price, nutrients or other attributes of each cooked "
+        "recipe, from a CSV file with the header 'ingredient,quantity,unit' followed "
+        "by the attributes of that quantity of each ingredient",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print the time spent in each phase and in the slowest cook "
+        "statements to stderr",
+    )
+    parser.add_argument(
+        "--profile-json",
+        type=Path,
+        default=None,
+        metavar="FILE",
+        help="Write the profile as JSON to FILE",
+    )
+    parser.add_argument(
+        "--version", action="store_true", help="Show the version and exit"
+    )
+    parsed_args = parser.parse_args(args)
+
+    if parsed_args.version:
+        print(f"ChefScript {chefscript_version()}")
+        return
+    if parsed_args.watch and (parsed_args.filename is None or parsed_args.stream):
+        parser.error("--watch needs a file, and can't be used with --stream")
+    if parsed_args.jobs is not None and parsed_args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    from .interpreter import ChefScriptInterpreter
+
+    attributes = None
+    if parsed_args.attributes is not None:
+        from pychef import AttributeTable
+
+        try:
+            attributes = AttributeTable.from_csv(parsed_args.attributes)
+        except OSError as e:
+            parser.error(f"Cannot read {parsed_args.attributes}: {e.strerror}")
+        except ValueError as e:
+            parser.error(f"Invalid attributes in {parsed_args.attributes}: {e}")
+
+    interpreter = ChefScriptInterpreter(
+        parser=parsed_args.parser,
+        output_format=parsed_args.format,
+        attributes=attributes,
+    )
+    interpreter.jobs = parsed_args.jobs or cpu_count() or 1
+    profiler = None
+    if parsed_args.profile or parsed_args.profile_json is not None:
+        from .profiling import Profiler
 
-    interpreter = ChefScriptInterpreter()
+        profiler = Profiler()
+        interpreter.add_hook(profiler)
 
     try:
-        if args.filename is None or args.filename == "-":
-            print(pretty_str(f"This is ChefScript {__version__}"))
-            interpreter.interpret_stdin()
+        if parsed_args.watch:
+            from .watch import Watcher
+
+            interpreter.cache = not parsed_args.no_cache
+            watcher = Watcher(
+                interpreter, str(parsed_args.filename.resolve()), parsed_args.poll
+            )
+            try:
+                watcher.watch()
+            except KeyboardInterrupt:
+                pass
+        elif parsed_args.filename is None or parsed_args.filename == "-":
+            print(pretty_str(f"This is ChefScript {chefscript_version()}"))
+            interpreter.interpret_stdin(stream=parsed_args.stream)
         else:
             try:
-                interpreter.interpret_file(args.filename.resolve())
+                interpreter.interpret_file(
+                    str(parsed_args.filename.resolve()),
+                    stream=parsed_args.stream,
+                    cache=not parsed_args.no_cache,
+                )
             except FileNotFoundError:
                 print(
-                    f"No such file or directory: '{args.filename}'",
+                    f"No such file or directory: '{parsed_args.filename}'",
                     file=stderr,
                 )
 
@@ -40,9 +167,405 @@ def main():
             "",
             interpreter.filename,
             interpreter.pos,
+            interpreter.source_map,
         )
         print(keyboard_interrupt, file=stderr)
 
+    if profiler is not None:
+        if parsed_args.profile:
+            print(profiler.report(), file=stderr)
+        if parsed_args.profile_json is not None:
+            parsed_args.profile_json.write_text(
+                json.dumps(profiler.to_json(), indent=2) + "\n"
+            )
+
+
+def compile_programme(args: list[str]):
+    parser = ArgumentParser(
+        prog="ChefScript compile",
+        description="Parse a ChefScript programme into a compiled programme, "
+        "which 'ChefScript' runs without parsing it again.",
+    )
+    parser.add_argument("filename", type=Path, help="Enter the ChefScript file")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        default=None,
+        help="Where to write the compiled programme (default: <filename>.chefc)",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=list(PARSERS),
+        default="descent",
+        help="Choose the parser backend (default: %(default)s)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of processes parsing a large file (default: number of CPUs)",
+    )
+    parsed_args = parser.parse_args(args)
+    if parsed_args.jobs is not None and parsed_args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    from .interpreter import ChefScriptInterpreter
+
+    output = parsed_args.output or parsed_args.filename.with_suffix(".chefc")
+    interpreter = ChefScriptInterpreter(parser=parsed_args.parser)
+    interpreter.jobs = parsed_args.jobs or cpu_count() or 1
+    try:
+        if not interpreter.compile_file(
+            str(parsed_args.filename.resolve()), str(output)
+        ):
+            exit(1)
+    except FileNotFoundError:
+        print(f"No such file or directory: '{parsed_args.filename}'", file=stderr)
+        exit(1)
+
+
+def run_programmes(args: list[str]):
+    parser = ArgumentParser(
+        prog="ChefScript batch",
+        description="Run many ChefScript programmes in parallel. Their outputs are "
+        "printed in the order the files are given, followed by a summary.",
+    )
+    parser.add_argument(
+        "paths",
+        type=Path,
+        nargs="+",
+        help="Enter ChefScript files, or directories to run every *.chefscript "
+        "file in",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=list(PARSERS),
+        default="descent",
+        help="Choose the parser backend (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always parse the files, without reading or writing __chefcache__",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(RENDERERS),
+        default="text",
+        help="Print cooked recipes as text, or their scaled summaries of "
+        "ingredients as JSON Lines or CSV (default: %(default)s)",
+    )
+    parsed_args = parser.parse_args(args)
+    if parsed_args.jobs is not None and parsed_args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    from .batch import run_batch
+
+    summary = run_batch(
+        parsed_args.paths,
+        jobs=parsed_args.jobs,
+        parser=parsed_args.parser,
+        cache=not parsed_args.no_cache,
+        output_format=parsed_args.format,
+        stdout=stdout,
+        stderr=stderr,
+    )
+    print(summary, file=stderr)
+    if summary.failed:
+        exit(1)
+
+
+def check(args: list[str]):
+    parser = ArgumentParser(
+        prog="ChefScript check",
+        description="Check ChefScript programmes for errors without running them, "
+        "printing every error instead of stopping at the first one.",
+    )
+    parser.add_argument(
+        "paths", type=Path, nargs="+", help="Enter ChefScript files to check"
+    )
+    parser.add_argument(
+        "--parser",
+        choices=list(PARSERS),
+        default="descent",
+        help="Choose the parser backend (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always parse the files, without reading or writing __chefcache__",
+    )
+    parsed_args = parser.parse_args(args)
+
+    from .check import Checker
+    from .interpreter import ChefScriptInterpreter
+
+    interpreter = ChefScriptInterpreter(parser=parsed_args.parser)
+    interpreter.cache = not parsed_args.no_cache
+    checker = Checker(interpreter)
+    errors = 0
+    for path in parsed_args.paths:
+        try:
+            found = checker.check_file(str(path.resolve()))
+        except OSError:
+            print(f"No such file or directory: '{path}'", file=stderr)
+            errors += 1
+            continue
+        for error in found:
+            print(error, file=stderr)
+        errors += len(found)
+    if errors:
+        print(f"Found {errors} errors", file=stderr)
+        exit(1)
+
+
+def plan(args: list[str]):
+    parser = ArgumentParser(
+        prog="ChefScript plan",
+        description="Print the shopping list of ChefScript programmes: the total of "
+        "every ingredient over all their cook statements, without cooking them.",
+    )
+    parser.add_argument(
+        "paths", type=Path, nargs="+", help="Enter ChefScript files to plan for"
+    )
+    parser.add_argument(
+        "--parser",
+        choices=list(PARSERS),
+        default="descent",
+        help="Choose the parser backend (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always parse the files, without reading or writing __chefcache__",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(RENDERERS),
+        default="text",
+        help="Print the shopping list as text, JSON Lines or CSV "
+        "(default: %(default)s)",
+    )
+    parsed_args = parser.parse_args(args)
+
+    from pychef import IngredientTable
+
+    from .program import Program
+    from .render import LineWriter
+    from .utils import ChefScriptException
+
+    try:
+        programs = [
+            Program.from_file(
+                path, parser=parsed_args.parser, cache=not parsed_args.no_cache
+            )
+            for path in parsed_args.paths
+        ]
+        totals = IngredientTable.concatenate(
+            program.plan() for program in programs
+        ).summarize()
+    except ChefScriptException as e:
+        print(e, file=stderr)
+        exit(1)
+    except FileNotFoundError as e:
+        print(f"No such file or directory: '{e.filename}'", file=stderr)
+        exit(1)
+
+    cooks = sum(len(program.cook_positions) for program in programs)
+    writer = LineWriter(stdout)
+    writer.writelines(RENDERERS[parsed_args.format]().render_plan(totals, cooks))
+    writer.flush()
+
+
+def find(args: list[str]):
+    parser = ArgumentParser(
+        prog="ChefScript find",
+        description="Print the recipes of ChefScript programmes that use an "
+        "ingredient, directly or through the recipes they use, without cooking them.",
+    )
+    parser.add_argument("ingredient", help="Enter the name of the ingredient")
+    parser.add_argument(
+        "paths", type=Path, nargs="+", help="Enter ChefScript files to search"
+    )
+    parser.add_argument(
+        "--at-least",
+        nargs=2,
+        metavar=("VALUE", "UNIT"),
+        default=None,
+        help="Only print recipes using at least this quantity of the ingredient",
+    )
+    parser.add_argument(
+        "--at-most",
+        nargs=2,
+        metavar=("VALUE", "UNIT"),
+        default=None,
+        help="Only print recipes using at most this quantity of the ingredient",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=list(PARSERS),
+        default="descent",
+        help="Choose the parser backend (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always parse the files, without reading or writing __chefcache__",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(RENDERERS),
+        default="text",
+        help="Print the recipes found as text, JSON Lines or CSV "
+        "(default: %(default)s)",
+    )
+    parsed_args = parser.parse_args(args)
+
+    from pychef import Quantity
+
+    from .interpreter import ChefScriptInterpreter
+    from .render import LineWriter
+    from .utils import ChefScriptException
+
+    bounds: list[Quantity | None] = []
+    for bound in (parsed_args.at_least, parsed_args.at_most):
+        if bound is None:
+            bounds.append(None)
+            continue
+        value, unit = bound
+        try:
+            bounds.append(Quantity(float(value), unit))
+        except ValueError:
+            parser.error(f"Invalid quantity '{value}'")
+        except Exception:
+            parser.error(f"Invalid unit '{unit}'")
+    at_least, at_most = bounds
+    if at_least is not None and at_most is not None:
+        try:
+            at_least + at_most
+        except ValueError as e:
+            parser.error(str(e))
+
+    interpreter = ChefScriptInterpreter(parser=parsed_args.parser)
+    renderer = RENDERERS[parsed_args.format]()
+    writer = LineWriter(stdout)
+    try:
+        for path in parsed_args.paths:
+            index = interpreter.index_file(
+                str(path.resolve()), cache=not parsed_args.no_cache
+            )
+            try:
+                found = index.find(parsed_args.ingredient, at_least, at_most)
+            except ValueError as e:
+                writer.flush()
+                print(
+                    f"Cannot find '{parsed_args.ingredient}' in {path}: {e}",
+                    file=stderr,
+                )
+                exit(1)
+            writer.writelines(
+                renderer.render_find(parsed_args.ingredient, str(path), found)
+            )
+    except ChefScriptException as e:
+        writer.flush()
+        print(e, file=stderr)
+        exit(1)
+    except FileNotFoundError as e:
+        writer.flush()
+        print(f"No such file or directory: '{e.filename}'", file=stderr)
+        exit(1)
+    writer.flush()
+
+
+def serve(args: list[str]):
+    parser = ArgumentParser(
+        prog="ChefScript serve",
+        description="Load ChefScript libraries once and cook their recipes on "
+        "request, over a Unix socket (one JSON object per line) or HTTP.",
+    )
+    parser.add_argument(
+        "paths", type=Path, nargs="+", help="Enter the ChefScript libraries to load"
+    )
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument("--socket", help="Serve JSON lines on this Unix socket")
+    where.add_argument("--port", type=int, help="Serve HTTP on this port")
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Serve HTTP on this address (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--poll",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="Check the libraries for changes this often (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=list(PARSERS),
+        default="descent",
+        help="Choose the parser backend (default: %(default)s)",
+    )
+    parsed_args = parser.parse_args(args)
+
+    import asyncio
+
+    from .server import RecipeServer
+    from .utils import ChefScriptException
+
+    server = RecipeServer(
+        parsed_args.paths, parser=parsed_args.parser, poll_interval=parsed_args.poll
+    )
+    try:
+        server.load()
+    except ChefScriptException as e:
+        print(e, file=stderr)
+        exit(1)
+    except FileNotFoundError as e:
+        print(f"No such file or directory: '{e.filename}'", file=stderr)
+        exit(1)
+    try:
+        asyncio.run(
+            server.serve(parsed_args.socket, parsed_args.host, parsed_args.port or 0)
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+COMMANDS: dict[str, Callable[[list[str]], None]] = {
+    "batch": run_programmes,
+    "check": check,
+    "compile": compile_programme,
+    "find": find,
+    "plan": plan,
+    "serve": serve,
+}
+"""Subcommands, selected by the first argument; anything else runs a programme"""
+
+
+def main():
+    args = argv[1:]
+    try:
+        if args and args[0] in COMMANDS:
+            COMMANDS[args[0]](args[1:])
+        else:
+            run_programme(args)
+    except BrokenPipeError:
+        # the output was closed, like by ``| head``: stop quietly, without letting
+        # Python fail to flush stdout again at exit
+        dup2(open_fd(devnull, O_WRONLY), stdout.fileno())
+        exit(1)
+
 
 if __name__ == "__main__":
     main()
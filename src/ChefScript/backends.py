@@ -0,0 +1,32 @@
+"""
+Parser backends, by name.
+
+A backend is only imported when it is first used, so that commands that don't parse
+(``--help``, or running a cached programme) never import ``pyparsing``.
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from typing import Any, Protocol
+
+__all__ = ["PARSERS", "ParserBackend", "load_parser"]
+
+PARSERS: dict[str, str] = {
+    "descent": "ChefScript.descent:ChefScriptDescentParser",
+    "pyparsing": "ChefScript.parser:ChefScriptParser",
+}
+"""Parser backends selectable by name; both accept the same language"""
+
+
+class ParserBackend(Protocol):
+    errors: tuple[type[Exception], ...]
+    """Exceptions raised by :meth:`parse`, with ``msg`` and ``loc`` attributes"""
+
+    def parse(self, string: str) -> Any:
+        ...
+
+
+def load_parser(name: str) -> ParserBackend:
+    module_name, _, class_name = PARSERS[name].partition(":")
+    return getattr(import_module(module_name), class_name)
@@ -0,0 +1,142 @@
+"""
+Running many ChefScript files in a process pool.
+
+Every file is run by a fresh interpreter in one of the worker processes, which
+capture its output. The outputs are written in the order the files were given, as
+soon as all files before them are done, so the result doesn't depend on the number
+of workers.
+"""
+
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+from os import cpu_count
+from pathlib import Path
+from typing import Iterable, Iterator, NamedTuple, TextIO
+
+from .render import RENDERERS
+from .utils import MAX_TERMINTAL_WIDTH, pretty_str
+
+__all__ = ["FileResult", "BatchSummary", "collect_files", "run_batch", "run_file"]
+
+SOURCE_SUFFIX = ".chefscript"
+
+
+class FileResult(NamedTuple):
+    filename: str
+    stdout: str
+    stderr: str
+    failed: bool
+
+
+class BatchSummary(NamedTuple):
+    succeeded: list[str]
+    failed: list[str]
+
+    def __str__(self) -> str:
+        lines = [
+            pretty_str(
+                f"{len(self.succeeded) + len(self.failed)} files: "
+                f"{len(self.succeeded)} succeeded, {len(self.failed)} failed"
+            )
+        ]
+        lines.extend(f"Failed: {filename}" for filename in self.failed)
+        lines.append("-" * MAX_TERMINTAL_WIDTH)
+        return "\n".join(lines)
+
+
+def collect_files(paths: Iterable[str | Path]) -> list[Path]:
+    """
+    Expands directories in ``paths`` to the ChefScript sources below them, sorted by
+    path. Files are kept as given, in order.
+    """
+    files: list[Path] = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(path.rglob(f"*{SOURCE_SUFFIX}")))
+        else:
+            files.append(path)
+    return files
+
+
+def run_file(
+    filename: str,
+    parser: str = "descent",
+    cache: bool = True,
+    output_format: str = "text",
+) -> FileResult:
+    """
+    Runs one file, capturing what it prints. The output has no header, as it is one
+    part of the output of a batch.
+    """
+    from .interpreter import ChefScriptInterpreter
+
+    stdout, stderr = StringIO(), StringIO()
+    interpreter = ChefScriptInterpreter(
+        parser=parser,
+        stdout=stdout,
+        stderr=stderr,
+        output_format=output_format,
+        header=False,
+    )
+    try:
+        interpreter.interpret_file(str(Path(filename).resolve()), cache=cache)
+    except OSError as e:
+        print(f"{e.strerror}: '{filename}'", file=stderr)
+        interpreter.failed = True
+    return FileResult(
+        filename, stdout.getvalue(), stderr.getvalue(), interpreter.failed
+    )
+
+
+def _run_file(args: tuple[str, str, bool, str]) -> FileResult:
+    return run_file(*args)
+
+
+def _results(
+    filenames: list[str], jobs: int, parser: str, cache: bool, output_format: str
+) -> Iterator[FileResult]:
+    tasks = [(filename, parser, cache, output_format) for filename in filenames]
+    if jobs == 1 or len(tasks) <= 1:
+        yield from map(_run_file, tasks)
+        return
+    # small chunks keep the output flowing, large ones keep the overhead low
+    chunksize = max(1, min(16, len(tasks) // (jobs * 4)))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(_run_file, tasks, chunksize=chunksize)
+
+
+def run_batch(
+    paths: Iterable[str | Path],
+    jobs: int | None = None,
+    parser: str = "descent",
+    cache: bool = True,
+    output_format: str = "text",
+    stdout: TextIO | None = None,
+    stderr: TextIO | None = None,
+) -> BatchSummary:
+    """
+    Runs every file in ``paths`` (see :func:`collect_files`) with ``jobs`` worker
+    processes, one per CPU by default.
+
+    The output of each file is written to ``stdout`` and ``stderr`` in input order,
+    under a banner with its name in the text format, or as one continuous table in
+    the other formats. Nothing is written if both are ``None``.
+    """
+    filenames = [str(path) for path in collect_files(paths)]
+    jobs = jobs or cpu_count() or 1
+    summary = BatchSummary([], [])
+    if stdout is not None:
+        stdout.writelines(RENDERERS[output_format]().render_header())
+    for result in _results(filenames, jobs, parser, cache, output_format):
+        if stdout is not None:
+            if output_format == "text":
+                stdout.write(pretty_str(f"Running {result.filename}") + "\n")
+            stdout.write(result.stdout)
+            stdout.flush()
+        if stderr is not None and result.stderr:
+            stderr.write(result.stderr)
+            stderr.flush()
+        (summary.failed if result.failed else summary.succeeded).append(result.filename)
+    return summary
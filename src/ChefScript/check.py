@@ -0,0 +1,221 @@
+"""
+Checking programmes for errors without running them.
+
+``ChefScript check`` parses and resolves a programme, but never scales or renders a
+recipe, and doesn't stop at the first error. A source that doesn't parse is parsed
+again one top-level statement at a time, like with ``--stream``, so every statement
+with a syntax error is reported and the others are still checked. Then every
+statement is resolved in order, reporting each recipe used before it is defined,
+each ``cook`` statement of an undefined recipe and each ``with`` scale naming an
+ingredient the recipe doesn't use. A recipe is defined even if it uses undefined
+recipes, and so is a recipe whose definition doesn't parse, with unknown ingredients,
+so that one mistake isn't reported again by every statement using the recipe.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from re import compile as re_compile
+from typing import Hashable, NamedTuple, Sequence
+
+from pychef import Ingredient as PychefIngredient, Recipe as PychefRecipe
+from pychef.graph import definition_key, dependencies
+
+from .compiled import MAGIC
+from .interpreter import ChefScriptInterpreter, _decode
+from .statements import Cook, Include
+from .utils import (
+    ChefScriptErrorWithPosition,
+    ChefScriptException,
+    ChefScriptRuntimeError,
+    ChefScriptSyntaxError,
+    SourceMap,
+)
+from .watch import _split_statements
+
+__all__ = ["Checker"]
+
+_HEADER = re_compile(r"(?!(?:cook|include)(?![A-Za-z0-9_$]))[^()\n]*")
+
+
+class _Unparsed(NamedTuple):
+    """A recipe whose definition doesn't parse"""
+
+    name: str
+
+
+_Statements = list[
+    tuple[SourceMap, Sequence[PychefRecipe | Cook | Include | _Unparsed]]
+]
+"""Parsed statements, with the source map of the chunk they were parsed from"""
+
+
+def _recipe_name(chunk: str) -> str:
+    """The recipe a chunk that doesn't parse defines, or "" if it isn't a recipe"""
+    match = _HEADER.match(chunk)
+    return "" if match is None else match.group().strip()
+
+
+def _line_and_column(error: ChefScriptException) -> tuple[int, int]:
+    if isinstance(error, ChefScriptErrorWithPosition):
+        return error.pos.line, error.pos.col
+    return 0, 0
+
+
+class Checker:
+    """
+    Checks files with ``interpreter``, whose parser, modules and cache setting it
+    uses. Nothing is printed; :meth:`check_file` returns the errors.
+    """
+
+    def __init__(self, interpreter: ChefScriptInterpreter) -> None:
+        self.interpreter = interpreter
+        self._names: dict[Hashable, frozenset[str] | None] = {}
+        """
+        The names of the ingredients of each recipe definition, when needed, or
+        ``None`` if it uses a recipe that doesn't parse or isn't defined
+        """
+        self._unparsed: set[Hashable] = set()
+        """Recipes that don't parse, and placeholders of recipes that aren't defined"""
+
+    def check_file(self, filename: str) -> list[ChefScriptException]:
+        """
+        Returns the errors in the file ``filename``, or a compiled programme, in
+        the order of their positions. Raises ``OSError`` if it can't be read.
+        """
+        interpreter = self.interpreter
+        interpreter.filename = filename
+        interpreter.recipes.clear()
+        interpreter.included.clear()
+        self._names.clear()
+        self._unparsed.clear()
+        errors: list[ChefScriptException] = []
+        try:
+            statements = self._parse(Path(filename).resolve(), errors)
+        except ChefScriptException as e:
+            return [e]
+
+        for source_map, chunk in statements:
+            interpreter.code = source_map.source
+            interpreter.source_map = source_map
+            for stmt in chunk:
+                try:
+                    if isinstance(stmt, PychefRecipe):
+                        self._add_recipe(stmt, errors)
+                    elif isinstance(stmt, Include):
+                        interpreter._include(stmt)
+                    elif isinstance(stmt, _Unparsed):
+                        recipe = PychefRecipe(stmt.name, [])
+                        self._unparsed.add(definition_key(recipe))
+                        interpreter.recipes[stmt.name] = recipe
+                    else:
+                        self._cook(stmt)
+                except ChefScriptException as e:
+                    errors.append(e)
+        # syntax errors were found first
+        errors.sort(key=_line_and_column)
+        return errors
+
+    def _parse(self, path: Path, errors: list[ChefScriptException]) -> _Statements:
+        """
+        The statements of the file at ``path``, parsing it as a whole if it can, and
+        else one top-level statement at a time, adding their syntax errors to
+        ``errors``
+        """
+        interpreter = self.interpreter
+        source = path.read_bytes()
+        try:
+            statements = interpreter._load(path, source, interpreter.cache)
+            return [(interpreter.source_map, statements)]
+        except ChefScriptSyntaxError:
+            if source.startswith(MAGIC):
+                raise
+
+        result: _Statements = []
+        for line_offset, text in _split_statements(_decode(source), 0):
+            interpreter.code = text
+            interpreter.source_map = SourceMap(text.expandtabs(), line_offset)
+            try:
+                with interpreter._phase("parse"):
+                    result.append((interpreter.source_map, interpreter._parse(text)))
+            except ChefScriptSyntaxError as e:
+                errors.append(e)
+                name = _recipe_name(text)
+                if name:
+                    result.append((interpreter.source_map, [_Unparsed(name)]))
+        return result
+
+    def _add_recipe(self, recipe: PychefRecipe, errors: list[ChefScriptException]):
+        """Like :meth:`ChefScriptInterpreter._add_recipe`, reporting every error."""
+        interpreter = self.interpreter
+        interpreter.pos = interpreter.source_map.position(recipe.idx)  # type: ignore
+        undefined: dict[str, None] = {}
+        with interpreter._phase("resolve", interpreter.pos, recipe.name):
+            for item in recipe.instructions.items:
+                if not isinstance(item, PychefRecipe):
+                    continue
+                if item.name in interpreter.recipes:
+                    item.instructions = interpreter.recipes[item.name].instructions
+                else:
+                    undefined[item.name] = None
+                    # its ingredients are unknown, like those of a recipe that
+                    # doesn't parse
+                    self._unparsed.add(definition_key(item))
+            interpreter.recipes[recipe.name] = recipe
+        for name in undefined:
+            errors.append(
+                ChefScriptRuntimeError(
+                    f"Recipe '{name}' used in '{recipe.name}' is not defined yet",
+                    interpreter.filename,
+                    interpreter.pos,
+                    interpreter.source_map,
+                )
+            )
+
+    def _cook(self, cook: Cook):
+        """Checks ``cook`` the way the interpreter would before cooking it."""
+        interpreter = self.interpreter
+        interpreter.pos = interpreter.source_map.position(cook.idx)  # type: ignore
+        interpreter._check_defined(cook.recipe_name)
+        ingredient = cook.scale
+        if not isinstance(ingredient, PychefIngredient):
+            return
+        names = self._ingredient_names(interpreter.recipes[cook.recipe_name])
+        if names is not None and ingredient.name not in names:
+            raise ChefScriptRuntimeError(
+                f"Ingredient '{ingredient.name}' "
+                f"is not in recipe '{cook.recipe_name}'",
+                interpreter.filename,
+                interpreter.pos,
+                interpreter.source_map,
+            )
+
+    def _ingredient_names(self, recipe: PychefRecipe) -> frozenset[str] | None:
+        """
+        The names of the ingredients in the summary of ``recipe``, found without
+        summarising it, or ``None`` if they are unknown
+        """
+        names = self._names
+        stack = [recipe]
+        while stack:
+            top = stack[-1]
+            if definition_key(top) in names:
+                stack.pop()
+                continue
+            used = dependencies(top)
+            missing = [r for r in used if definition_key(r) not in names]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            key = definition_key(top)
+            own: frozenset[str] | None = None
+            if key not in self._unparsed:
+                own = frozenset(
+                    item for item in top.instructions.items if isinstance(item, str)
+                )
+            for r in used:
+                other = names[definition_key(r)]
+                own = None if own is None or other is None else own | other
+            names[key] = own
+        return names[definition_key(recipe)]
@@ -0,0 +1,266 @@
+"""
+Compiled ChefScript programmes.
+
+A compiled programme holds the parsed statements of a source file, so that running it
+again skips parsing. It is a magic number followed by a :mod:`marshal` payload, like
+a ``.pyc`` file, and records the units it uses, so loading it needs neither the parser
+nor ``quantities``.
+
+Compiled programmes are written explicitly by ``ChefScript compile``, and implicitly
+to a ``__chefcache__`` directory next to every source file that is run, keyed by a
+hash of the source and the version of ChefScript.
+"""
+
+from __future__ import annotations
+
+import marshal
+from collections import OrderedDict
+from hashlib import blake2b
+from os import PathLike, getpid, replace
+from pathlib import Path
+from typing import Any, Sequence
+
+from pychef import (
+    Ingredient as PychefIngredient,
+    Quantity as PychefQuantity,
+    Recipe as PychefRecipe,
+)
+from pychef.instructions import Instructions
+from pychef.units import registry
+
+from .statements import Cook, Include, RecipeDefinition
+from .utils import chefscript_version
+
+__all__ = [
+    "MAGIC",
+    "CompiledProgram",
+    "cache_path",
+    "load_cached",
+    "load_recipes",
+    "source_hash",
+    "write_cached",
+]
+
+MAGIC = b"CHEFC\x00\x03\r\n"
+"""First bytes of every compiled programme; the last byte is the format version"""
+
+CACHE_DIRECTORY = "__chefcache__"
+
+_RECIPE = 0
+_COOK = 1
+_INCLUDE = 2
+
+Statement = PychefRecipe | Cook | Include
+
+
+def source_hash(source: bytes) -> bytes:
+    return blake2b(source, digest_size=16).digest()
+
+
+class CompiledProgram:
+    """
+    The statements of a programme, in order, and the start index of every line of its
+    tab-expanded source, for error positions.
+
+    ``source_hash`` is the :func:`source_hash` of the source it was compiled from.
+    """
+
+    __slots__ = ("statements", "line_starts", "source_hash")
+
+    def __init__(
+        self,
+        statements: Sequence[Statement],
+        line_starts: Sequence[int],
+        source_hash: bytes = b"",
+    ) -> None:
+        self.statements = list(statements)
+        self.line_starts = list(line_starts)
+        self.source_hash = source_hash
+
+    def dumps(self) -> bytes:
+        unit_indices: dict[int, int] = {}
+
+        def unit_index(unit_id: int) -> int:
+            return unit_indices.setdefault(unit_id, len(unit_indices))
+
+        statements: list[tuple] = []
+        for stmt in self.statements:
+            if isinstance(stmt, PychefRecipe):
+                instructions: list[tuple] = []
+                columns = stmt.instructions
+                for item, value, unit_id, comment in zip(
+                    columns.items,
+                    columns.values.tolist(),
+                    columns.unit_ids.tolist(),
+                    columns.comments,
+                ):
+                    if isinstance(item, str):
+                        instructions.append((item, value, unit_index(unit_id), comment))
+                    else:
+                        instructions.append((item.name, comment))
+                statements.append(
+                    (_RECIPE, stmt.name, stmt.idx, tuple(instructions))  # type: ignore
+                )
+            elif isinstance(stmt, Include):
+                statements.append((_INCLUDE, stmt.path, stmt.idx))
+            else:
+                scale: Any = stmt.scale
+                if isinstance(scale, PychefIngredient):
+                    scale = (
+                        scale.name,
+                        scale.quantity.value,
+                        unit_index(scale.quantity.unit_id),
+                    )
+                elif isinstance(scale, tuple):
+                    # a pantry, as a list to tell it from an ingredient
+                    scale = [
+                        (i.name, i.quantity.value, unit_index(i.quantity.unit_id))
+                        for i in scale
+                    ]
+                statements.append((_COOK, stmt.recipe_name, stmt.idx, scale))
+
+        units = tuple(registry.describe(unit_id) for unit_id in unit_indices)
+        payload = (
+            chefscript_version(),
+            self.source_hash,
+            self.line_starts,
+            units,
+            tuple(statements),
+        )
+        return MAGIC + marshal.dumps(payload)
+
+    @classmethod
+    def loads(cls, data: bytes) -> CompiledProgram:
+        """
+        Raises ``ValueError`` if ``data`` is not a programme compiled by this version
+        of ChefScript.
+        """
+        if not data.startswith(MAGIC):
+            raise ValueError("Not a compiled ChefScript programme")
+        try:
+            version, hash_, line_starts, units, raw_statements = marshal.loads(
+                data[len(MAGIC) :]
+            )
+        except (EOFError, TypeError, ValueError):
+            raise ValueError("Corrupted compiled ChefScript programme")
+        if version != chefscript_version():
+            raise ValueError(
+                f"Programme compiled by ChefScript {version}, "
+                f"not {chefscript_version()}"
+            )
+
+        unit_ids = [registry.register(*unit) for unit in units]
+
+        statements: list[Statement] = []
+        for raw in raw_statements:
+            if raw[0] == _RECIPE:
+                _, name, idx, raw_instructions = raw
+                items: list[str | PychefRecipe] = []
+                values: list[float] = []
+                instruction_units: list[int] = []
+                comments: list[str | None] = []
+                for instruction in raw_instructions:
+                    if len(instruction) == 2:
+                        items.append(PychefRecipe(instruction[0], []))
+                        values.append(0.0)
+                        instruction_units.append(-1)
+                    else:
+                        items.append(instruction[0])
+                        values.append(instruction[1])
+                        instruction_units.append(unit_ids[instruction[2]])
+                    comments.append(instruction[-1])
+                instructions = Instructions.from_columns(
+                    items, values, instruction_units, comments
+                )
+                statements.append(RecipeDefinition(name, instructions, idx))
+            elif raw[0] == _INCLUDE:
+                statements.append(Include(raw[1], raw[2]))
+            else:
+                _, recipe_name, idx, scale = raw
+                if isinstance(scale, tuple):
+                    ingredient_name, value, unit = scale
+                    scale = PychefIngredient(
+                        ingredient_name, PychefQuantity._from_id(value, unit_ids[unit])
+                    )
+                elif isinstance(scale, list):
+                    scale = tuple(
+                        PychefIngredient(
+                            ingredient_name,
+                            PychefQuantity._from_id(value, unit_ids[unit]),
+                        )
+                        for ingredient_name, value, unit in scale
+                    )
+                statements.append(Cook(recipe_name, scale, idx))
+
+        return cls(statements, line_starts, hash_)
+
+    @classmethod
+    def load(cls, path: str | PathLike) -> CompiledProgram:
+        return cls.loads(Path(path).read_bytes())
+
+
+def cache_path(source_path: Path) -> Path:
+    """Where the compiled programme of ``source_path`` is cached."""
+    return source_path.parent / CACHE_DIRECTORY / f"{source_path.name}.chefc"
+
+
+def load_cached(source_path: Path, source: bytes) -> CompiledProgram | None:
+    """
+    Returns the cached compiled programme of ``source_path``, or ``None`` if there is
+    none for its current ``source``.
+    """
+    try:
+        program = CompiledProgram.load(cache_path(source_path))
+    except Exception:
+        # a stale or damaged cache is just a miss
+        return None
+    return program if program.source_hash == source_hash(source) else None
+
+
+def write_cached(source_path: Path, program: CompiledProgram) -> None:
+    """
+    Caches ``program`` for ``source_path``. The file is replaced atomically, and
+    failing to write it (for example in a read-only directory) is not an error.
+    """
+    path = cache_path(source_path)
+    tmp_path = path.with_name(f"{path.name}.{getpid()}.tmp")
+    try:
+        path.parent.mkdir(exist_ok=True)
+        tmp_path.write_bytes(program.dumps())
+        replace(tmp_path, path)
+    except OSError:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
+def load_recipes(path: str | PathLike) -> OrderedDict[str, PychefRecipe]:
+    """
+    Returns the recipes defined in the compiled programme at ``path``, by name, with
+    the recipes they use resolved, like the interpreter would before the first
+    ``cook`` statement, and the recipes of the files it includes. ``cook`` statements
+    are ignored.
+
+    Raises ``ValueError`` if a recipe uses one that is not defined before it.
+    """
+    recipes: OrderedDict[str, PychefRecipe] = OrderedDict()
+    for stmt in CompiledProgram.load(path).statements:
+        if isinstance(stmt, Include):
+            # modules import the interpreter, which imports this module
+            from .modules import MODULES
+
+            module = MODULES.load(Path(path).parent / stmt.path)
+            recipes.update(module.recipes)
+            continue
+        if not isinstance(stmt, PychefRecipe):
+            continue
+        for item in stmt.instructions.items:
+            if isinstance(item, PychefRecipe):
+                if item.name not in recipes:
+                    raise ValueError(
+                        f"Recipe '{item.name}' used in '{stmt.name}' is not defined yet"
+                    )
+                item.instructions = recipes[item.name].instructions
+        recipes[stmt.name] = stmt
+    return recipes
@@ -0,0 +1,445 @@
+"""
+A hand-written, single-pass recursive-descent backend for ChefScript.
+
+It accepts exactly the language described by the pyparsing grammar in
+:mod:`ChefScript.parser`, builds the same ``PychefRecipe`` and ``Cook`` objects and
+reports errors at the same positions, but never backtracks over more than one token,
+so it runs in time linear in the size of the source.
+
+Its error messages are deliberately not pyparsing's: they name what was expected, like
+``Invalid quantity``, ``Expected name`` or ``Denominator must not be zero``, where
+pyparsing prints the grammar expression that failed, like ``Expected {...}``, or
+``Found unwanted token``. Only the positions of errors are the same, which is what
+``make parity`` checks on the files in ``tests/errors``.
+"""
+
+from __future__ import annotations
+
+from re import compile as re_compile
+from sys import intern
+from typing import Any, Callable
+
+from regex import compile as regex_compile
+
+from pychef import (
+    Ingredient as PychefIngredient,
+    Quantity as PychefQuantity,
+    Recipe as PychefRecipe,
+)
+
+from .statements import Cook, Include, RecipeDefinition
+
+__all__ = ["ChefScriptDescentParser", "DescentParseError", "Tokenizer"]
+
+_IDENT = r"[A-Za-z0-9_$]"  # pyparsing's ``Keyword.DEFAULT_KEYWORD_CHARS``
+_KEYWORD = rf"(?<!{_IDENT})(?:of|cook|for|times|with)(?!{_IDENT})"
+_ENDER = rf"[\n()]|{_KEYWORD}"
+_WORD = r"[^\p{C}\p{Z}]+"
+_FLOAT = r"[+-]?\d+\.?\d*(?:[eE][+-]?\d+)?"
+_PATH_WORD = r"[^\p{C}\p{Z}()]+"
+
+
+class DescentParseError(Exception):
+    """
+    Raised by :class:`ChefScriptDescentParser` on invalid input.
+
+    Mirrors the ``msg``, ``loc``, ``lineno`` and ``col`` attributes of
+    ``pyparsing.ParseBaseException``, so that both backends are reported alike.
+    """
+
+    def __init__(self, pstr: str, loc: int, msg: str, fatal: bool = False) -> None:
+        super().__init__(msg)
+        self.pstr = pstr
+        self.loc = loc
+        self.msg = msg
+        self.fatal = fatal
+
+    def __str__(self) -> str:
+        return f"{self.msg}, (line:{self.lineno}, col:{self.col})"
+
+    @property
+    def lineno(self) -> int:
+        return self.pstr.count("\n", 0, self.loc) + 1
+
+    @property
+    def col(self) -> int:
+        return self.loc - self.pstr.rfind("\n", 0, self.loc)
+
+
+class Tokenizer:
+    """
+    Matches the lexical elements of ChefScript at a given position of the source.
+
+    Every ``match_*`` method skips leading spaces and tabs the way pyparsing does and
+    returns ``(end, value)`` on success. On failure it returns ``None`` and records
+    where and why in ``err_loc`` and ``err_msg``, which the parser uses to report the
+    same position as the pyparsing grammar.
+    """
+
+    whitespace = re_compile(r"[ \t]*")
+    keywords = {
+        keyword: re_compile(rf"(?<!{_IDENT}){keyword}(?!{_IDENT})")
+        for keyword in ("of", "cook", "for", "times", "with", "include", "pantry")
+    }
+    variable_name = regex_compile(rf"(?!{_ENDER}){_WORD}(?:[ \t]+(?!{_ENDER}){_WORD})*")
+    single_number = re_compile(rf"({_FLOAT})(?:[ \t]*/[ \t]*({_FLOAT}))?")
+    comment_text = re_compile(r"[^)]+")
+    path = regex_compile(rf"{_PATH_WORD}(?:[ \t]+{_PATH_WORD})*")
+    # an optional comment, then a line indented deeper than column 1
+    indented_body = re_compile(
+        r"[ \t]*(?:\([ \t]*(?=[^ \t)])[^)]+\)[ \t]*)?\n(?:[ \t]*\n)*[ \t]+[^ \t\n]"
+    )
+
+    s: str
+    n: int
+    err_loc: int
+    err_msg: str
+
+    def __init__(self, string: str) -> None:
+        self.s = string
+        self.n = len(string)
+        self.err_loc = -1
+        self.err_msg = ""
+
+    def fail(self, loc: int, msg: str) -> Any:
+        """Records a failure at ``loc`` and returns ``None``."""
+        self.err_loc = loc
+        self.err_msg = msg
+        return None
+
+    def fatal(self, loc: int, msg: str) -> DescentParseError:
+        return DescentParseError(self.s, loc, msg, fatal=True)
+
+    def skip(self, loc: int) -> int:
+        return self.whitespace.match(self.s, loc).end()  # type: ignore[union-attr]
+
+    def match_newline(self, loc: int) -> int | None:
+        loc = self.skip(loc)
+        if loc < self.n and self.s[loc] == "\n":
+            return loc + 1
+        return self.fail(loc, "Expected '\\n'")
+
+    def match_newlines(self, loc: int) -> int:
+        """Zero or more newlines, possibly surrounded by spaces and tabs."""
+        s = self.s
+        while True:
+            end = self.skip(loc)
+            if end < self.n and s[end] == "\n":
+                loc = end + 1
+            else:
+                return loc
+
+    def match_keyword(self, loc: int, keyword: str) -> int | None:
+        loc = self.skip(loc)
+        m = self.keywords[keyword].match(self.s, loc)
+        if m is None:
+            return self.fail(loc, f"Expected '{keyword}'")
+        return m.end()
+
+    def match_variable_name(self, loc: int) -> tuple[int, str] | None:
+        loc = self.skip(loc)
+        m = self.variable_name.match(self.s, loc)
+        if m is None:
+            return self.fail(loc, "Expected name")
+        return m.end(), " ".join(m.group().split())
+
+    def match_number(self, loc: int) -> tuple[int, float] | None:
+        s = self.s
+        loc = self.skip(loc)
+        m = self.single_number.match(s, loc)
+        if m is None:
+            return self.fail(loc, "Expected number")
+        numbers = []
+        while m is not None:
+            numerator, denominator = m.group(1, 2)
+            if denominator is None:
+                numbers.append(float(numerator))
+            elif float(denominator) == 0:
+                raise self.fatal(m.start(), "Denominator must not be zero")
+            else:
+                numbers.append(float(numerator) / float(denominator))
+            loc = m.end()
+            m = self.single_number.match(s, self.skip(loc))
+        return loc, sum(numbers)
+
+    def match_path(self, loc: int) -> tuple[int, str] | None:
+        loc = self.skip(loc)
+        m = self.path.match(self.s, loc)
+        if m is None:
+            return self.fail(loc, "Expected path")
+        return m.end(), m.group()
+
+    def match_comment(self, loc: int) -> tuple[int, str] | None:
+        s = self.s
+        loc = self.skip(loc)
+        if loc >= self.n or s[loc] != "(":
+            return self.fail(loc, "Expected '('")
+        loc = self.skip(loc + 1)
+        m = self.comment_text.match(s, loc)
+        if m is None:
+            return self.fail(loc, "Expected comment text")
+        loc = m.end()
+        if loc >= self.n:
+            return self.fail(loc, "Expected ')'")
+        return loc + 1, m.group()
+
+
+class ChefScriptDescentParser(Tokenizer):
+    """
+    Recursive-descent counterpart of :class:`ChefScript.parser.ChefScriptParser`.
+
+    Each ``parse_*`` method implements the rule of the same name in the pyparsing
+    grammar, with the same ordered choices and the same error positions.
+    """
+
+    errors = (DescentParseError,)
+
+    @classmethod
+    def parse(cls, string: str) -> list[list[PychefRecipe | Cook | Include]]:
+        # pyparsing reports positions in the tab-expanded string
+        return cls(string.expandtabs()).parse_chef_script()
+
+    def parse_chef_script(self) -> list[list[PychefRecipe | Cook | Include]]:
+        statements: list[list[PychefRecipe | Cook | Include]] = []
+        loc = self.match_newlines(0)
+        first = True
+        while True:
+            result = self.parse_stmt(loc)
+            if result is None:
+                if first:
+                    # the first statement is not optional, so its error is final
+                    raise DescentParseError(self.s, self.err_loc, self.err_msg)
+                break
+            first = False
+            loc, stmt = result
+            if stmt is not None:
+                statements.append([stmt])
+            loc = self.match_newlines(loc)
+        loc = self.skip(loc)
+        if loc != self.n:
+            raise DescentParseError(self.s, loc, "Expected end of text")
+        return statements
+
+    def parse_stmt(
+        self, loc: int
+    ) -> tuple[int, PychefRecipe | Cook | Include | None] | None:
+        start = self.skip(loc)
+        comment = self.match_comment(start)
+        if comment is not None:
+            return comment[0], None
+        max_loc, max_msg = self.err_loc, self.err_msg
+
+        result: tuple[int, Any] | None = self.parse_include(start)
+        if result is None:
+            if self.err_loc > max_loc:
+                max_loc, max_msg = self.err_loc, self.err_msg
+            result = self.parse_recipe(start)
+        if result is None:
+            if self.err_loc > max_loc:
+                max_loc, max_msg = self.err_loc, self.err_msg
+            result = self.parse_cook_statement(start)
+        if result is None:
+            if self.err_loc > max_loc:
+                max_loc, max_msg = self.err_loc, self.err_msg
+            if max_loc == start:
+                max_msg = "Expected include, recipe or cook statement"
+            return self.fail(max_loc, max_msg)
+
+        loc, stmt = result
+        comment = self.match_comment(loc)
+        if comment is not None:
+            loc = comment[0]
+        return loc, stmt
+
+    def parse_include(self, loc: int) -> tuple[int, Include] | None:
+        start = self.skip(loc)
+        include = self.match_keyword(start, "include")
+        if include is None:
+            return None
+        path = self.match_path(include)
+        if path is None:
+            return None
+        if self.indented_body.match(self.s, path[0]):
+            # the start of a recipe named ``include ...``
+            return self.fail(path[0], "Found unwanted token")
+        return path[0], Include(path[1], start)
+
+    def parse_recipe(self, loc: int) -> tuple[int, PychefRecipe] | None:
+        start = self.skip(loc)
+        name = self.match_variable_name(start)
+        if name is None:
+            return None
+        loc, recipe_name = name
+        comment = self.match_comment(loc)
+        if comment is not None:
+            loc = comment[0]
+        newline = self.match_newline(loc)
+        if newline is None:
+            return None
+        loc = self.match_newlines(newline)
+        body = self.parse_recipe_body(loc)
+        if body is None:
+            return None
+        loc, instructions = body
+        return loc, RecipeDefinition(recipe_name, instructions, start)
+
+    def parse_recipe_body(
+        self, loc: int
+    ) -> tuple[int, list[tuple[PychefIngredient | PychefRecipe, str | None]]] | None:
+        return self.parse_block(loc, self.parse_recipe_line)
+
+    def parse_block(
+        self, loc: int, parse_line: Callable[[int], tuple[int, Any] | None]
+    ) -> tuple[int, list[Any]] | None:
+        """
+        Lines indented like the first one, each parsed by ``parse_line``, like
+        pyparsing's ``IndentedBlock``. Lines parsed as ``None`` are left out.
+        """
+        anchor = self.skip(loc)
+        try:
+            line = parse_line(anchor)
+        except DescentParseError as e:
+            # pyparsing's ``IndentedBlock`` tries its first line without fatal errors
+            return self.fail(anchor, e.msg)
+        if line is None:
+            return None
+
+        s = self.s
+        indent_col = anchor - s.rfind("\n", 0, anchor)
+        items = []
+        while line is not None:
+            loc, item = line
+            if item is not None:
+                items.append(item)
+            start = self.skip(loc)
+            if start - s.rfind("\n", 0, start) != indent_col:
+                break
+            line = parse_line(start)
+        return loc, items
+
+    def parse_recipe_line(
+        self, loc: int
+    ) -> tuple[int, tuple[PychefIngredient | PychefRecipe, str | None] | None] | None:
+        loc = self.match_newlines(loc)
+        instruction: tuple[PychefIngredient | PychefRecipe, str | None] | None = None
+
+        comment = self.match_comment(loc)
+        if comment is not None:
+            loc = comment[0]
+        else:
+            item: PychefIngredient | PychefRecipe | None = None
+            ingredient = self.parse_ingredient(loc)
+            if ingredient is not None:
+                loc, item = ingredient
+            else:
+                name = self.match_variable_name(loc)
+                if name is not None:
+                    loc, recipe_name = name
+                    item = PychefRecipe(recipe_name, [])
+            comment = self.match_comment(loc)
+            text = None
+            if comment is not None:
+                loc, text = comment
+            if item is not None:
+                instruction = (item, text)
+
+        newline = self.match_newline(loc)
+        if newline is None:
+            return None
+        return self.match_newlines(newline), instruction
+
+    def parse_quantity(self, loc: int) -> tuple[int, PychefQuantity] | None:
+        start = self.skip(loc)
+        number = self.match_number(start)
+        if number is None:
+            return None
+        loc, value = number
+        unit = self.match_variable_name(loc)
+        if unit is None:
+            return None
+        loc, unit_name = unit
+        try:
+            quantity = PychefQuantity(value, unit_name)
+        except Exception:
+            raise self.fatal(start, "Invalid quantity")
+        return loc, quantity
+
+    def parse_ingredient(self, loc: int) -> tuple[int, PychefIngredient] | None:
+        quantity = self.parse_quantity(loc)
+        if quantity is None:
+            return None
+        loc, q = quantity
+        of = self.match_keyword(loc, "of")
+        if of is None:
+            return None
+        name = self.match_variable_name(of)
+        if name is None:
+            return None
+        loc, ingredient_name = name
+        return loc, PychefIngredient(ingredient_name, q)
+
+    def parse_cook_statement(self, loc: int) -> tuple[int, Cook] | None:
+        start = self.skip(loc)
+        cook = self.match_keyword(start, "cook")
+        if cook is None:
+            return None
+        name = self.match_variable_name(cook)
+        if name is None:
+            return None
+        loc, recipe_name = name
+
+        scale: float | PychefIngredient | tuple[PychefIngredient, ...] | None = None
+        for_ = self.match_keyword(loc, "for")
+        if for_ is not None:
+            number = self.match_number(for_)
+            if number is not None:
+                times = self.match_keyword(number[0], "times")
+                if times is not None:
+                    loc, scale = times, number[1]
+        if scale is None:
+            with_ = self.match_keyword(loc, "with")
+            if with_ is not None:
+                ingredient = self.parse_ingredient(with_)
+                if ingredient is not None:
+                    loc, scale = ingredient
+                else:
+                    pantry = self.parse_pantry(with_)
+                    if pantry is not None:
+                        loc, scale = pantry
+
+        return loc, Cook(intern(recipe_name), scale, start)
+
+    def parse_pantry(self, loc: int) -> tuple[int, tuple[PychefIngredient, ...]] | None:
+        pantry = self.match_keyword(loc, "pantry")
+        if pantry is None:
+            return None
+        loc = pantry
+        comment = self.match_comment(loc)
+        if comment is not None:
+            loc = comment[0]
+        newline = self.match_newline(loc)
+        if newline is None:
+            return None
+        body = self.parse_block(self.match_newlines(newline), self.parse_pantry_line)
+        if body is None:
+            return None
+        return body[0], tuple(body[1])
+
+    def parse_pantry_line(self, loc: int) -> tuple[int, PychefIngredient | None] | None:
+        loc = self.match_newlines(loc)
+        ingredient: PychefIngredient | None = None
+        comment = self.match_comment(loc)
+        if comment is not None:
+            loc = comment[0]
+        else:
+            result = self.parse_ingredient(loc)
+            if result is None:
+                return None
+            loc, ingredient = result
+            comment = self.match_comment(loc)
+            if comment is not None:
+                loc = comment[0]
+        newline = self.match_newline(loc)
+        if newline is None:
+            return None
+        return self.match_newlines(newline), ingredient
@@ -1,123 +1,517 @@
+import sys
 from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from sys import stderr, stdin
+from time import perf_counter
+from typing import ContextManager, Iterable, Iterator, TextIO
 
-from pyparsing.exceptions import ParseBaseException
+from pychef import AttributeTable, IngredientIndex, Recipe as PychefRecipe
 
-from pychef import Recipe as PychefRecipe
-
-from .parser import ChefScriptParser, Cook
+from .backends import PARSERS, ParserBackend, load_parser
+from .compiled import MAGIC, CompiledProgram, load_cached, source_hash, write_cached
+from .memo import CookCache
+from .modules import MODULES, IncludeError, Module, ModuleCache
+from .parallel import PARALLEL_MIN_SIZE, ParallelSyntaxError, parse_in_parallel
+from .profiling import Hook, ProfileEvent
+from .render import RENDERERS, LineWriter, Renderer
+from .statements import Cook, Include
+from .stream import read_lines, split_statements, universal_newlines
 from .utils import (
-    MAX_TERMINTAL_WIDTH,
     ChefScriptException,
     ChefScriptInternalError,
     ChefScriptRuntimeError,
     ChefScriptSyntaxError,
     Position,
-    index_to_position,
-    pretty_str,
+    SourceMap,
 )
 
+__all__ = ["PARSERS", "ChefScriptInterpreter"]
+
+_UNTIMED = nullcontext()
+
+
+def _decode(source: bytes) -> str:
+    """Decodes a UTF-8 source with universal newlines, like ``Path.read_text``."""
+    return universal_newlines(source.decode("utf-8"))
+
 
 class ChefScriptInterpreter:
     recipes: OrderedDict[str, PychefRecipe]
     pos: Position
     filename: str
     code: str
+    source_map: SourceMap
+    parser_name: str
+    stdout: TextIO
+    """Where cooked recipes are printed"""
+    stderr: TextIO
+    """Where errors are printed"""
+    failed: bool
+    """Whether an error has been printed"""
+    renderer: Renderer
+    modules: ModuleCache
+    """Where included files are loaded from"""
+    included: list[Module]
+    """Modules included so far, in order"""
+    cache: bool
+    """Whether parsed sources are cached on disk, including those of included files"""
+    jobs: int
+    """
+    How many processes parse a source, if it is large enough; see
+    :mod:`ChefScript.parallel`
+    """
+    index: IngredientIndex | None
+    """
+    If set, every recipe defined or included is indexed in it by the ingredients it
+    uses, directly or not
+    """
+    cook_cache: CookCache
+    """The output of recent ``cook`` statements, reused by those cooking the same"""
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        parser: str = "descent",
+        stdout: TextIO | None = None,
+        stderr: TextIO | None = None,
+        output_format: str = "text",
+        header: bool = True,
+        modules: ModuleCache | None = None,
+        attributes: AttributeTable | None = None,
+    ) -> None:
+        """
+        ``output_format`` is the name of a renderer in :data:`RENDERERS`, and
+        ``header`` is whether it starts the output with a header, if it has one.
+        ``modules`` defaults to the modules of the process, :data:`MODULES`. With
+        ``attributes``, the renderer also shows the attributes of every cooked recipe.
+        """
+        if parser not in PARSERS:
+            raise KeyError(parser)
+        self.stdout = sys.stdout if stdout is None else stdout
+        self.stderr = sys.stderr if stderr is None else stderr
+        self.renderer = RENDERERS[output_format](header=header, attributes=attributes)
+        self._writer = LineWriter(self.stdout)
+        self.hooks: list[Hook] = []
+        self.failed = False
         self.recipes = OrderedDict()
         self.pos = Position(-1, -1)
+        self.source_map = SourceMap("")
+        self.parser_name = parser
+        self._parser: ParserBackend | None = None
+        self.modules = MODULES if modules is None else modules
+        self.included = []
+        self.cache = True
+        self.jobs = 1
+        self.index = None
+        self.cook_cache = CookCache()
+
+    def add_hook(self, hook: Hook) -> None:
+        """
+        Calls ``hook`` with a :class:`ProfileEvent` at the end of every phase of
+        running a programme (see :data:`ChefScript.profiling.PHASES`). Phases are only
+        timed while a hook is registered.
+        """
+        self.hooks.append(hook)
+
+    def _phase(
+        self, phase: str, pos: Position | None = None, name: str | None = None
+    ) -> ContextManager[None]:
+        if not self.hooks:
+            return _UNTIMED
+        return self._timed(phase, pos, name)
+
+    @contextmanager
+    def _timed(
+        self, phase: str, pos: Position | None, name: str | None
+    ) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            event = ProfileEvent(phase, perf_counter() - start, pos, name)
+            for hook in self.hooks:
+                hook(event)
+
+    @property
+    def parser(self) -> ParserBackend:
+        """The parser backend, imported the first time a source is parsed."""
+        if self._parser is None:
+            self._parser = load_parser(self.parser_name)
+        return self._parser
 
-    def interpret_file(self, filename: str):
+    def interpret_file(self, filename: str, stream: bool = False, cache: bool = True):
+        """
+        Runs a source file, or a programme compiled by :meth:`compile_file`.
+
+        Unless ``stream`` is set or ``cache`` is not, the parsed source is cached in
+        a ``__chefcache__`` directory next to it, and parsing is skipped when the
+        source hasn't changed since.
+        """
         self.filename = filename
-        self.code = Path(filename).resolve().read_text(encoding="utf-8")
-        self._interpret(self.code)
+        self.cache = cache
+        path = Path(filename).resolve()
+        if stream:
+            with path.open("rb") as file:
+                self._interpret_stream(read_lines(file))
+            return
+
+        source = path.read_bytes()
+        if source.startswith(MAGIC) or cache:
+            with self._reporting_errors():
+                self._run(self._load(path, source, cache))
+        else:
+            self._interpret(_decode(source))
 
-    def interpret_stdin(self):
+    def interpret_stdin(self, stream: bool = False):
         self.filename = "<stdin>"
-        self.code = stdin.read()
-        self._interpret(self.code)
+        if stream:
+            self._interpret_stream(sys.stdin)
+        else:
+            self.code = sys.stdin.read()
+            self._interpret(self.code)
+
+    def compile_file(self, filename: str, output: str) -> bool:
+        """
+        Parses a source file and writes it as a compiled programme to ``output``.
+
+        Returns whether it compiled, printing the syntax error if it didn't.
+        """
+        self.filename = filename
+        source = Path(filename).resolve().read_bytes()
+        with self._reporting_errors():
+            program = self._compile(_decode(source), source)
+            Path(output).write_bytes(program.dumps())
+            return True
+        return False
+
+    def index_file(self, filename: str, cache: bool = True) -> IngredientIndex:
+        """
+        Defines the recipes of a source file, or a compiled programme, without running
+        its ``cook`` statements, and returns the index of their ingredients.
+
+        Raises the errors a run would print, and ``OSError`` if the file can't be read.
+        """
+        self.filename = filename
+        self.cache = cache
+        self.recipes.clear()
+        self.included.clear()
+        self.index = IngredientIndex()
+        path = Path(filename).resolve()
+        for stmt in self._load(path, path.read_bytes(), cache):
+            if isinstance(stmt, PychefRecipe):
+                self._add_recipe(stmt)
+            elif isinstance(stmt, Include):
+                self._include(stmt)
+        return self.index
 
     def _interpret(self, code: str):
-        if not code.strip():
-            return
-        elif not code.endswith("\n"):
-            code += "\n"
+        self._interpret_chunks([(0, code)])
+
+    def _interpret_stream(self, lines: Iterable[str]):
+        """
+        Parses and runs one top-level statement at a time, so that output starts
+        before the whole source is read, and only one statement is held in memory.
+        """
+        self._interpret_chunks(split_statements(lines))
+
+    def _interpret_chunks(self, chunks: Iterable[tuple[int, str]]):
+        with self._reporting_errors():
+            previous: tuple[int, str] | None = None
+            for line_offset, code in chunks:
+                with self._phase("parse"):
+                    statements = self._parse_chunk(line_offset, code, previous)
+                self._run(statements)
+                # don't hold back the output of a statement until the next one is read
+                self._writer.flush()
+                previous = line_offset, code
+
+    def _parse_chunk(
+        self, line_offset: int, code: str, previous: tuple[int, str] | None
+    ) -> list[PychefRecipe | Cook | Include]:
+        """
+        Parses the chunk ``code`` of the source, at line ``line_offset``, which
+        follows the chunk ``previous``, if any.
+        """
+        self.code = code
+        # parsers report indices into the tab-expanded source
+        self.source_map = SourceMap(code.expandtabs(), line_offset)
         try:
+            return self._parse(code)
+        except ChefScriptSyntaxError as e:
+            if previous is None:
+                raise
+            error = e
+        # the first statement of a source gets another error than a later one: parse
+        # the chunk again after the one before it, for the error the whole source
+        # would get
+        self.code = previous[1] + code
+        self.source_map = SourceMap(self.code.expandtabs(), previous[0])
+        self._parse(self.code)
+        raise error
+
+    def _load(
+        self, path: Path, source: bytes, cache: bool = True
+    ) -> list[PychefRecipe | Cook | Include]:
+        """
+        Returns the statements of the file at ``path``, whose content is ``source``:
+        a compiled programme, or a source that is parsed unless ``cache`` is set and
+        it is cached.
+        """
+        if source.startswith(MAGIC):
             try:
-                parse_result = ChefScriptParser.parse(code)
-            except ParseBaseException as e:
-                raise ChefScriptSyntaxError(
-                    e.msg,
-                    self.filename,
-                    Position(e.lineno, e.col),
+                with self._phase("load"):
+                    program = CompiledProgram.loads(source)
+            except ValueError as e:
+                raise ChefScriptInternalError(str(e), self.filename)
+            # the source isn't available, but positions still are
+            self.code = ""
+            self.source_map = SourceMap("", line_starts=program.line_starts)
+            return program.statements
+
+        if cache:
+            with self._phase("load"):
+                cached = load_cached(path, source)
+            if cached is not None:
+                self.code = _decode(source)
+                self.source_map = SourceMap(
+                    self.code.expandtabs(), line_starts=cached.line_starts
                 )
+                return cached.statements
 
-            for stmt in parse_result:
-                if len(stmt) == 1:
-                    if isinstance(stmt[0], PychefRecipe):
-                        self._add_recipe(stmt[0])
-                    elif isinstance(stmt[0], Cook):
-                        self._cook(stmt[0])
-                    else:
-                        raise ChefScriptInternalError("Parser error", self.filename)
-                elif len(stmt) >= 2:
-                    raise ChefScriptInternalError("Parser error", self.filename)
+        program = self._compile(_decode(source), source)
+        if cache:
+            write_cached(path, program)
+        return program.statements
+
+    def _compile(self, code: str, source: bytes) -> CompiledProgram:
+        self.code = code
+        self.source_map = SourceMap(code.expandtabs())
+        with self._phase("parse"):
+            statements = self._parse(code)
+        return CompiledProgram(
+            statements, self.source_map.line_starts, source_hash(source)
+        )
+
+    @contextmanager
+    def _reporting_errors(self) -> Iterator[None]:
+        """
+        Prints errors raised in the block, instead of propagating them, after the
+        output that came before them.
+        """
+        try:
+            yield
 
         except ChefScriptException as e:
-            print(e, file=stderr)
+            self.failed = True
+            self._writer.flush()
+            print(e, file=self.stderr)
+
+        except BrokenPipeError:
+            # the output was closed, like by ``| head``: that's for the caller
+            raise
 
         except Exception as e:
+            self.failed = True
+            self._writer.flush()
             new_e = ChefScriptInternalError(f"Internal error: {e}", self.filename)
-            print(new_e, file=stderr)
+            print(new_e, file=self.stderr)
+
+        finally:
+            self._writer.flush()
+
+    def _parse(self, code: str) -> list[PychefRecipe | Cook | Include]:
+        if not code.strip():
+            return []
+        elif not code.endswith("\n"):
+            code += "\n"
+        if self.jobs > 1 and len(code) >= PARALLEL_MIN_SIZE:
+            return self._parse_in_parallel(code)
+        try:
+            parse_result = self.parser.parse(code)
+        except self.parser.errors as e:
+            raise ChefScriptSyntaxError(
+                e.msg,  # type: ignore[attr-defined]
+                self.filename,
+                self.source_map.position(e.loc),  # type: ignore[attr-defined]
+                self.source_map,
+            )
+
+        statements: list[PychefRecipe | Cook | Include] = []
+        for stmt in parse_result:
+            if len(stmt) == 1 and isinstance(stmt[0], (PychefRecipe, Cook, Include)):
+                statements.append(stmt[0])
+            elif len(stmt) >= 1:
+                raise ChefScriptInternalError("Parser error", self.filename)
+        return statements
+
+    def _parse_in_parallel(self, code: str) -> list[PychefRecipe | Cook | Include]:
+        try:
+            return parse_in_parallel(code, self.parser_name, self.jobs, self.source_map)
+        except ParallelSyntaxError as e:
+            raise ChefScriptSyntaxError(
+                e.msg, self.filename, self.source_map.position(e.loc), self.source_map
+            )
+        except ValueError:
+            raise ChefScriptInternalError("Parser error", self.filename)
+
+    def _run(self, statements: Iterable[PychefRecipe | Cook | Include]):
+        for stmt in statements:
+            if isinstance(stmt, PychefRecipe):
+                self._add_recipe(stmt)
+            elif isinstance(stmt, Include):
+                self._include(stmt)
+            else:
+                self._cook(stmt)
+
+    def _include(self, include: Include):
+        """Defines the recipes of an included file, loading it if it changed."""
+        module = self._load_module(include)
+        self.included.append(module)
+        for name, recipe in module.recipes.items():
+            replaced = self.recipes.get(name)
+            if replaced is not None and replaced is not recipe:
+                self.cook_cache.invalidate(replaced)
+        self.recipes.update(module.recipes)
+        for recipe in module.recipes.values():
+            self._index(recipe)
+
+    def _load_module(self, include: Include) -> Module:
+        self.pos = self.source_map.position(include.idx)
+        # "<stdin>" and "<string>" include files relative to the current directory
+        path = Path(self.filename).parent / include.path
+
+        with self._phase("resolve", self.pos, include.path):
+            try:
+                return self.modules.load(path, self.parser_name, self.cache)
+            except (OSError, IncludeError) as e:
+                reason = e.strerror if isinstance(e, OSError) else str(e)
+                raise ChefScriptRuntimeError(
+                    f"Cannot include '{include.path}': {reason}",
+                    self.filename,
+                    self.pos,
+                    self.source_map,
+                )
 
     def _add_recipe(self, recipe: PychefRecipe):
-        self.pos = index_to_position(self.code, recipe.idx)  # type: ignore
-
-        for instruction in recipe.instructions:
-            if isinstance(instruction[0], PychefRecipe):
-                if instruction[0].name in self.recipes:
-                    instruction[0].instructions = self.recipes[
-                        instruction[0].name
-                    ].instructions
-                else:
-                    raise ChefScriptRuntimeError(
-                        f"Recipe '{instruction[0].name}' "
-                        f"used in '{recipe.name}' is not defined yet",
-                        self.filename,
-                        self.pos,
-                    )
-        self.recipes[recipe.name] = recipe
+        self.pos = self.source_map.position(recipe.idx)  # type: ignore
+        # the recipes it uses may have changed, if it is resolved again
+        self.cook_cache.invalidate(recipe)
+        replaced = self.recipes.get(recipe.name)
+        if replaced is not None:
+            self.cook_cache.invalidate(replaced)
+
+        with self._phase("resolve", self.pos, recipe.name):
+            for item in recipe.instructions.items:
+                if isinstance(item, PychefRecipe):
+                    if item.name in self.recipes:
+                        item.instructions = self.recipes[item.name].instructions
+                    else:
+                        raise ChefScriptRuntimeError(
+                            f"Recipe '{item.name}' "
+                            f"used in '{recipe.name}' is not defined yet",
+                            self.filename,
+                            self.pos,
+                            self.source_map,
+                        )
+            self.recipes[recipe.name] = recipe
+        self._index(recipe)
+
+    def _index(self, recipe: PychefRecipe):
+        """Adds ``recipe`` to :attr:`index`, if there is one."""
+        if self.index is None:
+            return
+        with self._phase("summarize", self.pos, recipe.name):
+            try:
+                self.index.add(recipe)
+            except ValueError as e:
+                raise ChefScriptRuntimeError(
+                    f"Cannot index '{recipe.name}': {e}",
+                    self.filename,
+                    self.pos,
+                    self.source_map,
+                )
 
     def _cook(self, cook: Cook):
-        self.pos = index_to_position(self.code, cook.idx)  # type: ignore
+        self.pos = self.source_map.position(cook.idx)  # type: ignore
+        with self._phase("cook", self.pos, cook.recipe_name):
+            self._cook_recipe(cook)
 
-        recipe_name = cook.recipe_name
+    def _check_defined(self, recipe_name: str):
         if recipe_name not in self.recipes:
             raise ChefScriptRuntimeError(
-                f"Recipe '{recipe_name}' is not defined yet", self.filename, self.pos
+                f"Recipe '{recipe_name}' is not defined yet",
+                self.filename,
+                self.pos,
+                self.source_map,
             )
+
+    def _cook_recipe(self, cook: Cook):
+        recipe_name = cook.recipe_name
+        self._check_defined(recipe_name)
         recipe: PychefRecipe = self.recipes[recipe_name]
 
-        scale: float = 1
-
-        if cook.scale is not None:
-            if not isinstance(cook.scale, float):
-                if cook.scale.name not in [i.name for i in recipe.ingredients]:
-                    raise ChefScriptRuntimeError(
-                        f"Ingredient '{cook.scale.name}' "
-                        f"is not in recipe '{recipe_name}'",
-                        self.filename,
-                        index_to_position(self.code, cook.idx),  # type: ignore
-                    )
-                for i in recipe.ingredients:
-                    if i.name == cook.scale.name:
-                        scale = cook.scale.quantity / i.quantity
-                        break
-            else:
-                scale = cook.scale
+        with self._phase("summarize", self.pos, recipe_name):
+            recipe.summary
+
+        with self._phase("scale", self.pos, recipe_name):
+            scale, limited_by = self._scale(cook, recipe)
+            lines = self.cook_cache.get(recipe, scale, limited_by)
+            if lines is None:
+                self._check_attributes(recipe)
+                cooked = self.renderer.cook(recipe, scale)
+        with self._phase("render", self.pos, recipe_name):
+            if lines is None:
+                lines = list(
+                    self.renderer.render_cook(recipe_name, scale, cooked, limited_by)
+                )
+                self.cook_cache.put(recipe, scale, limited_by, lines)
+            self._writer.writelines(self.renderer.start())
+            self._writer.writelines(lines)
 
-        print(pretty_str(f"Cooking {recipe_name} with scale {scale:.3f}"))
-        print((recipe * scale).pretty_str)
-        print("-" * MAX_TERMINTAL_WIDTH)
+    def _check_attributes(self, recipe: PychefRecipe):
+        """Checks that the renderer can show the attributes of ``recipe``, if any."""
+        attributes = self.renderer.attributes
+        if attributes is None:
+            return
+        try:
+            attributes.totals(recipe.summary)
+        except KeyError as e:
+            raise ChefScriptRuntimeError(
+                f"Ingredient '{e.args[0]}' of '{recipe.name}' has no attributes",
+                self.filename,
+                self.pos,
+                self.source_map,
+            )
+        except ValueError as e:
+            raise ChefScriptRuntimeError(
+                f"Cannot total the attributes of '{recipe.name}': {e}",
+                self.filename,
+                self.pos,
+                self.source_map,
+            )
+
+    def _scale(self, cook: Cook, recipe: PychefRecipe) -> tuple[float, str | None]:
+        """The scale of ``cook``, and the ingredient limiting it for a pantry"""
+        if cook.scale is None:
+            return 1, None
+        elif isinstance(cook.scale, float):
+            return cook.scale, None
+        elif isinstance(cook.scale, tuple):
+            try:
+                return recipe.limiting_scale(cook.scale)
+            except ValueError as e:
+                raise ChefScriptRuntimeError(
+                    f"Cannot fit '{cook.recipe_name}' in the pantry: {e}",
+                    self.filename,
+                    self.pos,
+                    self.source_map,
+                )
+        try:
+            return recipe.scale_to(cook.scale), None
+        except KeyError:
+            raise ChefScriptRuntimeError(
+                f"Ingredient '{cook.scale.name}' "
+                f"is not in recipe '{cook.recipe_name}'",
+                self.filename,
+                self.pos,
+                self.source_map,
+            )
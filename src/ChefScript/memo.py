@@ -0,0 +1,105 @@
+"""
+Reusing the output of ``cook`` statements.
+
+Generated programmes often cook the same recipe at the same scale many times, like
+``cook X for 2 times`` and ``cook X with`` twice the quantity of one of its
+ingredients. :class:`CookCache` keeps the lines rendered for the most recent cooks,
+so cooking a recipe again at a scale it was cooked at only writes them again,
+without scaling, summarising or rendering the recipe.
+
+Entries are keyed by the recipe object, so a recipe redefined under the same name
+never reuses the output of the recipe it replaces; the interpreter also drops the
+entries of a replaced recipe, and of a recipe resolved again, as soon as it can.
+Recipes are assumed not to change once defined, as modules sharing them assume.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pychef import Recipe as PychefRecipe
+
+__all__ = ["CookCache"]
+
+_Key = tuple["PychefRecipe", str, "str | None"]
+
+
+def _key(recipe: PychefRecipe, scale: float, limited_by: str | None) -> _Key:
+    # the scale is normalised to its repr, which is what the renderers print: scales
+    # that are equal share an entry, but not 1 and 1.0, or 0.0 and -0.0, which are
+    # printed differently
+    return recipe, repr(scale), limited_by
+
+
+class CookCache:
+    """
+    The lines rendered for the ``size`` most recently cooked recipes and scales, the
+    least recently used being dropped first. A ``size`` of 0 disables it.
+
+    ``stats`` counts the ``hits`` and ``misses`` of :meth:`get`.
+    """
+
+    def __init__(self, size: int = 256) -> None:
+        self.size = size
+        self.stats = dict.fromkeys(("hits", "misses"), 0)
+        self._lines: OrderedDict[_Key, list[str]] = OrderedDict()
+        self._entries: dict[PychefRecipe, int] = {}
+        """
+        Recipe -> number of its entries, so that only dropping the entries of a
+        recipe that has some takes a pass over them
+        """
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def get(
+        self, recipe: PychefRecipe, scale: float, limited_by: str | None = None
+    ) -> list[str] | None:
+        """The lines rendered for ``recipe`` at ``scale``, if they are cached."""
+        key = _key(recipe, scale, limited_by)
+        lines = self._lines.get(key)
+        if lines is None:
+            self.stats["misses"] += 1
+        else:
+            self._lines.move_to_end(key)
+            self.stats["hits"] += 1
+        return lines
+
+    def put(
+        self,
+        recipe: PychefRecipe,
+        scale: float,
+        limited_by: str | None,
+        lines: list[str],
+    ) -> None:
+        if self.size <= 0:
+            return
+        key = _key(recipe, scale, limited_by)
+        if key not in self._lines:
+            self._entries[recipe] = self._entries.get(recipe, 0) + 1
+        self._lines[key] = lines
+        self._lines.move_to_end(key)
+        while len(self._lines) > self.size:
+            (evicted, _, _), _ = self._lines.popitem(last=False)
+            self._forget(evicted)
+
+    def invalidate(self, recipe: PychefRecipe) -> None:
+        """Drops the entries of ``recipe``."""
+        if recipe not in self._entries:
+            return
+        del self._entries[recipe]
+        for key in [key for key in self._lines if key[0] is recipe]:
+            del self._lines[key]
+
+    def clear(self) -> None:
+        self._lines.clear()
+        self._entries.clear()
+
+    def _forget(self, recipe: PychefRecipe) -> None:
+        count = self._entries[recipe] - 1
+        if count:
+            self._entries[recipe] = count
+        else:
+            del self._entries[recipe]
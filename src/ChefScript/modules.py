@@ -0,0 +1,167 @@
+"""
+Files included by ``include`` statements.
+
+Every included file is loaded as a :class:`Module` once per process and kept in
+:data:`MODULES`, keyed by its path. A module is only parsed again when its file
+changes, and only resolved again (from its parsed statements) when a module it
+includes was reloaded; a module whose file and includes are unchanged is reused, with
+the same recipe objects.
+"""
+
+from __future__ import annotations
+
+from os import PathLike
+from pathlib import Path
+from threading import RLock
+from types import MappingProxyType
+from typing import Iterable, Mapping
+
+from pychef import Recipe as PychefRecipe
+
+from .compiled import CompiledProgram
+from .statements import Include
+from .utils import SourceMap
+
+__all__ = ["MODULES", "IncludeError", "Module", "ModuleCache", "dependencies"]
+
+
+class IncludeError(ValueError):
+    """Raised when files include each other"""
+
+
+class Module:
+    """
+    A loaded file: its parsed statements, the modules it includes, and the recipes
+    defined at its end, including those of the modules it includes. Its ``cook``
+    statements are not run.
+    """
+
+    __slots__ = ("path", "stamp", "program", "includes", "recipes")
+
+    path: Path
+    stamp: tuple[int, int]
+    """Modification time and size of the file when it was parsed"""
+    program: CompiledProgram
+    includes: tuple[Module, ...]
+    recipes: Mapping[str, PychefRecipe]
+
+    def __init__(
+        self,
+        path: Path,
+        stamp: tuple[int, int],
+        program: CompiledProgram,
+        includes: tuple[Module, ...],
+        recipes: Mapping[str, PychefRecipe],
+    ) -> None:
+        self.path = path
+        self.stamp = stamp
+        self.program = program
+        self.includes = includes
+        self.recipes = MappingProxyType(dict(recipes))
+
+
+class ModuleCache:
+    """
+    Modules by path, checked against their files every time they are loaded.
+
+    ``stats`` counts the modules ``parsed`` from their files, ``resolved`` again
+    because a module they include changed, and ``reused`` as they were.
+    """
+
+    def __init__(self) -> None:
+        self._modules: dict[Path, Module] = {}
+        self._loading: list[Path] = []
+        self._lock = RLock()
+        self.stats = dict.fromkeys(("parsed", "resolved", "reused"), 0)
+
+    def load(
+        self, path: str | PathLike, parser: str = "descent", cache: bool = True
+    ) -> Module:
+        """
+        Returns the module of the file at ``path``, loading it and the modules it
+        includes if they changed. ``parser`` and ``cache`` are used like by
+        :meth:`ChefScriptInterpreter.interpret_file`.
+
+        Raises ``OSError`` if a file can't be read, :class:`IncludeError` if files
+        include each other, and the errors the interpreter would print for a file.
+        """
+        with self._lock:
+            return self._load(Path(path).resolve(), parser, cache)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._modules.clear()
+
+    def _load(self, path: Path, parser: str, cache: bool) -> Module:
+        if path in self._loading:
+            cycle = self._loading[self._loading.index(path) :] + [path]
+            raise IncludeError(
+                "Circular include: " + " -> ".join(str(p) for p in cycle)
+            )
+        stat = path.stat()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        module = self._modules.get(path)
+
+        self._loading.append(path)
+        try:
+            if module is None or module.stamp != stamp:
+                module = self._resolve(path, stamp, None, parser, cache)
+                self.stats["parsed"] += 1
+            elif any(
+                self._load(m.path, parser, cache) is not m for m in module.includes
+            ):
+                module = self._resolve(path, stamp, module.program, parser, cache)
+                self.stats["resolved"] += 1
+            else:
+                self.stats["reused"] += 1
+                return module
+        finally:
+            self._loading.pop()
+        self._modules[path] = module
+        return module
+
+    def _resolve(
+        self,
+        path: Path,
+        stamp: tuple[int, int],
+        program: CompiledProgram | None,
+        parser: str,
+        cache: bool,
+    ) -> Module:
+        from .interpreter import ChefScriptInterpreter
+
+        interpreter = ChefScriptInterpreter(parser=parser, modules=self)
+        interpreter.filename = str(path)
+        interpreter.cache = cache
+        if program is None:
+            statements = interpreter._load(path, path.read_bytes(), cache)
+            program = CompiledProgram(statements, interpreter.source_map.line_starts)
+        else:
+            # resolving changes the recipes, so start again from a copy of them
+            statements = CompiledProgram.loads(program.dumps()).statements
+            interpreter.source_map = SourceMap("", line_starts=program.line_starts)
+
+        for stmt in statements:
+            if isinstance(stmt, PychefRecipe):
+                interpreter._add_recipe(stmt)
+            elif isinstance(stmt, Include):
+                interpreter._include(stmt)
+        return Module(
+            path, stamp, program, tuple(interpreter.included), interpreter.recipes
+        )
+
+
+def dependencies(modules: Iterable[Module]) -> list[Path]:
+    """The files of ``modules`` and of the modules they include, each once."""
+    paths: dict[Path, None] = {}
+    stack = list(reversed(list(modules)))
+    while stack:
+        module = stack.pop()
+        if module.path not in paths:
+            paths[module.path] = None
+            stack.extend(reversed(module.includes))
+    return list(paths)
+
+
+MODULES = ModuleCache()
+"""The modules of this process"""
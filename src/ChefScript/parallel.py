@@ -0,0 +1,189 @@
+"""
+Parsing large sources on several cores.
+
+Top-level statements only depend on each other through the recipes they name, which
+are resolved after parsing, so a source can be parsed in pieces. The source is cut
+at top-level statements, like with ``--stream``, into batches of about the same
+size, which are parsed in a process pool. Each worker sends its statements back as a
+compiled programme, which registers their units again in this process, and their
+indices are then moved from their batch to the whole source, so that error positions
+refer to the original file.
+
+The grammar allows a recipe body at column 1, so the source is only cut at an
+unindented line that surely starts a statement: see :func:`_can_cut`. If a batch has
+a syntax error, the whole source is parsed again in this process, for the error, or
+the statements, a single process would get.
+"""
+
+from __future__ import annotations
+
+from itertools import accumulate
+from re import MULTILINE, compile as re_compile
+
+from .backends import load_parser
+from .compiled import CompiledProgram, Statement
+from .statements import Cook, Include, RecipeDefinition
+from .stream import (
+    _COMMENT_START as _LINE_COMMENT_START,
+    _COOK_STATEMENT,
+    ENDS_STATEMENT,
+)
+from .utils import SourceMap
+
+__all__ = ["PARALLEL_MIN_SIZE", "ParallelSyntaxError", "parse_in_parallel"]
+
+PARALLEL_MIN_SIZE = 1 << 20
+"""Sources smaller than this, in characters, aren't worth starting a pool for"""
+
+_COMMENT_START = re_compile(_LINE_COMMENT_START.pattern, MULTILINE)
+_STATEMENT_START = re_compile(r"^[^ \t\n]", MULTILINE)
+BATCHES_PER_JOB = 4
+"""So that a batch that is slow to parse doesn't leave the other workers idle"""
+
+
+class ParallelSyntaxError(Exception):
+    """
+    A syntax error found by a worker, with the ``msg`` and ``loc`` of a parser
+    error, ``loc`` being an index into the whole tab-expanded source
+    """
+
+    def __init__(self, msg: str, loc: int) -> None:
+        super().__init__(msg, loc)
+        self.msg = msg
+        self.loc = loc
+
+
+def _can_cut(code: str, start: int) -> bool:
+    """
+    Whether the source can be cut at the unindented line starting at ``start``.
+
+    A recipe body may start at column 1, so the line only surely starts a statement
+    if it is a ``cook`` statement, or if the last non-blank line before it ends one,
+    like with ``--stream``: see :data:`ChefScript.stream.ENDS_STATEMENT`.
+    """
+    if _COOK_STATEMENT.match(code, start):
+        return True
+    end = start - 1
+    while end > 0:
+        line_start = code.rfind("\n", 0, end) + 1
+        if code[line_start:end].strip():
+            return ENDS_STATEMENT.match(code, line_start, end) is not None
+        end = line_start - 1
+    return False
+
+
+def _statement_starts(code: str, count: int) -> list[int]:
+    """
+    The indices of about ``count`` top-level statements of ``code``, as evenly spread
+    as they can be, starting with 0.
+
+    A statement starts at an unindented line outside a comment that :func:`_can_cut`
+    accepts. A comment ends at the first ``)`` after it starts, so the source is
+    outside a comment after every ``)``, and a line is in a comment if one starts
+    between it and the last ``)`` before it: only the candidate lines and the source
+    between them are looked at, not the whole source.
+    """
+    size = len(code) // count + 1
+    starts = [0]
+    target = size
+    # the source from here to the candidate line before has no ``)`` or comment start
+    checked = 0
+    while target < len(code):
+        m = _STATEMENT_START.search(code, target)
+        if m is None:
+            break
+        start = m.start()
+        checked = max(checked, code.rfind(")", checked, start) + 1)
+        if _COMMENT_START.search(code, checked, start) is None:
+            checked = start
+            if _can_cut(code, start):
+                starts.append(start)
+                target = start + size
+            else:
+                target = m.end()
+            continue
+        # look for a statement after the end of the comment
+        end = code.find(")", start)
+        if end < 0:
+            break
+        target = end + 1
+    return starts
+
+
+def _parse(parser_name: str, code: str) -> list[Statement]:
+    """
+    Parses ``code`` with the parser backend ``parser_name``, raising
+    :class:`ParallelSyntaxError` for a syntax error.
+    """
+    parser = load_parser(parser_name)
+    if not code.endswith("\n"):
+        code += "\n"
+    try:
+        parse_result = parser.parse(code)
+    except parser.errors as e:
+        raise ParallelSyntaxError(e.msg, e.loc)  # type: ignore[attr-defined]
+    statements = []
+    for stmt in parse_result:
+        if len(stmt) != 1:
+            raise ValueError("Parser error")
+        statements.append(stmt[0])
+    return statements
+
+
+def _parse_batch(parser_name: str, code: str) -> bytes | tuple[str, int]:
+    """
+    Parses ``code`` in a worker. Returns its statements as a compiled programme, or
+    the message and index of its syntax error.
+    """
+    try:
+        return CompiledProgram(_parse(parser_name, code), []).dumps()
+    except ParallelSyntaxError as e:
+        return e.msg, e.loc
+
+
+def parse_in_parallel(
+    code: str, parser_name: str, jobs: int, source_map: SourceMap
+) -> list[Statement]:
+    """
+    Parses ``code`` with the parser backend ``parser_name`` in ``jobs`` processes.
+    ``source_map`` is that of ``code``.
+
+    Raises :class:`ParallelSyntaxError` for the first syntax error in the source, and
+    ``ValueError`` if a parser returns something that isn't a statement.
+    """
+    # importing the pool takes longer than running most programmes
+    from concurrent.futures import ProcessPoolExecutor
+
+    starts = _statement_starts(code, jobs * BATCHES_PER_JOB)
+    batches = [code[start:end] for start, end in zip(starts, starts[1:] + [len(code)])]
+    line_offsets = list(
+        accumulate(
+            code.count("\n", start, end) for start, end in zip([0] + starts, starts)
+        )
+    )
+
+    statements: list[Statement] = []
+    failed = False
+    pool = ProcessPoolExecutor(jobs)
+    try:
+        results = pool.map(_parse_batch, [parser_name] * len(batches), batches)
+        for line_offset, result in zip(line_offsets, results):
+            start = source_map.line_starts[line_offset]
+            if isinstance(result, tuple):
+                failed = True
+                break
+            for stmt in CompiledProgram.loads(result).statements:
+                if isinstance(stmt, RecipeDefinition):
+                    stmt.idx += start
+                    statements.append(stmt)
+                elif isinstance(stmt, (Cook, Include)):
+                    statements.append(stmt._replace(idx=stmt.idx + start))
+    finally:
+        # after a syntax error, the batches after it needn't be parsed
+        pool.shutdown(cancel_futures=True)
+    if failed:
+        # the first statement of a batch is the first one of its source for the
+        # parser, which reports its errors differently from those of a later
+        # statement, and a batch may have been cut where the whole source isn't
+        return _parse(parser_name, code)
+    return statements
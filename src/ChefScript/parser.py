@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import NamedTuple
+from sys import intern
 
 from pyparsing import (
     Group,
@@ -14,6 +14,7 @@ from pyparsing import (
     ZeroOrMore,
     pyparsing_common,
 )
+from pyparsing.exceptions import ParseBaseException
 from regex import compile as regex_compile
 
 from pychef import (
@@ -22,6 +23,8 @@ from pychef import (
     Recipe as PychefRecipe,
 )
 
+from .statements import Cook, Include, RecipeDefinition
+
 ParserElement.set_default_whitespace_chars(" \t")
 
 
@@ -30,12 +33,6 @@ class Comment(str):
         return f"{self.__class__.__name__}({super().__repr__()})"
 
 
-class Cook(NamedTuple):
-    recipe_name: str
-    scale: float | PychefIngredient | None
-    idx: int  # traceback information
-
-
 class Parser:
     parser: ParserElement
 
@@ -56,6 +53,11 @@ class Keywords(Parser):
 
     parser = NEWLINE | COMMENT_START | COMMENT_END | OF | COOK | FOR | TIMES | WITH
 
+    # only a keyword at the start of a statement, so it doesn't end names
+    INCLUDE = Suppress(Keyword("include"))
+    # only a keyword after "with"
+    PANTRY = Suppress(Keyword("pantry"))
+
 
 class NumberParser(Parser):
     r"""
@@ -194,9 +196,7 @@ class RecipeParser(Parser):
             if len(instruction) != 2:
                 instruction.append(None)
 
-        recipe = PychefRecipe(name, instructions)
-        recipe.idx = loc  # type: ignore
-        return recipe
+        return RecipeDefinition(name, instructions, loc)
 
     recipe_line = CommentParser.suppressed_comment | Group(
         Optional(IngredientParser.parser | VariableNameParser.parser)
@@ -222,36 +222,89 @@ class CookStatementParser(Parser):
     """
     ``<cook_statement> ::= "cook" <recipe_name>
                          | "cook" <recipe_name> <times>
-                         | "cook" <recipe_name> <with>``
+                         | "cook" <recipe_name> <with>
+                         | "cook" <recipe_name> <pantry>``
 
     ``<times> ::= "for" <number> "times"``
 
     ``<with> ::= "with" <ingredient>``
+
+    ``<pantry> ::= "with" "pantry" NEWLINE INDENT <pantry_body>``
+
+    ``<pantry_body> ::= <pantry_line> NEWLINE | <pantry_line> NEWLINE <pantry_body>``
+
+    ``<pantry_line> ::= <comment> | <ingredient> <comment> | <ingredient>``
+
+    (``NEWLINE`` is allowed to be repeated)
     """
 
     times = Keywords.FOR + NumberParser.parser + Keywords.TIMES
 
     with_ = Keywords.WITH + IngredientParser.parser
 
-    cook_statement = Keywords.COOK + VariableNameParser.parser + Optional(times | with_)
+    pantry_line = CommentParser.suppressed_comment | (
+        IngredientParser.parser + Optional(CommentParser.suppressed_comment)
+    )
+
+    pantry = (
+        Keywords.WITH
+        + Keywords.PANTRY
+        + Optional(CommentParser.suppressed_comment)
+        + OneOrMore(Keywords.NEWLINE)
+        + IndentedBlock(
+            ZeroOrMore(Keywords.NEWLINE) + pantry_line + OneOrMore(Keywords.NEWLINE)
+        )
+    )
+    pantry.add_parse_action(lambda loc, t: [tuple(t[0])])
+
+    cook_statement = (
+        Keywords.COOK + VariableNameParser.parser + Optional(times | with_ | pantry)
+    )
     cook_statement.add_parse_action(
-        lambda loc, t: Cook(t[0], t[1], loc) if len(t) == 2 else Cook(t[0], None, loc)
+        lambda loc, t: Cook(intern(t[0]), t[1] if len(t) == 2 else None, loc)
     )
 
     parser = cook_statement
 
 
+class IncludeParser(Parser):
+    r"""
+    ``<include> ::= "include" <path>``, unless an indented line follows it
+
+    ``<path>`` is one or more words of any character except control characters,
+    whitespace and parentheses, separated by spaces, defined by the Regex
+    ``[^\p{C}\p{Z}()]+([ \t]+[^\p{C}\p{Z}()]+)*``
+
+    An ``include`` line followed, after an optional comment and blank lines, by a
+    line indented deeper than column 1 is the start of a recipe named ``include ...``
+    instead, as it was before ``include`` was a statement.
+    """
+
+    path = Regex(regex_compile(r"[^\p{C}\p{Z}()]+(?:[ \t]+[^\p{C}\p{Z}()]+)*"))
+
+    indented_body = Regex(
+        regex_compile(
+            r"[ \t]*(?:\([ \t]*(?=[^ \t)])[^)]+\)[ \t]*)?\n(?:[ \t]*\n)*[ \t]+[^ \t\n]"
+        )
+    )
+
+    include = Keywords.INCLUDE + path + ~indented_body
+    include.add_parse_action(lambda loc, t: Include(t[0], loc))
+
+    parser = include
+
+
 class ChefScriptParser(Parser):
     """
     ``<chef_script> ::= <stmt> | <stmt> NEWLINE <chef_script>``
 
-    ``<stmt> ::= <recipe> | <cook_statement>``
+    ``<stmt> ::= <include> | <recipe> | <cook_statement>``
 
     (NEWLINE is allowed to be repeated)
     """
 
     stmt = CommentParser.suppressed_comment | Group(
-        (RecipeParser.parser | CookStatementParser.parser)
+        (IncludeParser.parser | RecipeParser.parser | CookStatementParser.parser)
         + Optional(CommentParser.suppressed_comment)
     )
 
@@ -262,3 +315,5 @@ class ChefScriptParser(Parser):
     )
 
     parser = chef_script
+
+    errors = (ParseBaseException,)
@@ -0,0 +1,101 @@
+"""
+Profiling hooks for the interpreter.
+
+The interpreter times each phase of running a programme only while a hook is
+registered with :meth:`ChefScript.interpreter.ChefScriptInterpreter.add_hook`, and
+calls every hook with a :class:`ProfileEvent` when a phase ends. :class:`Profiler`
+is a hook that adds the events up into a report.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, NamedTuple
+
+from .utils import MAX_TERMINTAL_WIDTH, Position, pretty_str
+
+__all__ = ["PHASES", "Hook", "ProfileEvent", "Profiler"]
+
+PHASES = ("load", "parse", "resolve", "cook", "summarize", "scale", "render")
+"""
+The phases timed by the interpreter:
+
+- ``load``: loading a compiled or cached programme
+- ``parse``: parsing a source, or a chunk of it in stream mode
+- ``resolve``: resolving the recipes used by a recipe, once per recipe
+- ``cook``: a whole ``cook`` statement, including the three phases below
+- ``summarize``: summarising the recipe before it is scaled
+- ``scale``: working out the scale, and scaling the recipe
+- ``render``: rendering and writing the scaled recipe
+
+A ``cook`` statement whose output is reused from an earlier one (see
+:mod:`ChefScript.memo`) only works out its scale and writes that output.
+"""
+
+
+class ProfileEvent(NamedTuple):
+    phase: str
+    seconds: float
+    pos: Position | None = None
+    """Position of the statement, if the phase belongs to one"""
+    name: str | None = None
+    """Name of the recipe defined or cooked by the statement"""
+
+
+Hook = Callable[[ProfileEvent], Any]
+
+
+class Profiler:
+    """Collects the wall time and number of calls of each phase, and of each cook."""
+
+    def __init__(self) -> None:
+        self.phases: dict[str, list[float]] = {}
+        """Phase -> [calls, seconds]"""
+        self.cooks: dict[tuple[int, int], list[Any]] = {}
+        """Position of a ``cook`` statement -> [recipe name, calls, seconds]"""
+
+    def __call__(self, event: ProfileEvent) -> None:
+        totals = self.phases.setdefault(event.phase, [0, 0.0])
+        totals[0] += 1
+        totals[1] += event.seconds
+        if event.phase == "cook" and event.pos is not None:
+            key = (event.pos.line, event.pos.col)
+            cook = self.cooks.setdefault(key, [event.name, 0, 0.0])
+            cook[1] += 1
+            cook[2] += event.seconds
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "phases": {
+                phase: {"calls": int(calls), "seconds": seconds}
+                for phase, (calls, seconds) in self._sorted_phases()
+            },
+            "cooks": [
+                {
+                    "line": line,
+                    "col": col,
+                    "recipe": name,
+                    "calls": calls,
+                    "seconds": seconds,
+                }
+                for (line, col), (name, calls, seconds) in self.cooks.items()
+            ],
+        }
+
+    def report(self, slowest: int = 10) -> str:
+        """The time spent in each phase, and in the ``slowest`` cook statements."""
+        lines = [pretty_str("Profile"), f"{'phase':<12}{'calls':>10}{'seconds':>14}"]
+        for phase, (calls, seconds) in self._sorted_phases():
+            lines.append(f"{phase:<12}{int(calls):>10}{seconds:>14.6f}")
+        if self.cooks:
+            lines.append(f"Slowest cook statements (of {len(self.cooks)}):")
+            by_time = sorted(self.cooks.items(), key=lambda item: -item[1][2])
+            for (line, col), (name, _, seconds) in by_time[:slowest]:
+                lines.append(f"{f'{line}:{col}':>12}  {seconds:>12.6f}  cook {name}")
+        lines.append("-" * MAX_TERMINTAL_WIDTH)
+        return "\n".join(lines)
+
+    def _sorted_phases(self) -> list[tuple[str, list[float]]]:
+        order = {phase: i for i, phase in enumerate(PHASES)}
+        return sorted(
+            self.phases.items(), key=lambda item: order.get(item[0], len(order))
+        )
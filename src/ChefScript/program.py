@@ -0,0 +1,296 @@
+"""
+Loaded ChefScript programmes, for embedding ChefScript in other applications.
+
+A :class:`Program` is parsed and resolved once, and then only read: cooking one of
+its recipes builds new, scaled recipes and returns them instead of printing them, so
+a single program can be cooked from many threads at once without locks.
+"""
+
+from __future__ import annotations
+
+from os import PathLike
+from pathlib import Path
+from types import MappingProxyType
+from typing import Iterable, Iterator, Mapping, NamedTuple, Sequence
+
+import numpy as np
+
+from pychef import (
+    AttributeTable,
+    Ingredient as PychefIngredient,
+    IngredientTable,
+    Recipe as PychefRecipe,
+)
+
+from .interpreter import ChefScriptInterpreter
+from .modules import Module, dependencies
+from .statements import Cook, Include
+from .utils import ChefScriptRuntimeError, Position
+
+__all__ = ["CookResult", "Program"]
+
+
+class CookResult(NamedTuple):
+    recipe_name: str
+    scale: float
+    recipe: PychefRecipe
+    """The scaled recipe"""
+    limited_by: str | None = None
+    """The ingredient limiting the scale, for a recipe cooked with a pantry"""
+
+    @property
+    def summary(self) -> IngredientTable:
+        return self.recipe.summary
+
+    @property
+    def ingredients(self) -> list[PychefIngredient]:
+        return self.recipe.ingredients
+
+    @property
+    def pretty_str(self) -> str:
+        return self.recipe.pretty_str
+
+
+class Program:
+    """
+    The recipes and ``cook`` statements of a programme, resolved.
+
+    The recipes must not be modified. Their summaries are computed when the program
+    is loaded, so that cooking never has to write to them.
+    """
+
+    __slots__ = ("filename", "included", "_recipes", "_cooks")
+
+    filename: str
+    included: tuple[Module, ...]
+    """The modules the programme includes"""
+    _recipes: Mapping[str, PychefRecipe]
+    _cooks: tuple[tuple[Cook, PychefRecipe, Position], ...]
+
+    def __init__(
+        self,
+        recipes: Mapping[str, PychefRecipe],
+        cooks: Iterable[tuple[Cook, PychefRecipe, Position]] = (),
+        filename: str = "<string>",
+        included: Iterable[Module] = (),
+    ) -> None:
+        self.filename = filename
+        self.included = tuple(included)
+        self._recipes = MappingProxyType(dict(recipes))
+        self._cooks = tuple(cooks)
+        for recipe in self._recipes.values():
+            recipe.summary
+        for _, recipe, _ in self._cooks:
+            recipe.summary
+
+    @classmethod
+    def from_source(
+        cls, code: str, filename: str = "<string>", parser: str = "descent"
+    ) -> Program:
+        """
+        Parses and resolves ``code``, raising the errors the interpreter would print
+        (but only for ``cook`` statements using undefined recipes).
+        """
+        interpreter = ChefScriptInterpreter(parser=parser)
+        interpreter.filename = filename
+        statements = interpreter._compile(code, code.encode()).statements
+        return cls._from_statements(interpreter, statements)
+
+    @classmethod
+    def from_file(
+        cls, filename: str | PathLike, parser: str = "descent", cache: bool = True
+    ) -> Program:
+        """
+        Like :meth:`from_source`, for a source file or a compiled programme. Sources
+        are cached like when they are run.
+        """
+        path = Path(filename).resolve()
+        interpreter = ChefScriptInterpreter(parser=parser)
+        interpreter.filename = str(filename)
+        interpreter.cache = cache
+        statements = interpreter._load(path, path.read_bytes(), cache)
+        return cls._from_statements(interpreter, statements)
+
+    @classmethod
+    def _from_statements(
+        cls,
+        interpreter: ChefScriptInterpreter,
+        statements: list[PychefRecipe | Cook | Include],
+    ) -> Program:
+        cooks: list[tuple[Cook, PychefRecipe, Position]] = []
+        for stmt in statements:
+            if isinstance(stmt, PychefRecipe):
+                interpreter._add_recipe(stmt)
+            elif isinstance(stmt, Include):
+                interpreter._include(stmt)
+            else:
+                interpreter.pos = interpreter.source_map.position(stmt.idx)
+                interpreter._check_defined(stmt.recipe_name)
+                cooks.append(
+                    (stmt, interpreter.recipes[stmt.recipe_name], interpreter.pos)
+                )
+        return cls(
+            interpreter.recipes, cooks, interpreter.filename, interpreter.included
+        )
+
+    @property
+    def dependencies(self) -> list[Path]:
+        """The files the programme includes, directly or not"""
+        return dependencies(self.included)
+
+    @property
+    def recipes(self) -> Mapping[str, PychefRecipe]:
+        """The recipes by name, as defined at the end of the programme"""
+        return self._recipes
+
+    def cook(
+        self,
+        recipe_name: str,
+        scale: float | None = None,
+        with_ingredient: PychefIngredient | None = None,
+        pantry: Sequence[PychefIngredient] | None = None,
+    ) -> CookResult:
+        """
+        Cooks a recipe, like ``cook <recipe_name> for <scale> times``, ``cook
+        <recipe_name> with <with_ingredient>`` or ``cook <recipe_name> with pantry``
+        followed by the ingredients of ``pantry``, or at its original scale.
+
+        Raises ``KeyError`` if the recipe isn't defined, and ``ValueError`` if it
+        doesn't use ``with_ingredient`` in compatible units, if ``pantry`` isn't in
+        units compatible with the recipe's, or if more than one way to scale it is
+        given.
+        """
+        return self._cook(
+            recipe_name, self._recipes[recipe_name], scale, with_ingredient, pantry
+        )
+
+    def scale(
+        self,
+        recipe_name: str,
+        scale: float | None = None,
+        with_ingredient: PychefIngredient | None = None,
+        pantry: Sequence[PychefIngredient] | None = None,
+    ) -> tuple[float, str | None]:
+        """
+        The scale :meth:`cook` would cook the recipe at with the same arguments, and
+        the ingredient limiting it for a pantry, without scaling the recipe. Raises
+        like :meth:`cook`.
+        """
+        return self._scale(
+            recipe_name, self._recipes[recipe_name], scale, with_ingredient, pantry
+        )
+
+    def run(self) -> list[CookResult]:
+        """Cooks the recipes of every ``cook`` statement of the programme, in order."""
+        return [
+            self._cook(cook.recipe_name, recipe, *self._scale_arguments(cook))
+            for cook, recipe, _ in self._cooks
+        ]
+
+    def plan(self) -> IngredientTable:
+        """
+        The shopping list of the programme: the total of every ingredient over all
+        its ``cook`` statements, sorted by name, each in the unit it first appears in.
+
+        Only the summaries of the recipes are scaled, never the recipes themselves:
+        the scales of the statements cooking the same recipe are added up, and the
+        summaries of all the recipes are then added up at once.
+
+        Raises :class:`ChefScriptRuntimeError` if a ``cook`` statement can't be
+        scaled.
+        """
+        scales: dict[int, tuple[PychefRecipe, float]] = {}
+        for recipe, scale in self._cook_scales():
+            # recipes are compared by identity, like :attr:`recipes` holds them
+            total = scales.get(id(recipe), (recipe, 0.0))[1]
+            scales[id(recipe)] = (recipe, total + scale)
+        return IngredientTable.concatenate(
+            recipe.summary * scale for recipe, scale in scales.values()
+        ).summarize()
+
+    def attribute_totals(self, attributes: AttributeTable) -> np.ndarray:
+        """
+        The totals of ``attributes``, like the price and nutrients, of the recipe
+        cooked by every ``cook`` statement, with one row per statement in the order of
+        :meth:`run` and one column per attribute.
+
+        The recipes are never scaled: the totals of the summary of each recipe are
+        computed once, in one batch for all of them, and multiplied by the scale of
+        every statement cooking it.
+
+        Raises :class:`ChefScriptRuntimeError` if a ``cook`` statement can't be
+        scaled, ``KeyError`` for an ingredient without attributes, and ``ValueError``
+        for one whose attributes aren't given in a compatible unit.
+        """
+        summaries: list[IngredientTable] = []
+        scales: list[float] = []
+        for recipe, scale in self._cook_scales():
+            summaries.append(recipe.summary)
+            scales.append(scale)
+        return attributes.totals_many(summaries, scales)
+
+    def _cook_scales(self) -> Iterator[tuple[PychefRecipe, float]]:
+        """The recipe and scale of every ``cook`` statement, in order"""
+        for cook, recipe, pos in self._cooks:
+            try:
+                scale, _ = self._scale(
+                    cook.recipe_name, recipe, *self._scale_arguments(cook)
+                )
+            except ValueError as e:
+                raise ChefScriptRuntimeError(str(e), self.filename, pos)
+            yield recipe, scale
+
+    @property
+    def cook_positions(self) -> list[Position]:
+        """Positions of the ``cook`` statements, in the order :meth:`run` cooks them"""
+        return [pos for _, _, pos in self._cooks]
+
+    @staticmethod
+    def _scale_arguments(
+        cook: Cook,
+    ) -> tuple[
+        float | None, PychefIngredient | None, tuple[PychefIngredient, ...] | None
+    ]:
+        """The arguments of :meth:`cook` for the scale of ``cook``"""
+        return (
+            cook.scale if isinstance(cook.scale, float) else None,
+            cook.scale if isinstance(cook.scale, PychefIngredient) else None,
+            cook.scale if isinstance(cook.scale, tuple) else None,
+        )
+
+    @classmethod
+    def _cook(
+        cls,
+        recipe_name: str,
+        recipe: PychefRecipe,
+        scale: float | None,
+        with_ingredient: PychefIngredient | None,
+        pantry: Sequence[PychefIngredient] | None = None,
+    ) -> CookResult:
+        scale, limited_by = cls._scale(
+            recipe_name, recipe, scale, with_ingredient, pantry
+        )
+        return CookResult(recipe_name, scale, recipe * scale, limited_by)
+
+    @staticmethod
+    def _scale(
+        recipe_name: str,
+        recipe: PychefRecipe,
+        scale: float | None,
+        with_ingredient: PychefIngredient | None,
+        pantry: Sequence[PychefIngredient] | None,
+    ) -> tuple[float, str | None]:
+        """The scale to cook ``recipe`` at, and the ingredient limiting it"""
+        if sum(x is not None for x in (scale, with_ingredient, pantry)) > 1:
+            raise ValueError("Give only one of a scale, an ingredient or a pantry")
+        if pantry is not None:
+            return recipe.limiting_scale(pantry)
+        if with_ingredient is not None:
+            try:
+                return recipe.scale_to(with_ingredient), None
+            except KeyError:
+                raise ValueError(
+                    f"Ingredient '{with_ingredient.name}' "
+                    f"is not in recipe '{recipe_name}'"
+                )
+        return 1 if scale is None else scale, None
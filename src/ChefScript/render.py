@@ -0,0 +1,317 @@
+"""
+Rendering the output of ``cook`` statements.
+
+A renderer turns a cooked recipe into lines of text, generated one at a time, and a
+:class:`LineWriter` buffers them before they reach the output stream, so a large
+recipe is never held in memory as one string.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, TextIO
+
+from .utils import MAX_TERMINTAL_WIDTH, pretty_str
+
+if TYPE_CHECKING:
+    from pychef import AttributeTable, IngredientTable, Recipe as PychefRecipe
+
+__all__ = [
+    "RENDERERS",
+    "CSVRenderer",
+    "JSONLinesRenderer",
+    "LineWriter",
+    "Renderer",
+    "SummaryRenderer",
+    "TextRenderer",
+    "summary_json",
+]
+
+
+class LineWriter:
+    """
+    Collects lines and writes them to ``file`` in blocks of about ``buffer_size``
+    characters.
+    """
+
+    def __init__(self, file: TextIO, buffer_size: int = 1 << 16) -> None:
+        self.file = file
+        self.buffer_size = buffer_size
+        self._lines: list[str] = []
+        self._size = 0
+
+    def write(self, line: str) -> None:
+        self._lines.append(line)
+        self._size += len(line)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def writelines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.write(line)
+
+    def flush(self) -> None:
+        """Writes the buffered lines to ``file``, which may buffer them further."""
+        if self._lines:
+            text = "".join(self._lines)
+            # dropped first, so that a write that fails isn't tried again
+            self._lines = []
+            self._size = 0
+            self.file.write(text)
+
+
+class Renderer(ABC):
+    """
+    Renders cooked recipes as lines, each ending with a newline.
+
+    ``header`` is whether to start the output with a header, for formats that have
+    one; it is written before the first cooked recipe. ``limited_by`` is the
+    ingredient that limited the scale of a recipe cooked with a pantry, shown by the
+    formats that have room for it. With ``attributes``, the price, nutrients or other
+    attributes of the ingredients of each cooked recipe are rendered too; every
+    ingredient must have attributes in a compatible unit.
+
+    :meth:`render_plan` renders the shopping list of ``ChefScript plan`` instead, and
+    :meth:`render_find` the recipes found by ``ChefScript find``. A format implements
+    all three, or can't be instantiated.
+    """
+
+    def __init__(
+        self, header: bool = True, attributes: AttributeTable | None = None
+    ) -> None:
+        self.header = header
+        self.attributes = attributes
+
+    def cook(self, recipe: PychefRecipe, scale: float) -> Any:
+        """
+        Scales ``recipe`` as far as this renderer needs it: by default the whole
+        recipe, but renderers that only show the summary of ingredients can scale
+        only that.
+        """
+        return recipe * scale
+
+    def render(
+        self,
+        recipe_name: str,
+        scale: float,
+        cooked: Any,
+        limited_by: str | None = None,
+    ) -> Iterator[str]:
+        """Renders ``cooked``, as returned by :meth:`cook`."""
+        yield from self.start()
+        yield from self.render_cook(recipe_name, scale, cooked, limited_by)
+
+    def start(self) -> Iterator[str]:
+        """The header, unless it was rendered already or isn't wanted."""
+        if self.header:
+            self.header = False
+            yield from self.render_header()
+
+    def render_header(self) -> Iterator[str]:
+        return iter(())
+
+    @abstractmethod
+    def render_cook(
+        self, recipe_name: str, scale: float, cooked: Any, limited_by: str | None
+    ) -> Iterator[str]:
+        """
+        Renders ``recipe_name`` cooked at ``scale``, without the header: ``cooked``
+        is what :meth:`cook` returned for it.
+        """
+
+    @abstractmethod
+    def render_plan(self, totals: IngredientTable, cooks: int) -> Iterator[str]:
+        """Renders the ``totals`` of the ingredients of ``cooks`` cook statements."""
+
+    @abstractmethod
+    def render_find(
+        self, ingredient: str, filename: str, found: IngredientTable
+    ) -> Iterator[str]:
+        """
+        Renders the recipes of the file ``filename`` using ``ingredient``: the rows of
+        ``found`` are the names of the recipes and the quantities they use.
+        """
+
+
+class TextRenderer(Renderer):
+    """The scaled recipe and the recipes it uses, laid out for reading"""
+
+    def render_cook(
+        self,
+        recipe_name: str,
+        scale: float,
+        cooked: PychefRecipe,
+        limited_by: str | None,
+    ) -> Iterator[str]:
+        title = f"Cooking {recipe_name} with scale {scale:.3f}"
+        if limited_by is not None:
+            title += f", limited by {limited_by}"
+        yield pretty_str(title) + "\n"
+        for line in cooked.pretty_lines():
+            yield line + "\n"
+        if self.attributes is not None:
+            yield f"Attributes of {recipe_name}:\n"
+            totals = self.attributes.totals(cooked.summary)
+            for name, total in zip(self.attributes.attributes, totals.tolist()):
+                yield f"    {name}: {total:.3f}\n"
+        yield "-" * MAX_TERMINTAL_WIDTH + "\n"
+
+    def render_plan(self, totals: IngredientTable, cooks: int) -> Iterator[str]:
+        yield pretty_str(f"Shopping list for {cooks} cook statements") + "\n"
+        for ingredient in totals.to_ingredients():
+            yield f"    {ingredient}\n"
+        yield "-" * MAX_TERMINTAL_WIDTH + "\n"
+
+    def render_find(
+        self, ingredient: str, filename: str, found: IngredientTable
+    ) -> Iterator[str]:
+        yield pretty_str(f"Recipes using {ingredient} in {filename}") + "\n"
+        for name, value, unit in zip(found.names, found.values.tolist(), found.units):
+            yield f"    {name}: {value:.3f} {unit} of {ingredient}\n"
+        yield "-" * MAX_TERMINTAL_WIDTH + "\n"
+
+
+class SummaryRenderer(Renderer):
+    """Base class of renderers showing only the scaled summary of ingredients"""
+
+    def cook(self, recipe: PychefRecipe, scale: float) -> IngredientTable:
+        return recipe.summary * scale
+
+
+class JSONLinesRenderer(SummaryRenderer):
+    """One JSON object per cooked recipe, with its scaled summary of ingredients"""
+
+    def render_cook(
+        self,
+        recipe_name: str,
+        scale: float,
+        summary: IngredientTable,
+        limited_by: str | None,
+    ) -> Iterator[str]:
+        result = summary_json(recipe_name, scale, summary, limited_by)
+        if self.attributes is not None:
+            totals = self.attributes.totals(summary)
+            result["attributes"] = dict(
+                zip(self.attributes.attributes, totals.tolist())
+            )
+        yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    def render_plan(self, totals: IngredientTable, cooks: int) -> Iterator[str]:
+        yield json.dumps(
+            {"cooks": cooks, "ingredients": _ingredients_json(totals)},
+            ensure_ascii=False,
+        ) + "\n"
+
+    def render_find(
+        self, ingredient: str, filename: str, found: IngredientTable
+    ) -> Iterator[str]:
+        yield json.dumps(
+            {
+                "file": filename,
+                "ingredient": ingredient,
+                "recipes": _ingredients_json(found),
+            },
+            ensure_ascii=False,
+        ) + "\n"
+
+
+def summary_json(
+    recipe_name: str,
+    scale: float,
+    summary: IngredientTable,
+    limited_by: str | None = None,
+) -> dict[str, Any]:
+    """
+    The object :class:`JSONLinesRenderer` prints for a scaled summary, with a
+    ``"limited_by"`` ingredient for a recipe cooked with a pantry.
+    """
+    result = {
+        "recipe": recipe_name,
+        "scale": scale,
+        "ingredients": _ingredients_json(summary),
+    }
+    if limited_by is not None:
+        result["limited_by"] = limited_by
+    return result
+
+
+def _ingredients_json(summary: IngredientTable) -> list[dict[str, Any]]:
+    return [
+        {"name": name, "quantity": value, "unit": unit}
+        for name, value, unit in zip(
+            summary.names, summary.values.tolist(), summary.units
+        )
+    ]
+
+
+class _Echo:
+    """A file-like object whose ``write`` returns what it is given"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+class CSVRenderer(SummaryRenderer):
+    """
+    One row per ingredient in the scaled summary of each cooked recipe, followed by
+    its attributes if there are any
+    """
+
+    FIELDS = ("recipe", "scale", "ingredient", "quantity", "unit")
+
+    def __init__(
+        self, header: bool = True, attributes: AttributeTable | None = None
+    ) -> None:
+        super().__init__(header, attributes)
+        self._writer = csv.writer(_Echo(), lineterminator="\n")
+
+    def render_header(self) -> Iterator[str]:
+        if self.attributes is None:
+            yield self._writer.writerow(self.FIELDS)
+        else:
+            yield self._writer.writerow(self.FIELDS + tuple(self.attributes.attributes))
+
+    def render_cook(
+        self,
+        recipe_name: str,
+        scale: float,
+        summary: IngredientTable,
+        limited_by: str | None,
+    ) -> Iterator[str]:
+        rows = zip(summary.names, summary.values.tolist(), summary.units)
+        if self.attributes is None:
+            for name, value, unit in rows:
+                yield self._writer.writerow((recipe_name, scale, name, value, unit))
+            return
+        # the attributes of each ingredient, after its quantity
+        values = self.attributes.values(summary).tolist()
+        for (name, value, unit), attributes in zip(rows, values):
+            yield self._writer.writerow(
+                (recipe_name, scale, name, value, unit, *attributes)
+            )
+
+    def render_plan(self, totals: IngredientTable, cooks: int) -> Iterator[str]:
+        if self.header:
+            self.header = False
+            yield self._writer.writerow(self.FIELDS[2:])
+        for row in zip(totals.names, totals.values.tolist(), totals.units):
+            yield self._writer.writerow(row)
+
+    def render_find(
+        self, ingredient: str, filename: str, found: IngredientTable
+    ) -> Iterator[str]:
+        if self.header:
+            self.header = False
+            yield self._writer.writerow(("file", "recipe", "quantity", "unit"))
+        for row in zip(found.names, found.values.tolist(), found.units):
+            yield self._writer.writerow((filename, *row))
+
+
+RENDERERS: dict[str, type[Renderer]] = {
+    "text": TextRenderer,
+    "jsonl": JSONLinesRenderer,
+    "csv": CSVRenderer,
+}
+"""Output formats selectable by name"""
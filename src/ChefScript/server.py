@@ -0,0 +1,352 @@
+"""
+A long-running server cooking recipes from preloaded libraries.
+
+``ChefScript serve`` loads one or more programmes as :class:`Program` objects and
+answers requests over a Unix socket, one JSON object per line, or over HTTP on
+localhost. A request names a recipe and optionally a scale, an ingredient to cook it
+with, or a pantry of ingredients to cook it at the largest scale they allow::
+
+    {"id": 1, "recipe": "steak dinner", "scale": 2}
+    {"id": 2, "recipe": "seasoned steak", "with": {"name": "salt", "quantity": 3,
+     "unit": "tsp"}}
+    {"id": 3, "recipe": "seasoned steak", "pantry": [{"name": "salt", "quantity": 3,
+     "unit": "tsp"}, ...]}
+
+and is answered with the scaled summary of ingredients, in the format of
+``--format jsonl``, under ``"result"``, or with an ``"error"``. Over HTTP, the same
+object is posted to ``/cook``, or given as the query of ``GET /cook?recipe=...``;
+``/stats`` returns the counters of the server.
+
+Results are cached, and identical requests arriving while one is being cooked wait
+for it instead of cooking it again. The libraries are polled for changes and
+reloaded in the background, as are the files they include; the new programmes replace
+the old ones at once, and only if they load without errors.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike, stat
+from pathlib import Path
+from sys import stderr
+from typing import Any, Hashable, Iterable
+from urllib.parse import parse_qsl, urlsplit
+
+from pychef import Ingredient as PychefIngredient, Quantity as PychefQuantity
+
+from .program import Program
+from .render import summary_json
+from .utils import ChefScriptException
+
+__all__ = ["RecipeServer", "RequestError"]
+
+
+class RequestError(ValueError):
+    """An invalid request, answered with an error instead of a result"""
+
+
+class RecipeServer:
+    """
+    Cooks recipes from the programmes at ``paths``. A recipe defined in several of
+    them is taken from the last one, like a recipe redefined in one programme.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[str | PathLike],
+        parser: str = "descent",
+        poll_interval: float = 1.0,
+        cache_size: int = 4096,
+        workers: int | None = None,
+    ) -> None:
+        self.paths = [Path(path).resolve() for path in paths]
+        self.parser = parser
+        self.poll_interval = poll_interval
+        self.cache_size = cache_size
+        self.programs: tuple[Program, ...] = ()
+        self.generation = 0
+        """Incremented on every reload, and part of the key of every cached result"""
+        self.stats = dict.fromkeys(
+            ("requests", "hits", "misses", "coalesced", "reloads"), 0
+        )
+        self._mtimes: dict[Path, int] = {}
+        self._results: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._in_flight: dict[Hashable, asyncio.Future[bytes]] = {}
+        self._executor = ThreadPoolExecutor(workers)
+
+    def load(self) -> None:
+        """Loads the libraries, raising the errors the interpreter would print."""
+        self.programs, self._mtimes = self._load()
+
+    def _load(self) -> tuple[tuple[Program, ...], dict[Path, int]]:
+        # read the times first, so a change made while loading is seen next time
+        mtimes = self._stat(self.paths)
+        programs = tuple(
+            Program.from_file(path, parser=self.parser) for path in self.paths
+        )
+        for program in programs:
+            dependencies = [p for p in program.dependencies if p not in mtimes]
+            mtimes.update(self._stat(dependencies))
+        return programs, mtimes
+
+    @staticmethod
+    def _stat(paths: Iterable[Path]) -> dict[Path, int]:
+        """Modification times of ``paths``, or -1 for files that can't be read"""
+        mtimes = {}
+        for path in paths:
+            try:
+                mtimes[path] = stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = -1
+        return mtimes
+
+    async def watch(self) -> None:
+        """Reloads the libraries whenever one of them changes, forever."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            mtimes = self._stat(self._mtimes)
+            if mtimes == self._mtimes:
+                continue
+            try:
+                programs, mtimes = await loop.run_in_executor(
+                    self._executor, self._load
+                )
+            except (ChefScriptException, Exception) as e:
+                print(f"Not reloading: {e}", file=stderr)
+                # don't retry until the files change again
+                self._mtimes = mtimes
+                continue
+            self.programs, self._mtimes = programs, mtimes
+            self.generation += 1
+            self._results.clear()
+            self.stats["reloads"] += 1
+
+    async def cook(self, request: dict[str, Any]) -> bytes:
+        """
+        Returns the result of a cook request as JSON, cooking it in a worker thread
+        unless it is cached or already being cooked.
+        """
+        self.stats["requests"] += 1
+        key = self._key(request)
+        try:
+            result = self._results[key]
+        except KeyError:
+            pass
+        else:
+            self._results.move_to_end(key)
+            self.stats["hits"] += 1
+            return result
+
+        while key in self._in_flight:
+            self.stats["coalesced"] += 1
+            in_flight = self._in_flight[key]
+            try:
+                return await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    raise
+                # the request cooking it was cancelled: cook it here, unless another
+                # request waiting for it already does
+
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._cook, self.programs, *key[1:]
+            )
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved by the caller, through the raise below
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._in_flight[key]
+            if not future.done():
+                # cancelled, like when its client goes away or the server stops, so
+                # that the requests waiting for it don't wait forever
+                future.cancel()
+        if key[0] == self.generation:
+            self._results[key] = result
+            if len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        return result
+
+    def _key(self, request: dict[str, Any]) -> tuple:
+        recipe_name = request.get("recipe")
+        if not isinstance(recipe_name, str):
+            raise RequestError("'recipe' must be the name of a recipe")
+        scale = request.get("scale")
+        if scale is not None:
+            try:
+                scale = float(scale)
+            except (TypeError, ValueError):
+                raise RequestError("'scale' must be a number")
+        with_ingredient = request.get("with")
+        if with_ingredient is not None:
+            with_ingredient = self._ingredient_key(with_ingredient, "'with' must be")
+        pantry = request.get("pantry")
+        if pantry is not None:
+            if not isinstance(pantry, list):
+                raise RequestError("'pantry' must be a list of ingredients")
+            pantry = tuple(
+                self._ingredient_key(item, "Every item of 'pantry' must be")
+                for item in pantry
+            )
+        return self.generation, recipe_name, scale, with_ingredient, pantry
+
+    @staticmethod
+    def _ingredient_key(ingredient: Any, error: str) -> tuple[str, float, str]:
+        try:
+            return (
+                str(ingredient["name"]),
+                float(ingredient["quantity"]),
+                str(ingredient["unit"]),
+            )
+        except (KeyError, TypeError, ValueError):
+            raise RequestError(f"{error} an object with a name, a quantity and a unit")
+
+    @staticmethod
+    def _ingredient(key: tuple[str, float, str]) -> PychefIngredient:
+        name, value, unit = key
+        try:
+            return PychefIngredient(name, PychefQuantity(value, unit))
+        except Exception:
+            raise RequestError(f"Invalid unit '{unit}'")
+
+    @classmethod
+    def _cook(
+        cls,
+        programs: tuple[Program, ...],
+        recipe_name: str,
+        scale: float | None,
+        with_ingredient: tuple[str, float, str] | None,
+        pantry: tuple[tuple[str, float, str], ...] | None,
+    ) -> bytes:
+        for program in reversed(programs):
+            if recipe_name in program.recipes:
+                break
+        else:
+            raise RequestError(f"Recipe '{recipe_name}' is not defined")
+        # only the summary is answered, so only the summary is scaled
+        scale, limited_by = program.scale(
+            recipe_name,
+            scale,
+            None if with_ingredient is None else cls._ingredient(with_ingredient),
+            None if pantry is None else [cls._ingredient(key) for key in pantry],
+        )
+        summary = program.recipes[recipe_name].summary * scale
+        return json.dumps(
+            summary_json(recipe_name, scale, summary, limited_by), ensure_ascii=False
+        ).encode()
+
+    async def respond(self, request: Any) -> tuple[bool, bytes]:
+        """Returns whether ``request`` succeeded, and the JSON to answer it with."""
+        try:
+            if not isinstance(request, dict):
+                raise RequestError("A request must be a JSON object")
+            return True, b'{"result": ' + await self.cook(request) + b"}"
+        except Exception as e:
+            return False, json.dumps({"error": str(e)}, ensure_ascii=False).encode()
+
+    async def handle_lines(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answers one JSON request per line, in order."""
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                if isinstance(request, dict) and request.get("op") == "stats":
+                    response = json.dumps(self.stats).encode()
+                else:
+                    _, response = await self.respond(request)
+                    if isinstance(request, dict) and "id" in request:
+                        id_json = json.dumps(request["id"]).encode()
+                        response = b'{"id": ' + id_json + b", " + response[1:]
+                writer.write(response + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_http(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answers HTTP/1.1 requests, keeping the connection alive between them."""
+        try:
+            while request_line := await reader.readline():
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                url = urlsplit(target)
+                status, response = "200 OK", b""
+                if url.path == "/stats":
+                    response = json.dumps(self.stats).encode()
+                elif url.path == "/cook" and method in ("GET", "POST"):
+                    request: Any = dict(parse_qsl(url.query))
+                    if method == "POST":
+                        try:
+                            request = json.loads(body)
+                        except ValueError:
+                            request = None
+                    elif "with_name" in request:
+                        request["with"] = {
+                            key: request.pop(f"with_{key}", None)
+                            for key in ("name", "quantity", "unit")
+                        }
+                    ok, response = await self.respond(request)
+                    if not ok:
+                        status = "400 Bad Request"
+                else:
+                    status, response = "404 Not Found", b'{"error": "Not found"}'
+
+                writer.write(
+                    f"HTTP/1.1 {status}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(response)}\r\n\r\n".encode() + response
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(
+        self, socket_path: str | None = None, host: str = "127.0.0.1", port: int = 0
+    ) -> None:
+        """
+        Serves JSON lines on the Unix socket at ``socket_path`` if it is given, and
+        HTTP on ``host`` and ``port`` otherwise, until cancelled.
+        """
+        if socket_path is not None:
+            server = await asyncio.start_unix_server(self.handle_lines, socket_path)
+            where = socket_path
+        else:
+            server = await asyncio.start_server(self.handle_http, host, port)
+            where = "http://{}:{}".format(*server.sockets[0].getsockname()[:2])
+        recipes = sum(len(program.recipes) for program in self.programs)
+        print(f"Serving {recipes} recipes on {where}", file=stderr, flush=True)
+        watcher = asyncio.create_task(self.watch())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,43 @@
+"""
+Statements, shared by all parser backends.
+
+This module doesn't import a parser, so that running a compiled programme doesn't
+have to either.
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, NamedTuple
+
+from pychef import Recipe as PychefRecipe
+
+if TYPE_CHECKING:
+    from pychef import Ingredient as PychefIngredient
+    from pychef.instructions import Instruction
+
+__all__ = ["Cook", "Include", "RecipeDefinition"]
+
+
+class RecipeDefinition(PychefRecipe):
+    """A recipe defined by a statement, which is where it is defined"""
+
+    __slots__ = ("idx",)
+
+    def __init__(
+        self, name: str, instructions: Iterable[Instruction], idx: int
+    ) -> None:
+        super().__init__(name, instructions)
+        self.idx = idx  # traceback information
+
+
+class Cook(NamedTuple):
+    recipe_name: str
+    scale: float | PychefIngredient | tuple[PychefIngredient, ...] | None
+    """A number of times, an ingredient to scale to, or a pantry to fit in"""
+    idx: int  # traceback information
+
+
+class Include(NamedTuple):
+    path: str
+    """As written, relative to the directory of the including file"""
+    idx: int  # traceback information
@@ -0,0 +1,121 @@
+"""
+Reading ChefScript sources one top-level statement at a time.
+
+A top-level statement starts at an unindented, non-blank line that is not inside a
+comment, so a source can be split into statements while it is being read, and each
+statement can be parsed and run before the rest of the source is available. As a
+recipe body may start at column 1, a statement is only known to start at such a line
+if it is a ``cook`` statement or if the line before it ends a statement: see
+:data:`ENDS_STATEMENT`.
+"""
+
+from __future__ import annotations
+
+from mmap import ACCESS_READ, mmap
+from os import fstat
+from re import compile as re_compile
+from typing import BinaryIO, Iterable, Iterator
+
+__all__ = ["ENDS_STATEMENT", "read_lines", "split_statements", "universal_newlines"]
+
+_COMMENT_START = re_compile(r"(?:^|(?<=[ \t)]))\(")
+_COOK_STATEMENT = re_compile(r"cook(?![A-Za-z0-9_$])")
+_PANTRY = re_compile(r"(?<![A-Za-z0-9_$])with[ \t]+pantry(?![A-Za-z0-9_$])")
+_LINE = re_compile(r"[^\n]*\n|[^\n]+")
+
+ENDS_STATEMENT = re_compile(
+    # an indented ingredient line, as names can't hold the keyword "of", which ends
+    # any block it is in at an unindented line
+    r"[ \t][^()]*(?<![A-Za-z0-9_$])of(?![A-Za-z0-9_$])[^()]*(?:\(|$)"
+    # or a cook statement without a pantry, as names can't start with "cook"
+    r"|cook(?![A-Za-z0-9_$])(?![^()]*with[ \t]+pantry(?![A-Za-z0-9_$]))[^()]*$"
+)
+"""
+Matches a line that surely ends a statement, with no ``)`` before its first ``(``,
+if any, so that it doesn't end a comment either
+"""
+
+
+def universal_newlines(text: str) -> str:
+    """Translates ``\\r\\n`` and lone ``\\r`` line endings to ``\\n``."""
+    return text.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def read_lines(file: BinaryIO) -> Iterator[str]:
+    """
+    Yields the lines of a UTF-8 encoded ``file`` through a read-only memory map,
+    with :func:`universal_newlines`, like a source that is read whole.
+    """
+    if not fstat(file.fileno()).st_size:
+        return
+    with mmap(file.fileno(), 0, access=ACCESS_READ) as mm:
+        for raw_line in iter(mm.readline, b""):
+            line = raw_line.decode("utf-8")
+            if "\r" not in line:
+                yield line
+            else:
+                # a lone \r ends a line too, so a raw line may hold several
+                yield from _LINE.findall(universal_newlines(line))
+
+
+def _ends_in_comment(line: str, in_comment: bool) -> bool:
+    """Returns whether a comment is still open at the end of ``line``."""
+    loc = 0
+    while True:
+        if in_comment:
+            loc = line.find(")", loc)
+            if loc < 0:
+                return True
+            in_comment = False
+            loc += 1
+        else:
+            m = _COMMENT_START.search(line, loc)
+            if m is None:
+                return False
+            in_comment = True
+            loc = m.end()
+
+
+def split_statements(lines: Iterable[str]) -> Iterator[tuple[int, str]]:
+    """
+    Groups ``lines`` into chunks holding one top-level statement each.
+
+    Yields ``(line_offset, chunk)``, where ``line_offset`` is the number of lines
+    before the chunk in the whole source. Blank lines and indented lines belong to the
+    statement before them, and so do unindented lines that may be part of it, which
+    is those after a line :data:`ENDS_STATEMENT` doesn't match, unless they are a
+    ``cook`` statement. A ``cook`` statement is yielded as soon as its line (and any
+    comment opened on it) is complete, so its output is not delayed until the next
+    statement is read, unless it is followed by a pantry.
+    """
+    chunk: list[str] = []
+    line_offset = 0
+    lineno = 0
+    in_comment = False
+    in_statement = False
+    is_cook = False
+    last = ""  # the last non-blank line
+
+    for line in lines:
+        if not in_comment and line[:1] not in ("", " ", "\t", "\n"):
+            cook = _COOK_STATEMENT.match(line) is not None
+            if in_statement and (cook or ENDS_STATEMENT.match(last) is not None):
+                yield line_offset, "".join(chunk)
+                chunk = []
+                line_offset = lineno
+            in_statement = True
+            is_cook = cook and _PANTRY.search(line) is None
+        chunk.append(line)
+        lineno += 1
+        if line.strip():
+            last = line
+        in_comment = _ends_in_comment(line, in_comment)
+
+        if is_cook and not in_comment:
+            yield line_offset, "".join(chunk)
+            chunk = []
+            line_offset = lineno
+            in_statement = is_cook = False
+
+    if chunk:
+        yield line_offset, "".join(chunk)
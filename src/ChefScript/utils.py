@@ -1,13 +1,28 @@
 from __future__ import annotations
 
-from importlib.metadata import PackageNotFoundError, version
+from bisect import bisect_right
+from functools import cache
+
+
+@cache
+def chefscript_version() -> str:
+    # importlib.metadata is slow to import, and most runs never need the version
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("ChefScript")
+    except PackageNotFoundError:
+        return "0.0.0"
+
+
+def __getattr__(name: str) -> str:
+    if name == "__version__":
+        return chefscript_version()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-try:
-    __version__ = version("ChefScript")
-except PackageNotFoundError:
-    __version__ = "0.0.0"
 
 MAX_TERMINTAL_WIDTH = 80
+TAB = " " * 4
 
 
 def pretty_str(s: str) -> str:
@@ -18,15 +33,67 @@ def index_to_position(s: str, index: int) -> Position:
     """
     Returns (line_number, col) of `index` in `s`.
 
-    https://stackoverflow.com/a/66443805/11946514
+    Builds a throwaway :class:`SourceMap`; use one directly for repeated lookups.
     """
-    if not len(s):
+    if not s:
         return Position(-1, -1)
-    sp = s[: index + 1].splitlines(keepends=True)
-    return Position(len(sp), len(sp[-1]))
+    return SourceMap(s).position(index)
+
+
+class SourceMap:
+    """
+    Maps indices in a source string to line and column positions.
+
+    The start index of every line is computed once, so each lookup is a binary
+    search. ``line_offset`` is added to every line number, for sources that are a
+    chunk of a larger file.
+
+    ``line_starts`` can be given if they are already known, for example from a
+    compiled programme, whose source may not even be available.
+    """
+
+    def __init__(
+        self,
+        source: str,
+        line_offset: int = 0,
+        line_starts: list[int] | None = None,
+    ) -> None:
+        self.source = source
+        self.line_offset = line_offset
+        if line_starts is not None:
+            self.line_starts = line_starts
+            return
+        self.line_starts = [0]
+        find = source.find
+        i = find("\n")
+        while i >= 0:
+            self.line_starts.append(i + 1)
+            i = find("\n", i + 1)
+
+    def position(self, index: int) -> Position:
+        line = bisect_right(self.line_starts, index)
+        return Position(line + self.line_offset, index - self.line_starts[line - 1] + 1)
+
+    def line(self, line: int) -> str:
+        """Returns the text of ``line`` (as numbered by :meth:`position`)."""
+        line -= self.line_offset
+        if not 1 <= line <= len(self.line_starts):
+            return ""
+        start = self.line_starts[line - 1]
+        end = self.source.find("\n", start)
+        return self.source[start:] if end < 0 else self.source[start:end]
+
+    def excerpt(self, pos: Position) -> str:
+        """Returns the line at ``pos`` with a caret under its column."""
+        if not pos:
+            return ""
+        text = self.line(pos.line)
+        return f"{TAB}{text}\n{TAB}{' ' * (pos.col - 1)}^" if text.strip() else ""
 
 
 class Position:
+    __slots__ = ("line", "col")
+
     def __init__(self, line: int, col: int):
         self.line = line
         self.col = col
@@ -55,27 +122,40 @@ class ChefScriptInternalError(ChefScriptException):
 
 
 class ChefScriptErrorWithPosition(ChefScriptException):
-    def __init__(self, msg: str, fn: str, pos: Position):
+    def __init__(
+        self, msg: str, fn: str, pos: Position, source_map: SourceMap | None = None
+    ):
         self.msg = msg
         self.fn = fn
         self.pos = pos
+        self.source_map = source_map
+
+    @property
+    def excerpt(self) -> str:
+        if self.source_map is None:
+            return ""
+        excerpt = self.source_map.excerpt(self.pos)
+        return f"\n{excerpt}" if excerpt else ""
 
 
 class ChefScriptKeyboardInterrupt(ChefScriptErrorWithPosition):
     def __str__(self):
         if self.msg:
-            return f"In {self.fn}:{self.pos}: keyboard interrupt: {self.msg}"
+            return (
+                f"In {self.fn}:{self.pos}: keyboard interrupt: {self.msg}"
+                f"{self.excerpt}"
+            )
         elif self.pos:
-            return f"In {self.fn}:{self.pos}: keyboard interrupt"
+            return f"In {self.fn}:{self.pos}: keyboard interrupt{self.excerpt}"
         else:
             return f"In {self.fn}: keyboard interrupt"
 
 
 class ChefScriptSyntaxError(ChefScriptErrorWithPosition):
     def __str__(self):
-        return f"In {self.fn}:{self.pos}: syntax error: {self.msg}"
+        return f"In {self.fn}:{self.pos}: syntax error: {self.msg}{self.excerpt}"
 
 
 class ChefScriptRuntimeError(ChefScriptErrorWithPosition):
     def __str__(self):
-        return f"In {self.fn}:{self.pos}: runtime error: {self.msg}"
+        return f"In {self.fn}:{self.pos}: runtime error: {self.msg}{self.excerpt}"
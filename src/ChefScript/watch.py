@@ -0,0 +1,493 @@
+"""
+Running a programme again whenever it changes, doing only the work the change needs.
+
+The source is split into top-level statements like with ``--stream``, and only the
+statements whose text changed are parsed again. The watcher indexes where every
+recipe is defined and which statements use it, so after an edit it only visits the
+statements that changed and those depending on them: a recipe is resolved again if a
+recipe it uses was, and a ``cook`` statement is only run again, and printed, if its
+recipe was. So the time spent parsing and cooking after an edit depends on what the
+edit touched, not on the size of the file.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from heapq import heappop, heappush
+from itertools import accumulate, count
+from os import stat
+from pathlib import Path
+from time import sleep
+from typing import Any, Iterable
+
+from pychef import Recipe as PychefRecipe
+
+from .interpreter import ChefScriptInterpreter, _decode
+from .modules import Module, dependencies
+from .statements import Cook, Include
+from .stream import split_statements
+from .utils import SourceMap
+
+__all__ = ["Watcher"]
+
+
+def _common_prefix(a: str, b: str) -> int:
+    """The length of the longest common prefix of ``a`` and ``b``"""
+    # a binary search compares the strings in C, a character loop wouldn't
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[low:mid] == b[low:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _common_suffix(a: str, b: str, prefix: int) -> int:
+    """
+    The length of the longest common suffix of ``a`` and ``b`` not overlapping their
+    common ``prefix``
+    """
+    low, high = 0, min(len(a), len(b)) - prefix
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[len(a) - mid : len(a) - low] == b[len(b) - mid : len(b) - low]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def _split_statements(code: str, line_offset: int) -> list[tuple[int, str]]:
+    """:func:`split_statements` of ``code``, starting at line ``line_offset``"""
+    lines = [line + "\n" for line in code.split("\n")]
+    if code.endswith("\n") or not code:
+        lines.pop()
+    else:
+        lines[-1] = lines[-1][:-1]
+    return [(line_offset + offset, text) for offset, text in split_statements(lines)]
+
+
+def _same(a: Iterable[Any], b: Iterable[Any]) -> bool:
+    """Whether ``a`` and ``b`` hold the same versions"""
+    a, b = tuple(a), tuple(b)
+    return len(a) == len(b) and all(x is y for x, y in zip(a, b))
+
+
+class _Chunk:
+    """A top-level statement of the source, parsed"""
+
+    __slots__ = ("text", "source_map", "statements", "uses", "resolved", "index")
+
+    def __init__(
+        self,
+        text: str,
+        source_map: SourceMap,
+        statements: list[PychefRecipe | Cook | Include],
+    ) -> None:
+        self.text = text
+        self.source_map = source_map
+        self.statements = statements
+        self.uses = [
+            tuple(
+                dict.fromkeys(
+                    item.name
+                    for item in stmt.instructions.items
+                    if isinstance(item, PychefRecipe)
+                )
+            )
+            if isinstance(stmt, PychefRecipe)
+            else ()
+            for stmt in statements
+        ]
+        """For each recipe, the names of the recipes it uses"""
+        self.resolved: list[Any] = [None] * len(statements)
+        """
+        For each recipe, the versions of the recipes it was resolved with and its own
+        version; for each ``cook`` statement, the version of the recipe it printed;
+        for each ``include`` statement, the module it included
+        """
+        self.index = -1
+        """The position of the chunk in the file, or -1 once it is removed"""
+
+
+_Address = tuple[_Chunk, int]
+"""A statement, as its chunk and its position in the chunk"""
+
+
+def _order(address: _Address) -> tuple[int, int]:
+    """The position of a statement in the file"""
+    return address[0].index, address[1]
+
+
+class Watcher:
+    """
+    Runs the file ``filename`` with ``interpreter``, and again every time it or a
+    file it includes changes.
+
+    A version identifies how a recipe was resolved: a new number every time a recipe
+    is resolved, or the recipe itself for the immutable recipes of included files.
+    ``stats`` counts the statements parsed and the ``cook`` statements run by the
+    last update, out of all of them.
+    """
+
+    def __init__(
+        self,
+        interpreter: ChefScriptInterpreter,
+        filename: str,
+        poll_interval: float = 0.5,
+    ) -> None:
+        self.interpreter = interpreter
+        self.filename = filename
+        self.path = Path(filename).resolve()
+        self.poll_interval = poll_interval
+        self.stats = dict.fromkeys(("parsed", "statements", "cooked", "cooks"), 0)
+        self._code = ""
+        self._chunks: list[_Chunk] = []
+        self._lengths: list[int] = []
+        self._lines: list[int] = []
+        """The lengths of the chunks, in characters and in lines"""
+        self._versions = count()
+        self._defs: dict[str, list[_Address]] = {}
+        """The statements defining each recipe, in order"""
+        self._users: dict[str, list[_Address]] = {}
+        """The recipes and ``cook`` statements using each recipe, in order"""
+        self._includes: list[_Address] = []
+        self._queue: list[tuple[int, int, _Chunk]] = []
+        """The statements left to run, in order, kept when running them fails"""
+        self._queued: set[tuple[int, int]] = set()
+
+    @property
+    def recipes(self) -> dict[str, PychefRecipe]:
+        """The recipes defined at the end of the file"""
+        names = sorted(self._defs, key=lambda name: _order(self._defs[name][0]))
+        return {name: self._recipe(self._defs[name][-1], name) for name in names}
+
+    @property
+    def included(self) -> list[Module]:
+        """The modules included by the file"""
+        return [chunk.resolved[i] for chunk, i in self._includes if chunk.resolved[i]]
+
+    def watch(self) -> None:
+        """Updates the output whenever the files change, until interrupted."""
+        mtimes = None
+        while True:
+            current = self._mtimes()
+            if current != mtimes:
+                mtimes = current
+                if self.update():
+                    print(
+                        f"Updated {self.filename}: parsed {self.stats['parsed']} "
+                        f"of {self.stats['statements']} statements, cooked "
+                        f"{self.stats['cooked']} of {self.stats['cooks']}",
+                        file=self.interpreter.stderr,
+                        flush=True,
+                    )
+            sleep(self.poll_interval)
+
+    def _mtimes(self) -> list[int]:
+        paths = [self.path] + dependencies(self.included)
+        mtimes = []
+        for path in paths:
+            try:
+                mtimes.append(stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(-1)
+        return mtimes
+
+    def update(self) -> bool:
+        """
+        Runs what changed in the file since the last update, printing the ``cook``
+        statements whose output changed. Returns whether it ran without errors.
+        """
+        interpreter = self.interpreter
+        interpreter.filename = self.filename
+        self.stats["parsed"] = self.stats["cooked"] = 0
+        with interpreter._reporting_errors():
+            code = _decode(self.path.read_bytes())
+            first, last, split = self._split(code)
+            chunks = [
+                (self._parse(text, line_offset, reused), line_offset, text)
+                for line_offset, text, reused in split
+            ]
+            # only change the chunks once the whole file is parsed
+            self._replace(first, last, chunks)
+            self._code = code
+            self._run()
+            return True
+        return False
+
+    def _split(
+        self, code: str
+    ) -> tuple[int, int, list[tuple[int, str, _Chunk | None]]]:
+        """
+        Splits the part of ``code`` that changed into top-level statements.
+
+        Returns the range of chunks it replaces, and its statements as
+        ``(line_offset, text, chunk)``, where ``chunk`` is a replaced chunk with the
+        same text if there is one.
+        """
+        old, chunks = self._code, self._chunks
+        starts = list(accumulate(self._lengths, initial=0))
+        prefix = _common_prefix(old, code)
+        suffix = _common_suffix(old, code, prefix)
+
+        # a change can extend the statement before it, so split again from there
+        first = max(bisect_right(starts, prefix - 1) - 1, 0)
+        # the first statement starting after a newline in the unchanged end
+        last = bisect_left(starts, len(old) - suffix + 1, first + 1)
+        line_offset = sum(self._lines[:first])
+
+        split: list[tuple[int, str]] = []
+        if last < len(chunks):
+            end = starts[last + 1] + len(code) - len(old)
+            split = _split_statements(code[starts[first] : end], line_offset)
+        # the unchanged end still starts with the same statement, unless the change
+        # left a comment open
+        if split and len(split[-1][1]) == len(chunks[last].text):
+            split.pop()
+        else:
+            last = len(chunks)
+            split = _split_statements(code[starts[first] :], line_offset)
+
+        reusable: dict[str, list[_Chunk]] = {}
+        for chunk in chunks[first:last]:
+            # blank lines at the end of a statement don't change what it means
+            reusable.setdefault(chunk.text.rstrip(), []).append(chunk)
+        region = []
+        for offset, text in split:
+            same = reusable.get(text.rstrip())
+            region.append((offset, text, same.pop(0) if same else None))
+        return first, last, region
+
+    def _parse(self, text: str, line_offset: int, chunk: _Chunk | None) -> _Chunk:
+        """Returns ``chunk`` if it is given, and else parses ``text``."""
+        if chunk is not None:
+            return chunk
+        interpreter = self.interpreter
+        interpreter.code = text
+        interpreter.source_map = SourceMap(text.expandtabs(), line_offset)
+        with interpreter._phase("parse"):
+            statements = interpreter._parse(text)
+        self.stats["parsed"] += len(statements)
+        return _Chunk(text, interpreter.source_map, statements)
+
+    def _replace(
+        self,
+        first: int,
+        last: int,
+        region: list[tuple[_Chunk, int, str]],
+    ) -> None:
+        """
+        Replaces the chunks from ``first`` to ``last`` with those of ``region``, and
+        queues the statements the change can affect.
+        """
+        chunks = self._chunks
+        removed, added = chunks[first:last], [chunk for chunk, _, _ in region]
+        # statements that failed to run, or weren't reached, are run again
+        pending = [(chunk, i) for _, i, chunk in self._queue if chunk.index >= 0]
+        self._queue, self._queued = [], set()
+
+        changed: dict[str, None] = {}
+        for chunk in removed:
+            changed.update(dict.fromkeys(self._unindex(chunk)))
+            chunk.index = -1
+        for chunk, _, text in region:
+            chunk.text = text
+        chunks[first:last] = added
+        self._lengths[first:last] = [len(chunk.text) for chunk in added]
+        self._lines[first:last] = [chunk.text.count("\n") for chunk in added]
+        end = len(chunks) if len(added) != len(removed) else first + len(added)
+        for index in range(first, end):
+            chunks[index].index = index
+        for chunk in added:
+            changed.update(dict.fromkeys(self._index(chunk)))
+
+        for address in pending:
+            if address[0].index >= 0:
+                self._push(address)
+        for chunk in added:
+            for i in range(len(chunk.statements)):
+                self._push((chunk, i))
+        # the recipes defined by the change are seen by statements after it
+        for name in changed:
+            self._touch(name, (first + len(added), -1))
+        # included files can change without the file changing
+        for address in self._includes:
+            self._push(address)
+
+    def _index(self, chunk: _Chunk) -> list[str]:
+        """Indexes the statements of ``chunk``, returning the recipes it defines."""
+        defined = []
+        for i, stmt in enumerate(chunk.statements):
+            address = (chunk, i)
+            if isinstance(stmt, PychefRecipe):
+                defined.append(stmt.name)
+                self._insert(self._defs, stmt.name, address)
+                for name in chunk.uses[i]:
+                    self._insert(self._users, name, address)
+            elif isinstance(stmt, Include):
+                insort(self._includes, address, key=_order)
+            else:
+                self._insert(self._users, stmt.recipe_name, address)
+                self.stats["cooks"] += 1
+        self.stats["statements"] += len(chunk.statements)
+        return defined
+
+    def _unindex(self, chunk: _Chunk) -> list[str]:
+        """Undoes :meth:`_index`, returning the recipes ``chunk`` defined."""
+        defined = []
+        for i, stmt in enumerate(chunk.statements):
+            address = (chunk, i)
+            if isinstance(stmt, PychefRecipe):
+                defined.append(stmt.name)
+                self._remove(self._defs, stmt.name, address)
+                for name in chunk.uses[i]:
+                    self._remove(self._users, name, address)
+            elif isinstance(stmt, Include):
+                del self._includes[
+                    bisect_left(self._includes, (chunk.index, i), key=_order)
+                ]
+                if chunk.resolved[i] is not None:
+                    defined.extend(self._unregister(chunk, i))
+            else:
+                self._remove(self._users, stmt.recipe_name, address)
+                self.stats["cooks"] -= 1
+        self.stats["statements"] -= len(chunk.statements)
+        return defined
+
+    def _unregister(self, chunk: _Chunk, i: int) -> list[str]:
+        """Forgets the recipes of the module included at ``chunk[i]``."""
+        module: Module = chunk.resolved[i]
+        chunk.resolved[i] = None
+        for name in module.recipes:
+            self._remove(self._defs, name, (chunk, i))
+        return list(module.recipes)
+
+    @staticmethod
+    def _insert(index: dict[str, list[_Address]], name: str, address: _Address):
+        insort(index.setdefault(name, []), address, key=_order)
+
+    @staticmethod
+    def _remove(index: dict[str, list[_Address]], name: str, address: _Address):
+        addresses = index[name]
+        del addresses[bisect_left(addresses, _order(address), key=_order)]
+        if not addresses:
+            del index[name]
+
+    def _push(self, address: _Address) -> None:
+        chunk, i = address
+        if (chunk.index, i) not in self._queued:
+            self._queued.add((chunk.index, i))
+            heappush(self._queue, (chunk.index, i, chunk))
+
+    def _touch(self, name: str, after: tuple[int, int]) -> None:
+        """
+        Queues the statements after position ``after`` using the recipe ``name``, up
+        to where it is defined again.
+        """
+        users = self._users.get(name)
+        if not users:
+            return
+        defs = self._defs.get(name, [])
+        k = bisect_right(defs, after, key=_order)
+        until = _order(defs[k]) if k < len(defs) else None
+        for address in users[bisect_right(users, after, key=_order) :]:
+            if until is not None and _order(address) > until:
+                break
+            self._push(address)
+
+    def _definition(self, name: str, before: tuple[int, int]) -> _Address | None:
+        """The statement defining the recipe ``name`` seen at position ``before``"""
+        defs = self._defs.get(name)
+        if not defs:
+            return None
+        k = bisect_left(defs, before, key=_order)
+        return defs[k - 1] if k else None
+
+    @staticmethod
+    def _recipe(address: _Address, name: str) -> PychefRecipe:
+        chunk, i = address
+        stmt = chunk.statements[i]
+        if isinstance(stmt, PychefRecipe):
+            return stmt
+        return chunk.resolved[i].recipes[name]
+
+    def _version(self, name: str, before: tuple[int, int]) -> Any:
+        address = self._definition(name, before)
+        if address is None:
+            return None
+        chunk, i = address
+        resolved = chunk.resolved[i]
+        if isinstance(chunk.statements[i], Include):
+            return resolved.recipes[name]
+        return None if resolved is None else resolved[1]
+
+    def _visible(
+        self, names: Iterable[str], before: tuple[int, int]
+    ) -> OrderedDict[str, PychefRecipe]:
+        """The recipes ``names`` defined at position ``before``"""
+        recipes: OrderedDict[str, PychefRecipe] = OrderedDict()
+        for name in names:
+            address = self._definition(name, before)
+            if address is not None and self._version(name, before) is not None:
+                recipes[name] = self._recipe(address, name)
+        return recipes
+
+    def _run(self) -> None:
+        """Runs the queued statements in order, stopping at the first error."""
+        interpreter = self.interpreter
+        queue = self._queue
+        # the chunks after an edit moved, so their lines are only counted when needed
+        line_offsets = list(accumulate(self._lines, initial=0))
+        while queue:
+            index, i, chunk = queue[0]
+            interpreter.code = chunk.text
+            interpreter.source_map = chunk.source_map
+            chunk.source_map.line_offset = line_offsets[index]
+            self._run_statement(chunk, i)
+            heappop(queue)
+            self._queued.discard((index, i))
+        interpreter.recipes.clear()
+
+    def _run_statement(self, chunk: _Chunk, i: int) -> None:
+        interpreter = self.interpreter
+        stmt = chunk.statements[i]
+        position = (chunk.index, i)
+
+        if isinstance(stmt, PychefRecipe):
+            uses = chunk.uses[i]
+            used = [self._version(name, position) for name in uses]
+            resolved = chunk.resolved[i]
+            if resolved is not None and _same(resolved[0], used):
+                return
+            # forget how it was resolved, in case resolving it fails
+            chunk.resolved[i] = None
+            interpreter.recipes = self._visible(uses, position)
+            interpreter._add_recipe(stmt)
+            chunk.resolved[i] = (tuple(used), next(self._versions))
+            self._touch(stmt.name, position)
+
+        elif isinstance(stmt, Include):
+            module = interpreter._load_module(stmt)
+            if module is chunk.resolved[i]:
+                return
+            names = dict.fromkeys(module.recipes)
+            if chunk.resolved[i] is not None:
+                names.update(dict.fromkeys(self._unregister(chunk, i)))
+            chunk.resolved[i] = module
+            for name in module.recipes:
+                self._insert(self._defs, name, (chunk, i))
+            for name in names:
+                self._touch(name, position)
+
+        else:
+            version = self._version(stmt.recipe_name, position)
+            if version is not None and chunk.resolved[i] is version:
+                return
+            interpreter.recipes = self._visible((stmt.recipe_name,), position)
+            interpreter._cook(stmt)
+            chunk.resolved[i] = version
+            self.stats["cooked"] += 1
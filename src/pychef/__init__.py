@@ -1,4 +1,18 @@
+from .attributes import AttributeTable
+from .graph import RecipeCycleError, dependencies, topological_order
+from .index import IngredientIndex
 from .ingredient import Ingredient, Quantity
 from .recipe import Recipe
+from .table import IngredientTable
 
-__all__ = ["Ingredient", "Quantity", "Recipe"]
+__all__ = [
+    "AttributeTable",
+    "Ingredient",
+    "IngredientIndex",
+    "IngredientTable",
+    "Quantity",
+    "Recipe",
+    "RecipeCycleError",
+    "dependencies",
+    "topological_order",
+]
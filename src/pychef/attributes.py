@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import csv
+from os import PathLike
+from typing import Iterable, Sequence, TextIO
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .ingredient import Quantity
+from .table import IngredientTable
+from .units import registry
+
+__all__ = ["AttributeTable"]
+
+
+class AttributeTable:
+    """
+    Attributes of ingredients, like a price or nutrients, per quantity of each.
+
+    Row ``i`` gives the attributes of one ``unit_ids[i]`` of the ingredient
+    ``names[i]``, in ``per_unit[i]``, with one column per name in ``attributes``. So
+    the attributes of a table of ingredients are a dot product: its quantities,
+    converted to the units of the rows of their ingredients, times those rows.
+    """
+
+    __slots__ = ("names", "attributes", "unit_ids", "per_unit", "_rows")
+
+    names: list[str]
+    attributes: list[str]
+    unit_ids: np.ndarray
+    per_unit: np.ndarray
+    _rows: dict[str, int]
+    """Ingredient name -> its row"""
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        quantities: Sequence[Quantity],
+        attributes: Sequence[str],
+        values: ArrayLike,
+    ) -> None:
+        """
+        ``values[i][j]`` is the attribute ``attributes[j]`` of ``quantities[i]`` of
+        the ingredient ``names[i]``.
+
+        Raises ``ValueError`` if an ingredient has several rows, if a quantity is 0,
+        or if ``values`` doesn't have a row per ingredient and a column per attribute.
+        """
+        self.names = list(names)
+        self.attributes = list(attributes)
+        self._rows = {name: row for row, name in enumerate(self.names)}
+        if len(self._rows) < len(self.names):
+            duplicate = next(n for n in self.names if self.names.count(n) > 1)
+            raise ValueError(f"Ingredient '{duplicate}' has several rows")
+        values = np.asarray(values, dtype=float)
+        shape = (len(self.names), len(self.attributes))
+        if len(quantities) != len(self.names) or values.size != shape[0] * shape[1]:
+            raise ValueError("Expected a quantity and values for every ingredient")
+        magnitudes = np.array([q.value for q in quantities], dtype=float)
+        if not magnitudes.all():
+            zero = self.names[int(np.argmin(magnitudes != 0))]
+            raise ValueError(f"The quantity of ingredient '{zero}' is 0")
+        self.unit_ids = np.array([q.unit_id for q in quantities], dtype=np.intp)
+        self.per_unit = values.reshape(shape) / magnitudes[:, None]
+
+    @classmethod
+    def from_csv(cls, file: str | PathLike | TextIO) -> AttributeTable:
+        """
+        Reads a CSV file whose header is ``ingredient,quantity,unit`` followed by the
+        names of the attributes, and whose rows give the attributes of a quantity of
+        an ingredient, like ``flour,1,kg,1.20,3640`` for a price and energy::
+
+            ingredient,quantity,unit,price,kcal
+            flour,1,kg,1.20,3640
+
+        Raises ``ValueError`` for a row that isn't a quantity and a number for each
+        attribute, or if :meth:`__init__` does.
+        """
+        if isinstance(file, (str, PathLike)):
+            with open(file, newline="", encoding="utf-8-sig") as f:
+                return cls.from_csv(f)
+
+        reader = csv.reader(file)
+        header: list[str] = next(reader, [])
+        if len(header) < 4:
+            raise ValueError(
+                "Expected a header of ingredient, quantity, unit and attributes"
+            )
+        names: list[str] = []
+        quantities: list[Quantity] = []
+        values: list[list[float]] = []
+        for row in reader:
+            if not row:
+                continue
+            line = reader.line_num
+            if len(row) != len(header):
+                raise ValueError(f"Line {line}: expected {len(header)} fields")
+            name, value, unit, *attributes = row
+            try:
+                magnitude = float(value)
+                values.append([float(x) for x in attributes])
+            except ValueError:
+                raise ValueError(f"Line {line}: expected numbers")
+            try:
+                quantities.append(Quantity(magnitude, unit.strip()))
+            except Exception:
+                raise ValueError(f"Line {line}: invalid unit '{unit}'")
+            names.append(name.strip())
+        return cls(names, quantities, [a.strip() for a in header[3:]], values)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._rows
+
+    def _lookup(self, table: IngredientTable) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The row of each ingredient of ``table``, and its quantity in the unit of that
+        row.
+        """
+        index = self._rows
+        rows = np.fromiter(
+            (index[name] for name in table.names), dtype=np.intp, count=len(table)
+        )
+        factors = registry.factors(table.unit_ids, self.unit_ids[rows])
+        return rows, table.values * factors
+
+    def values(self, table: IngredientTable) -> np.ndarray:
+        """
+        The attributes of each ingredient of ``table``, with one row per ingredient
+        and one column per attribute.
+
+        Raises ``KeyError`` for an ingredient without attributes, and ``ValueError``
+        if a quantity isn't in a unit compatible with that of its attributes.
+        """
+        rows, quantities = self._lookup(table)
+        return quantities[:, None] * self.per_unit[rows]
+
+    def totals(self, table: IngredientTable) -> np.ndarray:
+        """
+        The attributes of all the ingredients of ``table``, one per column: a single
+        dot product. Raises like :meth:`values`.
+        """
+        rows, quantities = self._lookup(table)
+        return quantities @ self.per_unit[rows]
+
+    def totals_many(
+        self, tables: Iterable[IngredientTable], scales: ArrayLike | None = None
+    ) -> np.ndarray:
+        """
+        :meth:`totals` for every table of ``tables``, multiplied by the scale at the
+        same index in ``scales`` if given, with one row per table.
+
+        The ingredients of every distinct table are looked up at once, and the totals
+        of a table given several times, like the summary of a recipe cooked at many
+        scales, are only computed once. Raises like :meth:`values`, or
+        ``ValueError`` if ``scales`` doesn't have a scale per table.
+        """
+        distinct: dict[int, int] = {}
+        unique: list[IngredientTable] = []
+        which: list[int] = []
+        for table in tables:
+            i = distinct.setdefault(id(table), len(unique))
+            if i == len(unique):
+                unique.append(table)
+            which.append(i)
+
+        rows, quantities = self._lookup(IngredientTable.concatenate(unique))
+        owners = np.repeat(np.arange(len(unique)), [len(table) for table in unique])
+        per_unit = self.per_unit[rows]
+        totals = np.empty((len(unique), len(self.attributes)))
+        for j in range(len(self.attributes)):
+            totals[:, j] = np.bincount(
+                owners, weights=quantities * per_unit[:, j], minlength=len(unique)
+            )
+
+        result = totals[np.asarray(which, dtype=np.intp)]
+        if scales is not None:
+            scales = np.asarray(scales, dtype=float)
+            if scales.shape != (len(which),):
+                raise ValueError("Expected a scale for every table")
+            result *= scales[:, None]
+        return result
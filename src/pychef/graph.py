@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Hashable, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from .recipe import Recipe
+
+__all__ = ["RecipeCycleError", "definition_key", "dependencies", "topological_order"]
+
+
+class RecipeCycleError(ValueError):
+    """Raised when a recipe uses itself, directly or through other recipes."""
+
+
+def definition_key(recipe: Recipe) -> Hashable:
+    """
+    Identifies the definition behind ``recipe``.
+
+    A recipe referenced from several places is represented by a separate object at
+    each of them, all sharing the instructions of its definition.
+    """
+    return recipe.name, id(recipe.instructions)
+
+
+def dependencies(recipe: Recipe) -> list[Recipe]:
+    """
+    The recipes referenced in the instructions of ``recipe``, in order of first
+    reference, each once.
+    """
+    referenced: dict[str, Recipe] = {}
+    for item in recipe.instructions.items:
+        if not isinstance(item, str):
+            referenced.setdefault(item.name, item)
+    return list(referenced.values())
+
+
+def _reversed_dependencies(recipe: Recipe) -> Iterator[Recipe]:
+    return reversed(dependencies(recipe))
+
+
+def topological_order(roots: Iterable[Recipe]) -> list[Recipe]:
+    """
+    Every recipe reachable from ``roots``, each definition once, with every recipe
+    after the recipes it uses.
+
+    The graph is walked with an explicit stack, so deep nesting doesn't hit the
+    recursion limit. Within a recipe, the sub-recipes referenced last come first,
+    which is the order :attr:`pychef.Recipe.pretty_str` prints them in.
+
+    Raises :class:`RecipeCycleError` if a recipe uses itself.
+    """
+    order: list[Recipe] = []
+    done: set[Hashable] = set()
+    in_progress: set[Hashable] = set()
+
+    for root in roots:
+        if definition_key(root) in done:
+            continue
+        in_progress.add(definition_key(root))
+        stack = [(root, _reversed_dependencies(root))]
+        while stack:
+            recipe, children = stack[-1]
+            for child in children:
+                key = definition_key(child)
+                if key in done:
+                    continue
+                if key in in_progress:
+                    raise RecipeCycleError(f"Recipe '{child.name}' uses itself")
+                in_progress.add(key)
+                stack.append((child, _reversed_dependencies(child)))
+                break
+            else:
+                stack.pop()
+                key = definition_key(recipe)
+                in_progress.discard(key)
+                done.add(key)
+                order.append(recipe)
+
+    return order
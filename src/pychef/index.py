@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
+
+from .ingredient import Quantity
+from .recipe import Recipe
+from .table import IngredientTable
+from .units import registry
+
+__all__ = ["IngredientIndex"]
+
+_magnitude = itemgetter(0)
+
+_TOLERANCE = 1e-9
+"""Relative rounding error allowed on bounds, for quantities converted between units"""
+
+
+def _magnitude_and_dimension(value: float, unit_id: int) -> tuple[float, int]:
+    """A quantity in SI base units, and the id of its dimensions"""
+    return value * registry.references[unit_id], registry.dimension_ids[unit_id]
+
+
+class IngredientIndex:
+    """
+    The recipes using each ingredient, directly or through the recipes they use,
+    indexed by name.
+
+    A recipe is indexed by its summary, which is computed from the cached summaries
+    of the recipes it uses, so indexing a library summarises each recipe once. For
+    each ingredient, the recipes using it are kept sorted by the quantity they use,
+    in SI base units, so finding those using at least or at most a quantity takes a
+    binary search rather than a pass over every recipe.
+    """
+
+    __slots__ = ("_summaries", "_users")
+
+    _summaries: dict[str, IngredientTable]
+    """Recipe name -> the summary it was indexed by"""
+    _users: dict[str, dict[int, list[tuple[float, str]]]]
+    """
+    Ingredient name -> dimension id -> the quantity used and the name of each recipe
+    using it in a unit of that dimension, sorted
+    """
+
+    def __init__(self) -> None:
+        self._summaries = {}
+        self._users = {}
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._summaries
+
+    def add(self, recipe: Recipe) -> None:
+        """
+        Indexes ``recipe`` under its name, replacing the recipe indexed under it.
+
+        Raises ``ValueError`` if the recipe can't be summarised.
+        """
+        summary = recipe.summary
+        self.remove(recipe.name)
+        self._summaries[recipe.name] = summary
+        users = self._users
+        for ingredient, value, unit_id in zip(
+            summary.names, summary.values.tolist(), summary.unit_ids.tolist()
+        ):
+            magnitude, dimension = _magnitude_and_dimension(value, unit_id)
+            entries = users.setdefault(ingredient, {}).setdefault(dimension, [])
+            insort(entries, (magnitude, recipe.name))
+
+    def remove(self, name: str) -> None:
+        """Removes the recipe indexed under ``name``, if there is one."""
+        summary = self._summaries.pop(name, None)
+        if summary is None:
+            return
+        users = self._users
+        for ingredient, value, unit_id in zip(
+            summary.names, summary.values.tolist(), summary.unit_ids.tolist()
+        ):
+            magnitude, dimension = _magnitude_and_dimension(value, unit_id)
+            by_dimension = users[ingredient]
+            entries = by_dimension[dimension]
+            del entries[bisect_left(entries, (magnitude, name))]
+            if not entries:
+                del by_dimension[dimension]
+                if not by_dimension:
+                    del users[ingredient]
+
+    def find(
+        self,
+        ingredient: str,
+        at_least: Quantity | None = None,
+        at_most: Quantity | None = None,
+    ) -> IngredientTable:
+        """
+        The recipes using ``ingredient``, optionally at least ``at_least`` and at most
+        ``at_most`` of it, with the quantity each of them uses in the unit of its
+        summary. The bounds are inclusive, up to rounding. The recipes are sorted by
+        that quantity; without bounds, recipes using the ingredient in units of
+        different dimensions come in separate runs.
+
+        Raises ``ValueError`` if the bounds aren't in compatible units, or if the
+        ingredient is used but never in a unit compatible with them.
+        """
+        by_dimension = self._users.get(ingredient, {})
+        if at_least is None and at_most is None:
+            runs = list(by_dimension.values())
+        else:
+            lower = upper = None
+            if at_least is not None:
+                unit_id = at_least.unit_id
+                lower, dimension = _magnitude_and_dimension(at_least.value, unit_id)
+            if at_most is not None:
+                if at_least is not None:
+                    # raises ValueError if the units aren't compatible
+                    registry.factor(at_most.unit_id, at_least.unit_id)
+                unit_id = at_most.unit_id
+                upper, dimension = _magnitude_and_dimension(at_most.value, unit_id)
+            if by_dimension and dimension not in by_dimension:
+                # raises ValueError: the ingredient is only used in other units
+                _, name = next(iter(by_dimension.values()))[0]
+                used = self._summaries[name].quantity(ingredient)
+                registry.factor(unit_id, used.unit_id)
+            entries = by_dimension.get(dimension, [])
+            start, stop = 0, len(entries)
+            if lower is not None:
+                lower -= abs(lower) * _TOLERANCE
+                start = bisect_left(entries, lower, key=_magnitude)
+            if upper is not None:
+                upper += abs(upper) * _TOLERANCE
+                stop = bisect_right(entries, upper, key=_magnitude)
+            runs = [entries[start:stop]]
+
+        names: list[str] = []
+        values: list[float] = []
+        unit_ids: list[int] = []
+        for run in runs:
+            for _, name in run:
+                quantity = self._summaries[name].quantity(ingredient)
+                names.append(name)
+                values.append(quantity.value)
+                unit_ids.append(quantity.unit_id)
+        return IngredientTable(names, values, unit_ids)
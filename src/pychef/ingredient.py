@@ -1,10 +1,8 @@
 from __future__ import annotations
 
-from copy import copy
 from typing import overload
 
-from quantities import Quantity as PQuantity
-
+from .units import registry
 from .utils import Real
 
 __all__ = ["Quantity", "Ingredient"]
@@ -17,24 +15,39 @@ class Quantity:
     It is intended to hold the weights and volumes of ingredients in cooking,
     so it doesn't support complex units (multiplication by another quantity),
     but it does support multiplication by bare numbers.
+
+    The value is a plain float and the unit is an id in :data:`pychef.units.registry`,
+    so arithmetic and rescaling are float multiplications.
     """
 
-    quantity: PQuantity
+    __slots__ = ("value", "unit_id")
+
+    value: float
+    unit_id: int
 
     def __init__(self, value: Real, unit: str) -> None:
-        self.quantity = PQuantity(value, self._normalize_unit(unit))
+        self.value = float(value)
+        self.unit_id = registry.unit_id(unit)
+
+    @classmethod
+    def _from_id(cls, value: float, unit_id: int) -> Quantity:
+        quantity = object.__new__(cls)
+        quantity.value = value
+        quantity.unit_id = unit_id
+        return quantity
 
     def __copy__(self) -> Quantity:
-        return Quantity(self.value, self.unit)
+        return Quantity._from_id(self.value, self.unit_id)
 
     def __repr__(self) -> str:
         return f"{self.value:.3f} {self.unit}"
 
     def __add__(self, other) -> Quantity:
         if isinstance(other, Quantity):
-            other_copy = copy(other)
-            other_copy.rescale(self.unit)
-            return Quantity(self.value + other_copy.value, self.unit)
+            return Quantity._from_id(
+                self.value + other.value * registry.factor(other.unit_id, self.unit_id),
+                self.unit_id,
+            )
         else:
             raise TypeError(
                 f"unsupported operand type(s) for +: '{type(self)}' and '{type(other)}'"
@@ -42,9 +55,10 @@ class Quantity:
 
     def __sub__(self, other) -> Quantity:
         if isinstance(other, Quantity):
-            other_copy = copy(other)
-            other_copy.rescale(self.unit)
-            return Quantity(self.value - other_copy.value, self.unit)
+            return Quantity._from_id(
+                self.value - other.value * registry.factor(other.unit_id, self.unit_id),
+                self.unit_id,
+            )
         else:
             raise TypeError(
                 f"unsupported operand type(s) for -: '{type(self)}' and '{type(other)}'"
@@ -52,7 +66,7 @@ class Quantity:
 
     def __mul__(self, other) -> Quantity:
         if isinstance(other, Real):  # type: ignore[misc, arg-type]
-            return Quantity(self.value * other, self.unit)
+            return Quantity._from_id(float(self.value * other), self.unit_id)
         else:
             raise TypeError(
                 f"unsupported operand type(s) for *: '{type(self)}' and '{type(other)}'"
@@ -73,31 +87,30 @@ class Quantity:
         if isinstance(other, Real):  # type: ignore[misc, arg-type]
             return self.__mul__(1 / other)
         elif isinstance(other, Quantity):
-            other_copy = copy(other)
-            other_copy.rescale(self.unit)
-            return self.value / other_copy.value
+            return self.value / (
+                other.value * registry.factor(other.unit_id, self.unit_id)
+            )
         else:
             raise TypeError(
                 f"unsupported operand type(s) for /: '{type(self)}' and '{type(other)}'"
             )
 
-    @staticmethod
-    def _normalize_unit(unit: str) -> str:
-        return unit.replace(".", "").replace(" ", "_").replace("^", "**")
-
     def rescale(self, unit: str) -> None:
-        self.quantity = self.quantity.rescale(self._normalize_unit(unit))
-
-    @property
-    def value(self) -> float:
-        return float(self.quantity.magnitude)
+        unit_id = registry.unit_id(unit)
+        self.value *= registry.factor(self.unit_id, unit_id)
+        self.unit_id = unit_id
 
     @property
     def unit(self) -> str:
-        return str(self.quantity.dimensionality).replace("_", " ")
+        return registry.names[self.unit_id]
 
 
 class Ingredient:
+    __slots__ = ("name", "quantity")
+
+    name: str
+    quantity: Quantity
+
     def __init__(self, name: str, quantity: Quantity) -> None:
         self.name = name
         self.quantity = quantity
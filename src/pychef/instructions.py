@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+from array import array
+from sys import intern
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+from .ingredient import Ingredient, Quantity
+from .table import IngredientTable
+
+if TYPE_CHECKING:
+    from .recipe import Recipe
+
+__all__ = ["Instruction", "Instructions"]
+
+Instruction = tuple["Ingredient | Recipe", Optional[str]]
+"""An ingredient or a recipe used by a recipe, and an optional comment"""
+
+
+class Instructions(Sequence[Instruction]):
+    """
+    The instructions of a recipe, stored column by column.
+
+    ``items[i]`` is the name of an ingredient, interned, or a recipe. The quantity of
+    an ingredient is ``values[i]`` of the unit ``unit_ids[i]``, which is -1 for a
+    recipe, and the comments are kept in one string. So an instruction costs a few
+    dozen bytes instead of an ingredient, a quantity, a float and a tuple, and the
+    ingredients are only built when the instructions are read.
+
+    Instructions are immutable, and can be shared by recipes.
+    """
+
+    __slots__ = ("items", "_data", "_comments")
+
+    items: tuple[str | Recipe, ...]
+    _data: bytes
+    """
+    The values as doubles, then the unit ids and where the comment of each
+    instruction ends in ``_comments`` as ints, ``~end`` for an instruction without
+    a comment. One buffer costs less than an array per column.
+    """
+    _comments: str
+
+    def __init__(self, instructions: Iterable[Instruction] = ()) -> None:
+        items: list[str | Recipe] = []
+        values: list[float] = []
+        unit_ids: list[int] = []
+        comments: list[str | None] = []
+        for item, comment in instructions:
+            if isinstance(item, Ingredient):
+                items.append(item.name)
+                values.append(item.quantity.value)
+                unit_ids.append(item.quantity.unit_id)
+            else:
+                items.append(item)
+                values.append(0.0)
+                unit_ids.append(-1)
+            comments.append(comment)
+        self._fill(items, values, unit_ids, comments)
+
+    @classmethod
+    def from_columns(
+        cls,
+        items: Sequence[str | Recipe],
+        values: Sequence[float],
+        unit_ids: Sequence[int],
+        comments: Sequence[str | None],
+    ) -> Instructions:
+        """
+        Instructions from their columns, without building an ingredient for each of
+        them. ``values`` and ``unit_ids`` are 0 and -1 for a recipe.
+        """
+        instructions = cls.__new__(cls)
+        instructions._fill(items, values, unit_ids, comments)
+        return instructions
+
+    def _fill(
+        self,
+        items: Sequence[str | Recipe],
+        values: Sequence[float],
+        unit_ids: Sequence[int],
+        comments: Sequence[str | None],
+    ) -> None:
+        comment_ends: list[int] = []
+        end = 0
+        for comment in comments:
+            if comment is None:
+                comment_ends.append(~end)
+            else:
+                end += len(comment)
+                comment_ends.append(end)
+        self.items = tuple(
+            intern(item) if isinstance(item, str) else item for item in items
+        )
+        self._data = (
+            array("d", values).tobytes()
+            + array("i", [*unit_ids, *comment_ends]).tobytes()
+        )
+        self._comments = "".join(filter(None, comments))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        item = self.items[index]
+        index %= len(self.items)
+        if isinstance(item, str):
+            value = float(self.values[index])
+            item = Ingredient(item, Quantity._from_id(value, int(self.unit_ids[index])))
+        return item, self.comment(index)
+
+    def __iter__(self) -> Iterator[Instruction]:
+        for item, value, unit_id, comment in zip(
+            self.items, self.values.tolist(), self.unit_ids.tolist(), self.comments
+        ):
+            if isinstance(item, str):
+                yield Ingredient(item, Quantity._from_id(value, unit_id)), comment
+            else:
+                yield item, comment
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({list(self)!r})"
+
+    @property
+    def values(self) -> np.ndarray:
+        """The values of the quantities, 0 for a recipe, as a read-only array"""
+        return np.frombuffer(self._data, dtype=float, count=len(self.items))
+
+    @property
+    def unit_ids(self) -> np.ndarray:
+        """The unit ids of the quantities, -1 for a recipe, as a read-only array"""
+        n = len(self.items)
+        return np.frombuffer(self._data, dtype=np.intc, count=n, offset=8 * n)
+
+    def _comment_ends(self) -> np.ndarray:
+        n = len(self.items)
+        return np.frombuffer(self._data, dtype=np.intc, count=n, offset=12 * n)
+
+    def comment(self, index: int) -> str | None:
+        ends = self._comment_ends()
+        end = int(ends[index])
+        if end < 0:
+            return None
+        start = 0 if index == 0 else int(ends[index - 1])
+        return self._comments[start if start >= 0 else ~start : end]
+
+    @property
+    def comments(self) -> list[str | None]:
+        comments: list[str | None] = []
+        text = self._comments
+        start = 0
+        for end in self._comment_ends().tolist():
+            if end < 0:
+                comments.append(None)
+                start = ~end
+            else:
+                comments.append(text[start:end])
+                start = end
+        return comments
+
+    def table(self, start: int = 0, stop: int | None = None) -> IngredientTable:
+        """The ingredients of the instructions from ``start`` to ``stop``"""
+        names = self.items[start:stop]
+        values = self.values[start:stop]
+        unit_ids = self.unit_ids[start:stop]
+        rows = np.flatnonzero(unit_ids >= 0)
+        if len(rows) == len(names):
+            return IngredientTable(names, values, unit_ids)  # type: ignore[arg-type]
+        return IngredientTable(
+            [names[i] for i in rows.tolist()],  # type: ignore[misc]
+            values[rows],
+            unit_ids[rows],
+        )
+
+    def scaled(
+        self, factor: float, scale_recipe: Callable[[Recipe], Recipe]
+    ) -> Instructions:
+        """
+        The instructions with every quantity multiplied by ``factor``, and every
+        recipe replaced by ``scale_recipe(recipe)``
+        """
+        instructions = Instructions()
+        instructions.items = tuple(
+            item if isinstance(item, str) else scale_recipe(item) for item in self.items
+        )
+        n = len(self.items)
+        instructions._data = (self.values * factor).tobytes() + self._data[8 * n :]
+        instructions._comments = self._comments
+        return instructions
@@ -1,22 +1,40 @@
 from __future__ import annotations
 
-from collections import OrderedDict, deque
-from typing import Optional, Sequence
+from sys import intern
+from typing import Hashable, Iterable, Iterator, Sequence
+from weakref import ref
 
-from .ingredient import Ingredient, Quantity
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .graph import definition_key, topological_order
+from .ingredient import Ingredient
+from .instructions import Instruction, Instructions
+from .table import IngredientTable
 from .utils import TAB, Real
 
 __all__ = ["Recipe"]
 
 
+_NO_INSTRUCTIONS = Instructions()
+
+
 class Recipe:
-    def __init__(
-        self,
-        name: str,
-        instructions: Sequence[tuple[Ingredient | Recipe, Optional[str]]],
-    ) -> None:
-        self.name = name
-        self.instructions = instructions
+    __slots__ = ("name", "_instructions", "_summary", "_parents", "__weakref__")
+
+    name: str
+    _instructions: Instructions
+    _summary: IngredientTable | None
+    """Cached :attr:`summary`, ``None`` when it has to be recomputed"""
+    _parents: tuple[ref[Recipe], ...] | None
+    """Recipes with a cached summary whose instructions reference this one"""
+
+    def __init__(self, name: str, instructions: Iterable[Instruction]) -> None:
+        self.name = intern(name)
+        self._instructions = _NO_INSTRUCTIONS
+        self._summary = None
+        self._parents = None
+        self.instructions = instructions  # type: ignore[assignment]
 
     def __repr__(self) -> str:
         str_builder = [f"{self.name}"]
@@ -33,7 +51,12 @@ class Recipe:
 
     def __mul__(self, other) -> Recipe:
         if isinstance(other, Real):  # type: ignore[misc, arg-type]
-            return Recipe(self.name, [(i[0] * other, i[1]) for i in self.instructions])
+            # scale each definition once, so that recipes used in several places
+            # stay shared in the scaled recipe
+            scaled: dict[Hashable, Recipe] = {}
+            for recipe in topological_order([self]):
+                scaled[definition_key(recipe)] = recipe._scale(other, scaled)
+            return scaled[definition_key(self)]
         else:
             raise TypeError(
                 f"unsupported operand type(s) for *: '{type(self)}' and '{type(other)}'"
@@ -50,57 +73,166 @@ class Recipe:
                 f"unsupported operand type(s) for /: '{type(self)}' and '{type(other)}'"
             )
 
+    def _scale(self, factor: Real, scaled: dict[Hashable, Recipe]) -> Recipe:
+        """Scales this recipe, taking its sub-recipes already scaled from ``scaled``."""
+        recipe = Recipe(
+            self.name,
+            self.instructions.scaled(
+                factor, lambda used: scaled[definition_key(used)]  # type: ignore
+            ),
+        )
+        recipe._cache_summary(self.summary * factor)
+        return recipe
+
     @property
-    def ingredients(self) -> list[Ingredient]:
-        ingredients: list[tuple[str, Quantity]] = []
+    def instructions(self) -> Instructions:
+        """
+        The ingredients and recipes used by this recipe, with their comments.
+
+        Any iterable of instructions can be assigned; it is stored as
+        :class:`Instructions`, and instructions that already are one are shared.
+        """
+        return self._instructions
+
+    @instructions.setter
+    def instructions(self, instructions: Iterable[Instruction]) -> None:
+        if not isinstance(instructions, Instructions):
+            instructions = (
+                Instructions(instructions) if instructions else _NO_INSTRUCTIONS
+            )
+        for item in self._instructions.items:
+            if isinstance(item, Recipe) and item._parents:
+                item._parents = tuple(r for r in item._parents if r() is not self)
+        self._instructions = instructions
+        self.invalidate()
+
+    def _cache_summary(self, summary: IngredientTable) -> None:
+        """
+        Caches ``summary``, and registers this recipe with the recipes it uses, so
+        that invalidating them invalidates it too. Only recipes with a cached summary
+        need to be registered, which spares the references for most recipes.
+        """
+        self._summary = summary
+        for item in self._instructions.items:
+            if isinstance(item, Recipe):
+                parents = item._parents or ()
+                if not any(r() is self for r in parents):
+                    item._parents = parents + (ref(self),)
+
+    def invalidate(self) -> None:
+        """
+        Drops the cached summary of this recipe and of every recipe using it.
+
+        Assigning to :attr:`instructions` does this automatically; call it after
+        modifying the instructions in place.
+        """
+        stack = [self]
+        while stack:
+            recipe = stack.pop()
+            # a recipe's summary is only cached after those of its sub-recipes,
+            # so recipes using one without a cached summary have none either
+            if recipe._summary is None and recipe is not self:
+                continue
+            recipe._summary = None
+            if recipe._parents:
+                parents = (parent() for parent in recipe._parents)
+                stack.extend(parent for parent in parents if parent is not None)
+
+    @property
+    def columns(self) -> IngredientTable:
+        """
+        One row per ingredient in the instructions, in order. A referenced recipe
+        contributes the rows of its summary, once however often it is referenced.
+        """
+        instructions = self.instructions
+        tables: list[IngredientTable] = []
+        start = 0
         referenced_recipe_names: set[str] = set()
-        for instruction in self.instructions:
-            ingredient_or_recipe = instruction[0]
-            if isinstance(ingredient_or_recipe, Ingredient):
-                ingredient = ingredient_or_recipe
-                ingredients.append((ingredient.name, ingredient.quantity))
-            else:
-                recipe = ingredient_or_recipe
-                if recipe.name not in referenced_recipe_names:
-                    referenced_recipe_names.add(recipe.name)
-                    for ingredient in recipe.ingredients:
-                        ingredients.append((ingredient.name, ingredient.quantity))
-        ingredients_dict: dict[str, Quantity] = {}
-        for name, quantity in ingredients:
-            if name in ingredients_dict:
-                ingredients_dict[name] += quantity
-            else:
-                ingredients_dict[name] = quantity
-        return sorted(
-            (Ingredient(name, quantity) for name, quantity in ingredients_dict.items()),
-            key=lambda i: i.name,
-        )
+        for i, item in enumerate(instructions.items):
+            if isinstance(item, Recipe) and item.name not in referenced_recipe_names:
+                referenced_recipe_names.add(item.name)
+                tables.append(instructions.table(start, i))
+                tables.append(item.summary)
+                start = i + 1
+        if not tables:
+            return instructions.table()
+        tables.append(instructions.table(start))
+        return IngredientTable.concatenate(tables)
+
+    @property
+    def summary(self) -> IngredientTable:
+        """
+        The total of each ingredient, sorted by name.
+
+        It is computed once and cached until the instructions of this recipe or of a
+        recipe it uses change. A scaled recipe gets it by scaling the summary of the
+        recipe it was scaled from.
+        """
+        if self._summary is None:
+            # summarise sub-recipes first, so that none of them recurses
+            for recipe in topological_order([self]):
+                if recipe._summary is None:
+                    recipe._cache_summary(recipe.columns.summarize())
+        return self._summary  # type: ignore[return-value]
+
+    @property
+    def ingredients(self) -> list[Ingredient]:
+        return self.summary.to_ingredients()
+
+    def scale_to(self, ingredient: Ingredient) -> float:
+        """
+        The scale at which this recipe uses ``ingredient.quantity`` of the ingredient.
+
+        Raises ``KeyError`` if the recipe doesn't use the ingredient.
+        """
+        return ingredient.quantity / self.summary.quantity(ingredient.name)
+
+    def limiting_scale(self, available: Sequence[Ingredient]) -> tuple[float, str]:
+        """
+        The largest scale at which the recipe can be cooked with the ``available``
+        ingredients, and the name of the ingredient that limits it. See
+        :meth:`IngredientTable.limiting_scale`.
+        """
+        return self.summary.limiting_scale(available)
+
+    def scale_many(self, factors: ArrayLike) -> np.ndarray:
+        """
+        Scales the recipe by every factor in ``factors`` at once, without building a
+        scaled recipe for each of them.
+
+        Returns the totals of the ingredients as a matrix with one row per factor.
+        Its columns follow ``self.summary.names`` and are in ``self.summary.units``.
+        """
+        return self.summary.scale_many(factors)
 
     @property
     def pretty_str(self) -> str:
-        str_builder = deque([f"Recipe for {self.name}:"])
-        referenced_recipes: OrderedDict[str, Recipe] = OrderedDict()
+        """
+        The recipe and all recipes it uses, each printed once, after the recipes it
+        uses itself.
+        """
+        return "\n".join(self.pretty_lines())
+
+    def pretty_lines(self) -> Iterator[str]:
+        """The lines of :attr:`pretty_str`, generated one at a time."""
+        for recipe in topological_order([self]):
+            yield from recipe._pretty_lines_of_self()
+
+    def _pretty_lines_of_self(self) -> Iterator[str]:
+        yield f"Recipe for {self.name}:"
 
-        str_builder.append(f"{TAB}Summary of ingredients:")
+        yield f"{TAB}Summary of ingredients:"
         for ingredient in self.ingredients:
-            str_builder.append(f"{TAB*2}{ingredient}")
+            yield f"{TAB*2}{ingredient}"
 
-        str_builder.append(f"{TAB}Instructions:")
+        yield f"{TAB}Instructions:"
         for instruction in self.instructions:
             ingredient_or_recipe = instruction[0]
             if isinstance(ingredient_or_recipe, Ingredient):
                 item = str(ingredient_or_recipe)
             else:
-                referenced_recipes.update(
-                    {ingredient_or_recipe.name: ingredient_or_recipe}
-                )
                 item = ingredient_or_recipe.name
-            str_builder.append(
+            yield (
                 f"{TAB*2}{item}"
                 f"{'' if instruction[1] is None else f' ({instruction[1]})'}"
             )
-
-        for name, recipe in referenced_recipes.items():
-            str_builder.appendleft(recipe.pretty_str)
-
-        return "\n".join(str_builder)
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from typing import Iterable, Sequence
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from .ingredient import Ingredient, Quantity
+from .units import registry
+
+__all__ = ["IngredientTable"]
+
+
+class IngredientTable:
+    """
+    Ingredient quantities stored column by column.
+
+    Row ``i`` is ``values[i]`` of the unit ``unit_ids[i]`` (an id in
+    :data:`pychef.units.registry`) of the ingredient ``names[i]``, so scaling a whole
+    table is a single vector multiplication.
+    """
+
+    __slots__ = ("names", "values", "unit_ids", "_rows")
+
+    names: list[str]
+    values: np.ndarray
+    unit_ids: np.ndarray
+    _rows: dict[str, int] | None
+    """Cached :meth:`rows`"""
+
+    def __init__(
+        self, names: Sequence[str], values: ArrayLike, unit_ids: ArrayLike
+    ) -> None:
+        self.names = list(names)
+        self.values = np.asarray(values, dtype=float)
+        self.unit_ids = np.asarray(unit_ids, dtype=np.intp)
+        self._rows = None
+
+    @classmethod
+    def from_ingredients(cls, ingredients: Iterable[Ingredient]) -> IngredientTable:
+        names: list[str] = []
+        values: list[float] = []
+        unit_ids: list[int] = []
+        for ingredient in ingredients:
+            names.append(ingredient.name)
+            values.append(ingredient.quantity.value)
+            unit_ids.append(ingredient.quantity.unit_id)
+        return cls(names, values, unit_ids)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __repr__(self) -> str:
+        return "\n".join(str(ingredient) for ingredient in self.to_ingredients())
+
+    def __mul__(self, other) -> IngredientTable:
+        table = IngredientTable(self.names, self.values * other, self.unit_ids)
+        table._rows = self._rows
+        return table
+
+    def __rmul__(self, other) -> IngredientTable:
+        return self.__mul__(other)
+
+    def rows(self) -> dict[str, int]:
+        """
+        Ingredient name -> its row, built once per table. For a name with several
+        rows, as before :meth:`summarize`, the last one.
+        """
+        if self._rows is None:
+            self._rows = {name: row for row, name in enumerate(self.names)}
+        return self._rows
+
+    def quantity(self, name: str) -> Quantity:
+        """
+        The quantity of the ingredient ``name``, found through :meth:`rows`.
+
+        Raises ``KeyError`` if the table has no such ingredient.
+        """
+        row = self.rows()[name]
+        return Quantity._from_id(float(self.values[row]), int(self.unit_ids[row]))
+
+    def limiting_scale(self, available: Sequence[Ingredient]) -> tuple[float, str]:
+        """
+        The largest scale at which the quantities of this table fit in those of
+        ``available``, and the name of the ingredient that limits it.
+
+        Available quantities of the same ingredient add up, and ingredients not in the
+        table are ignored. An ingredient of the table that isn't available limits the
+        scale to 0. The table's ingredients are looked up through :meth:`rows`, so the
+        time taken depends on the number of available ingredients, not on the size of
+        the table.
+
+        Raises ``ValueError`` if an available quantity isn't in a unit compatible with
+        the table's, or if the table is empty.
+        """
+        if not self.names:
+            raise ValueError("No ingredients to limit the scale")
+        index = self.rows()
+        rows: list[int] = []
+        values: list[float] = []
+        unit_ids: list[int] = []
+        for ingredient in available:
+            row = index.get(ingredient.name)
+            if row is not None:
+                rows.append(row)
+                values.append(ingredient.quantity.value)
+                unit_ids.append(ingredient.quantity.unit_id)
+
+        used, positions = np.unique(
+            np.asarray(rows, dtype=np.intp), return_inverse=True
+        )
+        if len(used) < len(index):
+            missing = np.ones(len(self.names), dtype=bool)
+            missing[used] = False
+            return 0.0, self.names[int(missing.argmax())]
+
+        factors = registry.factors(
+            np.asarray(unit_ids, dtype=np.intp), self.unit_ids[used][positions]
+        )
+        totals = np.bincount(
+            positions, weights=np.asarray(values) * factors, minlength=len(used)
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # an ingredient the table uses none of never limits it
+            scales = np.where(self.values[used] > 0, totals / self.values[used], np.inf)
+        i = int(scales.argmin())
+        return float(scales[i]), self.names[int(used[i])]
+
+    @property
+    def units(self) -> list[str]:
+        return [registry.names[unit_id] for unit_id in self.unit_ids.tolist()]
+
+    def to_ingredients(self) -> list[Ingredient]:
+        return [
+            Ingredient(name, Quantity._from_id(value, unit_id))
+            for name, value, unit_id in zip(
+                self.names, self.values.tolist(), self.unit_ids.tolist()
+            )
+        ]
+
+    def summarize(self) -> IngredientTable:
+        """
+        Adds up the rows of each ingredient, in the unit of its first row, and sorts
+        the result by name, like :attr:`pychef.Recipe.ingredients`.
+        """
+        if not self.names:
+            return self
+        # ids in order of first appearance, so each id first appears at its row
+        rows_by_name: dict[str, int] = {}
+        name_ids = np.fromiter(
+            (rows_by_name.setdefault(name, len(rows_by_name)) for name in self.names),
+            dtype=np.intp,
+            count=len(self.names),
+        )
+        first_rows = np.unique(name_ids, return_index=True)[1]
+
+        unit_ids = self.unit_ids[first_rows]
+        factors = registry.factors(self.unit_ids, unit_ids[name_ids])
+        totals = np.bincount(
+            name_ids, weights=self.values * factors, minlength=len(first_rows)
+        )
+
+        names = list(rows_by_name)
+        order = sorted(range(len(names)), key=names.__getitem__)
+        return IngredientTable(
+            [names[i] for i in order], totals[order], unit_ids[order]
+        )
+
+    def scale_many(self, factors: ArrayLike) -> np.ndarray:
+        """
+        Scales the table by every factor in ``factors`` at once.
+
+        Returns a matrix with one row per factor and one column per row of the table.
+        """
+        return np.multiply.outer(np.asarray(factors, dtype=float), self.values)
+
+    @staticmethod
+    def concatenate(tables: Iterable[IngredientTable]) -> IngredientTable:
+        tables = list(tables)
+        if not tables:
+            return IngredientTable([], [], [])
+        return IngredientTable(
+            [name for table in tables for name in table.names],
+            np.concatenate([table.values for table in tables]),
+            np.concatenate([table.unit_ids for table in tables]),
+        )
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from threading import RLock
+from typing import Iterable
+
+import numpy as np
+
+__all__ = ["UnitRegistry", "registry"]
+
+
+class UnitRegistry:
+    """
+    Interns units and the factors to convert between them.
+
+    Each unit is validated with ``quantities`` the first time it is spelled, and is
+    given an integer id shared by all spellings of the same unit (``cup`` and
+    ``cups``, ``ml`` and ``mL``). After that, converting between two compatible units
+    is a single float multiplication, with the same factor ``quantities`` would use.
+
+    Looking units up and converting between them never takes a lock, so a registry
+    can be shared by threads; only interning a new unit does.
+    """
+
+    names: list[str]
+    """Unit id -> name of the unit, as displayed in quantities"""
+    references: list[float]
+    """Unit id -> magnitude of one unit in SI base units"""
+    dimensions: list[frozenset[tuple[str, int]]]
+    """Unit id -> SI base units and their powers"""
+    dimension_ids: list[int]
+    """Unit id -> id of its dimensions, equal for compatible units"""
+
+    def __init__(self) -> None:
+        self.names = []
+        self.references = []
+        self.dimensions = []
+        self.dimension_ids = []
+        self._dimensionality_strings: list[str] = []
+        self._ids_by_spelling: dict[str, int] = {}
+        self._ids_by_name: dict[str, int] = {}
+        self._ids_by_dimensions: dict[frozenset[tuple[str, int]], int] = {}
+        self._factors: dict[tuple[int, int], float] = {}
+        self._arrays: tuple[np.ndarray, np.ndarray] | None = None
+        """References and dimension ids as arrays, for :meth:`factors`"""
+        self._lock = RLock()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def normalize(unit: str) -> str:
+        return unit.replace(".", "").replace(" ", "_").replace("^", "**")
+
+    def unit_id(self, unit: str) -> int:
+        """
+        Returns the id of ``unit``, interning it first if it hasn't been seen.
+
+        Raises whatever ``quantities`` raises if ``unit`` is not a valid unit.
+        """
+        try:
+            return self._ids_by_spelling[unit]
+        except KeyError:
+            pass
+        with self._lock:
+            unit_id = self._intern(unit)
+            self._ids_by_spelling[unit] = unit_id
+            return unit_id
+
+    def _intern(self, unit: str) -> int:
+        from quantities import Quantity as PQuantity
+
+        dimensionality = PQuantity(1.0, self.normalize(unit)).dimensionality
+        name = str(dimensionality).replace("_", " ")
+        if name in self._ids_by_name:
+            return self._ids_by_name[name]
+
+        reference = PQuantity(1.0, dimensionality)._reference
+        return self.register(
+            name,
+            float(reference.magnitude),
+            (
+                (base.name, int(power))
+                for base, power in reference.dimensionality.items()
+            ),
+            str(dimensionality),
+        )
+
+    def describe(
+        self, unit_id: int
+    ) -> tuple[str, float, tuple[tuple[str, int], ...], str]:
+        """
+        Returns everything needed to :meth:`register` the unit ``unit_id`` in another
+        registry, as plain values.
+        """
+        return (
+            self.names[unit_id],
+            self.references[unit_id],
+            tuple(sorted(self.dimensions[unit_id])),
+            self._dimensionality_strings[unit_id],
+        )
+
+    def register(
+        self,
+        name: str,
+        reference: float,
+        dimensions: Iterable[tuple[str, int]],
+        dimensionality_string: str,
+    ) -> int:
+        """
+        Interns a unit described by :meth:`describe`, without validating it with
+        ``quantities``. Returns its id.
+        """
+        with self._lock:
+            if name in self._ids_by_name:
+                return self._ids_by_name[name]
+            unit_id = len(self.names)
+            dimensions = frozenset(dimensions)
+            self.dimension_ids.append(
+                self._ids_by_dimensions.setdefault(
+                    dimensions, len(self._ids_by_dimensions)
+                )
+            )
+            self.dimensions.append(dimensions)
+            self._dimensionality_strings.append(dimensionality_string)
+            self.references.append(reference)
+            # published last: once the name maps to the id, the unit is complete
+            self.names.append(name)
+            self._ids_by_name[name] = unit_id
+            return unit_id
+
+    def factor(self, from_id: int, to_id: int) -> float:
+        """
+        Returns the factor converting a magnitude in ``from_id`` to ``to_id``.
+
+        Raises ``ValueError`` if the units are not compatible.
+        """
+        try:
+            return self._factors[from_id, to_id]
+        except KeyError:
+            pass
+        if self.dimension_ids[from_id] != self.dimension_ids[to_id]:
+            raise ValueError(
+                "Unable to convert between units of "
+                f'"{self._dimensionality_strings[from_id]}" and '
+                f'"{self._dimensionality_strings[to_id]}"'
+            )
+        factor = (
+            1.0
+            if from_id == to_id
+            else self.references[from_id] / self.references[to_id]
+        )
+        self._factors[from_id, to_id] = factor
+        return factor
+
+    def factors(self, from_ids: np.ndarray, to_ids: np.ndarray) -> np.ndarray:
+        """
+        Vectorised :meth:`factor`: the factors converting each unit in ``from_ids``
+        to the unit at the same index in ``to_ids``.
+        """
+        arrays = self._arrays
+        if arrays is None or len(arrays[0]) < len(self.names):
+            # another thread may be interning a unit, so only take complete ones
+            n = len(self.names)
+            arrays = self._arrays = (
+                np.array(self.references[:n], dtype=float),
+                np.array(self.dimension_ids[:n], dtype=np.intp),
+            )
+        references, dimension_ids = arrays
+        incompatible = dimension_ids[from_ids] != dimension_ids[to_ids]
+        if incompatible.any():
+            i = int(incompatible.argmax())
+            self.factor(int(from_ids[i]), int(to_ids[i]))  # raises ValueError
+        return references[from_ids] / references[to_ids]
+
+
+registry = UnitRegistry()
+"""The registry shared by all :class:`pychef.Quantity` objects"""